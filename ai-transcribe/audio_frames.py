@@ -0,0 +1,97 @@
+"""
+Binary WebSocket framing for audio.
+
+Audio travels as binary frames next to the JSON control messages, in both
+directions, so it is never base64-encoded. Each frame is a 12-byte header
+followed by the raw audio bytes (little endian):
+
+    version    u8   AUDIO_FRAME_VERSION
+    kind       u8   FRAME_AUDIO
+    codec      u8   see AUDIO_CODECS
+    flags      u8   FLAG_FINAL marks the last frame of a stream
+    stream_id  u32  one utterance (client → server) or one spoken answer (server → client)
+    seq        u32  position of the frame within its stream, starting at 0
+
+Inbound frames are turned into `speech_data` messages; outbound `audio_chunk`
+messages carrying bytes are encoded here by the WebSocket manager.
+"""
+
+import struct
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+AUDIO_FRAME_VERSION = 1
+FRAME_AUDIO = 1
+FLAG_FINAL = 0x01
+
+AUDIO_CODECS = {
+    "pcm16": 1,
+    "wav": 2,
+    "mp3": 3,
+    "opus": 4,
+    "aac": 5,
+    "flac": 6,
+    "webm": 7,
+}
+_CODEC_NAMES = {value: name for name, value in AUDIO_CODECS.items()}
+
+_HEADER = struct.Struct("<BBBBII")
+AUDIO_FRAME_HEADER_SIZE = _HEADER.size
+
+
+@dataclass
+class AudioFrame:
+    stream_id: int
+    seq: int
+    codec: str
+    final: bool
+    payload: bytes
+
+
+def encode_audio_frame(stream_id: int, seq: int, codec: str, payload: bytes, final: bool = False) -> bytes:
+    """Build a binary audio frame"""
+    if codec not in AUDIO_CODECS:
+        raise ValueError(f"Unknown audio codec: {codec}")
+    header = _HEADER.pack(
+        AUDIO_FRAME_VERSION, FRAME_AUDIO, AUDIO_CODECS[codec], FLAG_FINAL if final else 0,
+        stream_id & 0xFFFFFFFF, seq & 0xFFFFFFFF
+    )
+    return header + payload
+
+
+def decode_audio_frame(frame: bytes) -> AudioFrame:
+    """Parse a binary audio frame, raising ValueError if it is malformed"""
+    if len(frame) < _HEADER.size:
+        raise ValueError("Audio frame shorter than its header")
+    version, kind, codec, flags, stream_id, seq = _HEADER.unpack_from(frame)
+    if version != AUDIO_FRAME_VERSION or kind != FRAME_AUDIO:
+        raise ValueError(f"Unsupported audio frame (version {version}, kind {kind})")
+    if codec not in _CODEC_NAMES:
+        raise ValueError(f"Unknown audio codec id: {codec}")
+    return AudioFrame(stream_id, seq, _CODEC_NAMES[codec], bool(flags & FLAG_FINAL), frame[_HEADER.size:])
+
+
+def speech_message_from_frame(frame: bytes, service_type: str = "ai_chat") -> Dict[str, Any]:
+    """Turn an inbound binary frame into a speech_data message for the dispatcher"""
+    audio = decode_audio_frame(frame)
+    return {
+        "type": "speech_data",
+        "service_type": service_type,
+        "data": {
+            "audio_data": audio.payload,
+            "codec": audio.codec,
+            "stream_id": audio.stream_id,
+            "seq": audio.seq,
+            "is_final": audio.final,
+        },
+    }
+
+
+def frame_from_audio_message(message: Dict[str, Any]) -> Optional[bytes]:
+    """Encode an outbound audio_chunk message as a binary frame, or None if it is not one"""
+    data = message.get("data")
+    if message.get("type") != "audio_chunk" or not isinstance(data, dict):
+        return None
+    if not isinstance(data.get("audio"), (bytes, bytearray)):
+        return None
+    return encode_audio_frame(data["stream_id"], data["seq"], data["codec"], bytes(data["audio"]), data.get("is_final", False))
@@ -0,0 +1,195 @@
+"""
+Shared storage for chat conversation state.
+
+A chat session (see services/session_store) lives in the memory of the worker
+holding the client's WebSocket. Its conversation is also written here after
+every answer and on disconnect, and read back when the client connects, so a
+reconnect that lands on another worker process or host, or on a restarted
+server, continues the same conversation.
+
+Conversations are keyed by a random conversation id the server issues, never
+by the client-chosen client_id. The client gets it as a signed session token in
+connect_ack and resumes the conversation by sending the token with its next
+connect message.
+
+Backends, selected with CONVERSATION_STORE:
+
+    memory   process-local; conversations survive reconnects only
+    sqlite   a SQLite database in WAL mode shared by all workers on the host (default)
+             at CONVERSATION_DB_PATH, under DATA_DIR
+    redis    a Redis server shared by all hosts (needs REDIS_URL and the redis package, which
+             is not in requirements.txt: pip install redis)
+
+DATA_DIR holds server-private state. It must stay outside STORAGE_DIR and every
+other directory the API serves files from, and defaults to a directory outside
+the source tree.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+from logger_config import logger
+
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.expanduser("~"), ".local", "share", "ai-transcribe"))
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "sqlite")
+CONVERSATION_DB_PATH = os.getenv("CONVERSATION_DB_PATH", os.path.join(DATA_DIR, "conversations.db"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Conversations not touched for this long are forgotten
+CONVERSATION_TTL_S = int(os.getenv("CONVERSATION_TTL_S", str(7 * 24 * 3600)))
+
+
+class ConversationStore(ABC):
+    """Conversation state by server-issued conversation id, as JSON-serializable dicts"""
+
+    @abstractmethod
+    async def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    async def save(self, conversation_id: str, state: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    async def delete(self, conversation_id: str):
+        pass
+
+    async def close(self):
+        pass
+
+
+class MemoryConversationStore(ConversationStore):
+    """Process-local backend"""
+
+    def __init__(self, ttl: int = CONVERSATION_TTL_S):
+        self.ttl = ttl
+        self._states: Dict[str, Any] = {}
+
+    async def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._states.get(conversation_id)
+        if entry is None:
+            return None
+        expires, payload = entry
+        if expires < time.time():
+            del self._states[conversation_id]
+            return None
+        return json.loads(payload)
+
+    async def save(self, conversation_id: str, state: Dict[str, Any]):
+        # Stored serialized so callers never share mutable state with the store
+        self._states[conversation_id] = (time.time() + self.ttl, json.dumps(state))
+        if len(self._states) % 100 == 0:
+            now = time.time()
+            for key in [key for key, (expires, _) in self._states.items() if expires < now]:
+                del self._states[key]
+
+    async def delete(self, conversation_id: str):
+        self._states.pop(conversation_id, None)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """SQLite backend in WAL mode, so worker processes read while another writes"""
+
+    def __init__(self, path: str = CONVERSATION_DB_PATH, ttl: int = CONVERSATION_TTL_S):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._saves = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread; queries run in the default executor
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_conversations ("
+                "conversation_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def _load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT state FROM chat_conversations WHERE conversation_id = ? AND updated_at >= ?",
+            (conversation_id, time.time() - self.ttl)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _save(self, conversation_id: str, payload: str, purge: bool):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO chat_conversations (conversation_id, state, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(conversation_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                (conversation_id, payload, time.time())
+            )
+            if purge:
+                conn.execute("DELETE FROM chat_conversations WHERE updated_at < ?", (time.time() - self.ttl,))
+
+    def _delete(self, conversation_id: str):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM chat_conversations WHERE conversation_id = ?", (conversation_id,))
+
+    async def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._load, conversation_id)
+
+    async def save(self, conversation_id: str, state: Dict[str, Any]):
+        self._saves += 1
+        await asyncio.to_thread(self._save, conversation_id, json.dumps(state), self._saves % 100 == 0)
+
+    async def delete(self, conversation_id: str):
+        await asyncio.to_thread(self._delete, conversation_id)
+
+
+class RedisConversationStore(ConversationStore):
+    """Redis backend for workers on several hosts; expiry is left to Redis"""
+
+    def __init__(self, url: str = REDIS_URL, ttl: int = CONVERSATION_TTL_S, prefix: str = "conversation:"):
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = redis_asyncio.from_url(url)
+
+    async def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        payload = await self._redis.get(self.prefix + conversation_id)
+        return json.loads(payload) if payload else None
+
+    async def save(self, conversation_id: str, state: Dict[str, Any]):
+        await self._redis.set(self.prefix + conversation_id, json.dumps(state), ex=self.ttl)
+
+    async def delete(self, conversation_id: str):
+        await self._redis.delete(self.prefix + conversation_id)
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def get_conversation_store(backend: str = CONVERSATION_STORE) -> ConversationStore:
+    """Create the configured conversation store backend"""
+    backend = backend.lower()
+    if backend == "redis":
+        if REDIS_AVAILABLE:
+            return RedisConversationStore()
+        logger.warning("CONVERSATION_STORE=redis but the redis package is not installed, using sqlite")
+        backend = "sqlite"
+    if backend == "sqlite":
+        return SQLiteConversationStore()
+    if backend != "memory":
+        logger.warning(f"Unknown CONVERSATION_STORE {backend}, using memory")
+    return MemoryConversationStore()
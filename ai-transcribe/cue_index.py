@@ -0,0 +1,189 @@
+"""
+Compact binary cue index for WebVTT subtitles.
+
+Each subtitle track gets a <name>.cues file next to its .vtt so players can
+fetch just the cues around the playback position. Layout (little endian):
+
+    magic      4s   b"CUE1"
+    count      u32  number of cues (n)
+    text_size  u32  size of the UTF-8 text blob
+    start_ms   u32[n]    cue start times, sorted ascending
+    end_ms     u32[n]    cue end times
+    max_end_ms u32[n]    running maximum of end_ms (makes the lower bound searchable)
+    text_off   u32[n+1]  offsets of each cue's text in the blob
+    text       bytes
+
+The file is memory-mapped and searched with binary search, so a query costs
+O(log n) plus the size of the result regardless of the lecture length.
+"""
+
+import mmap
+import os
+import re
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from logger_config import logger
+
+CUE_INDEX_MAGIC = b"CUE1"
+CUE_INDEX_SUFFIX = ".cues"
+_HEADER = struct.Struct("<4sII")
+_TIMING_RE = re.compile(
+    r"(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})\s*-->\s*(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})"
+)
+MAX_OPEN_INDEXES = 256
+
+
+def _to_seconds(hours, minutes, seconds, millis):
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis.ljust(3, "0")) / 1000.0
+
+
+def parse_vtt_cues(vtt_text):
+    """Parse WebVTT (or SRT) text into a list of (start_seconds, end_seconds, text) tuples.
+
+    Lenient on purpose: translated tracks come back from GPT and may have stray
+    header lines, missing cue numbers or comma decimal separators.
+    """
+    cues = []
+    for block in re.split(r"\r?\n\s*\r?\n", vtt_text):
+        lines = block.strip().splitlines()
+        for i, line in enumerate(lines):
+            match = _TIMING_RE.search(line)
+            if match:
+                start = _to_seconds(*match.group(1, 2, 3, 4))
+                end = _to_seconds(*match.group(5, 6, 7, 8))
+                text = "\n".join(l.strip() for l in lines[i + 1:]).strip()
+                if text and end > start:
+                    cues.append((start, end, text))
+                break
+    cues.sort(key=lambda cue: cue[0])
+    return cues
+
+
+def build_cue_index(cues):
+    """Serialize parsed cues into the binary index format"""
+    cues = sorted(cues, key=lambda cue: cue[0])
+    count = len(cues)
+    start_ms = np.array([round(c[0] * 1000) for c in cues], dtype="<u4")
+    end_ms = np.array([round(c[1] * 1000) for c in cues], dtype="<u4")
+    max_end_ms = np.maximum.accumulate(end_ms) if count else end_ms
+
+    encoded = [c[2].encode("utf-8") for c in cues]
+    text_off = np.zeros(count + 1, dtype="<u4")
+    if count:
+        text_off[1:] = np.cumsum([len(t) for t in encoded])
+    text = b"".join(encoded)
+
+    return b"".join([
+        _HEADER.pack(CUE_INDEX_MAGIC, count, len(text)),
+        start_ms.tobytes(),
+        end_ms.tobytes(),
+        max_end_ms.tobytes(),
+        text_off.tobytes(),
+        text,
+    ])
+
+
+def cue_index_path(vtt_path):
+    """Path of the cue index belonging to a .vtt file"""
+    return os.path.splitext(vtt_path)[0] + CUE_INDEX_SUFFIX
+
+
+def write_cue_index(vtt_path, vtt_text):
+    """Build and atomically store the cue index for a subtitle track"""
+    index_path = cue_index_path(vtt_path)
+    cues = parse_vtt_cues(vtt_text)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(build_cue_index(cues))
+    os.replace(tmp_path, index_path)
+    logger.debug(f"Wrote cue index with {len(cues)} cues to {index_path}")
+    return index_path
+
+
+class CueIndex:
+    """Read-only, memory-mapped view of a cue index file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            if self.stat.st_size < _HEADER.size:
+                raise ValueError(f"Cue index too small: {path}")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count, text_size = _HEADER.unpack_from(self._mmap, 0)
+        if magic != CUE_INDEX_MAGIC:
+            raise ValueError(f"Not a cue index: {path}")
+
+        offset = _HEADER.size
+        self.count = count
+        self.start_ms = np.frombuffer(self._mmap, dtype="<u4", count=count, offset=offset)
+        offset += 4 * count
+        self.end_ms = np.frombuffer(self._mmap, dtype="<u4", count=count, offset=offset)
+        offset += 4 * count
+        self.max_end_ms = np.frombuffer(self._mmap, dtype="<u4", count=count, offset=offset)
+        offset += 4 * count
+        self.text_off = np.frombuffer(self._mmap, dtype="<u4", count=count + 1, offset=offset)
+        self._text_base = offset + 4 * (count + 1)
+
+    def text(self, i):
+        start = self._text_base + int(self.text_off[i])
+        end = self._text_base + int(self.text_off[i + 1])
+        return self._mmap[start:end].decode("utf-8")
+
+    def query(self, start_seconds, end_seconds, limit=None):
+        """Return cues overlapping [start_seconds, end_seconds) as dicts"""
+        from_ms = max(0, int(start_seconds * 1000))
+        to_ms = max(0, int(end_seconds * 1000))
+        # Every cue before lo ends at or before from_ms; every cue from hi on starts at or after to_ms
+        lo = int(np.searchsorted(self.max_end_ms, from_ms, side="right"))
+        hi = int(np.searchsorted(self.start_ms, to_ms, side="left"))
+        if hi <= lo:
+            return []
+
+        candidates = lo + np.nonzero(self.end_ms[lo:hi] > from_ms)[0]
+        if limit is not None:
+            candidates = candidates[:limit]
+        return [
+            {
+                "start": int(self.start_ms[i]) / 1000.0,
+                "end": int(self.end_ms[i]) / 1000.0,
+                "text": self.text(i),
+            }
+            for i in candidates
+        ]
+
+
+_open_indexes = OrderedDict()
+_open_lock = threading.Lock()
+
+
+def open_cue_index(vtt_path):
+    """Open the cue index for a .vtt file, (re)building it when missing or older than the track"""
+    index_path = cue_index_path(vtt_path)
+    vtt_stat = os.stat(vtt_path)
+    try:
+        index_stat = os.stat(index_path)
+    except FileNotFoundError:
+        index_stat = None
+
+    if index_stat is None or index_stat.st_mtime_ns < vtt_stat.st_mtime_ns:
+        with open(vtt_path, "r", encoding="utf-8") as f:
+            write_cue_index(vtt_path, f.read())
+        index_stat = os.stat(index_path)
+
+    with _open_lock:
+        cached = _open_indexes.get(index_path)
+        if cached and cached.stat.st_mtime_ns == index_stat.st_mtime_ns and cached.stat.st_ino == index_stat.st_ino:
+            _open_indexes.move_to_end(index_path)
+            return cached
+
+        index = CueIndex(index_path)
+        _open_indexes[index_path] = index
+        while len(_open_indexes) > MAX_OPEN_INDEXES:
+            _open_indexes.popitem(last=False)
+        return index
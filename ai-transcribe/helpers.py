@@ -1,8 +1,13 @@
+import base64
 import os
 import tempfile
+import threading
+import time
 import traceback
 import re
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import urlparse
 import rsa
 from botocore.signers import CloudFrontSigner
 from itsdangerous import URLSafeTimedSerializer, BadSignature
@@ -10,6 +15,16 @@ from dotenv import load_dotenv
 import boto3
 from logger_config import logger
 from config_loader import load_client_configs, get_client_config
+from hls_subtitles import HLS_SUBTITLE_DIR
+
+# Prefer OpenSSL-backed RSA signing; pure-python rsa is the fallback
+try:
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import padding
+    CRYPTOGRAPHY_AVAILABLE = True
+except ImportError:
+    logger.warning("cryptography not available, using pure-python rsa for CloudFront signing")
+    CRYPTOGRAPHY_AVAILABLE = False
 
 # Load environment variables
 dotenv_path = os.environ.get("DOTENV_PATH") or os.path.join(os.path.dirname(__file__), '..', '.env')
@@ -32,6 +47,29 @@ VALID_USERNAME = os.getenv("LOGIN_USERNAME")
 VALID_PASSWORD = os.getenv("LOGIN_PASSWORD")
 STORAGE_API_KEY = os.getenv("STORAGE_API_KEY")
 
+# CloudFront signing configuration
+# Expiry times are aligned to reuse windows so identical URLs are signed once
+# per window (and identically on every worker) instead of once per request.
+# A signed URL is valid for at least the TTL and at most the TTL plus one reuse window.
+SIGNED_URL_TTL = int(os.getenv("CLOUDFRONT_SIGNED_URL_TTL", "3600"))
+SIGNED_URL_REUSE_FRACTION = float(os.getenv("CLOUDFRONT_SIGNED_URL_REUSE", "0.75"))
+SIGNED_URL_CACHE_SIZE = int(os.getenv("CLOUDFRONT_SIGNED_URL_CACHE_SIZE", "4096"))
+
+# Per-client CLOUDFRONT_SIGNING_MODE in clients.yml:
+#   canned - one canned-policy signature per asset URL (default)
+#   query  - one wildcard custom-policy signature per video, appended as query parameters
+#   cookie - one wildcard custom-policy signature per video, issued as CloudFront signed cookies
+SIGNING_MODES = ("canned", "query", "cookie")
+
+# Subtitle responses are cacheable until either the storage token window or
+# the CloudFront signature window rolls over; tokens must outlive the window.
+SUBTITLE_TOKEN_MAX_AGE = 300
+SUBTITLE_CACHE_WINDOW = min(int(os.getenv("SUBTITLE_CACHE_WINDOW", "120")), SUBTITLE_TOKEN_MAX_AGE // 2)
+
+# Directory tokens cover HLS subtitle segments, fetched throughout playback. They last as
+# long as the signed video URLs issued with them; playback cannot outlive those anyway.
+STORAGE_DIR_TOKEN_MAX_AGE = int(os.getenv("STORAGE_DIR_TOKEN_MAX_AGE", str(SIGNED_URL_TTL)))
+
 # AWS configuration
 def setup_aws_credentials():
     """Setup AWS credentials from environment variables"""
@@ -76,34 +114,132 @@ def sanitize_path(path: str) -> str:
     without_parens = path.replace('(', '').replace(')', '')
     return re.sub(r"\s", "_", without_parens)
 
+_signer_cache = {}
+_signed_url_cache = OrderedDict()
+_signing_lock = threading.Lock()
+
+def _load_rsa_signer(key_path):
+    """Load a private key and return a SHA-1 RSA signing function"""
+    with open(key_path, 'rb') as key_file:
+        key_data = key_file.read()
+
+    if CRYPTOGRAPHY_AVAILABLE:
+        private_key = serialization.load_pem_private_key(key_data, password=None)
+        return lambda message: private_key.sign(message, padding.PKCS1v15(), hashes.SHA1())
+
+    private_key = rsa.PrivateKey.load_pkcs1(key_data)
+    return lambda message: rsa.sign(message, private_key, 'SHA-1')
+
+def get_cloudfront_signer(client_id='default'):
+    """Get the cached CloudFront signer for a client, reloading it when the key file changes.
+
+    Returns a (signer, key_stamp) tuple; key_stamp changes whenever the key material does.
+    """
+    config = get_client_config(client_configs, client_id)
+    key_path = config['CLOUDFRONT_PRIVATE_KEY_PATH']
+    key_pair_id = config['CLOUDFRONT_KEY_PAIR_ID']
+    stat = os.stat(key_path)
+    key_stamp = (key_path, key_pair_id, stat.st_mtime_ns, stat.st_size)
+
+    cached = _signer_cache.get(client_id)
+    if cached and cached[1] == key_stamp:
+        return cached
+
+    with _signing_lock:
+        cached = _signer_cache.get(client_id)
+        if cached and cached[1] == key_stamp:
+            return cached
+        try:
+            rsa_signer = _load_rsa_signer(key_path)
+        except Exception as e:
+            logger.error(f"Failed to load private key: {e}")
+            raise
+        logger.info(f"Loaded CloudFront key {key_pair_id} for client {client_id}")
+        cached = (CloudFrontSigner(key_pair_id, rsa_signer), key_stamp)
+        _signer_cache[client_id] = cached
+        return cached
+
+def get_signature_window(now=None):
+    """Return (window_start, expires) epoch seconds for signatures issued now.
+
+    Expiry is counted from the end of the reuse window, so a signature issued at any
+    point in the window stays valid for at least SIGNED_URL_TTL seconds.
+    """
+    now = now if now is not None else time.time()
+    reuse = max(1, int(SIGNED_URL_TTL * SIGNED_URL_REUSE_FRACTION))
+    window_start = int(now // reuse) * reuse
+    return window_start, window_start + reuse + SIGNED_URL_TTL
+
+def _cached_signature(cache_key, expires, key_stamp, sign):
+    """Return a cached signature for this window or compute and store a new one"""
+    with _signing_lock:
+        cached = _signed_url_cache.get(cache_key)
+        if cached and cached[0] == expires and cached[1] == key_stamp:
+            _signed_url_cache.move_to_end(cache_key)
+            return cached[2]
+
+    value = sign()
+
+    with _signing_lock:
+        _signed_url_cache[cache_key] = (expires, key_stamp, value)
+        _signed_url_cache.move_to_end(cache_key)
+        while len(_signed_url_cache) > SIGNED_URL_CACHE_SIZE:
+            _signed_url_cache.popitem(last=False)
+    return value
+
+def _cloudfront_b64encode(data):
+    """CloudFront's URL-safe base64 variant"""
+    return base64.b64encode(data).replace(b'+', b'-').replace(b'=', b'_').replace(b'/', b'~').decode('utf-8')
+
+def get_subtitle_cache_window(now=None):
+    """Return (window_start, fresh_until) epoch seconds for cacheable subtitle responses"""
+    now = now if now is not None else time.time()
+    token_start = int(now // SUBTITLE_CACHE_WINDOW) * SUBTITLE_CACHE_WINDOW
+    signature_start, _ = get_signature_window(now)
+    reuse = max(1, int(SIGNED_URL_TTL * SIGNED_URL_REUSE_FRACTION))
+    return (
+        max(token_start, signature_start),
+        min(token_start + SUBTITLE_CACHE_WINDOW, signature_start + reuse)
+    )
+
 def generate_signed_cloudfront_url(video_key, client_id='default'):
     """Generate a signed CloudFront URL for a video"""
     config = get_client_config(client_configs, client_id)
-    
-    logger.debug(f"Client config used for signing: {config}")
-    logger.debug(f"Key Pair ID: {config['CLOUDFRONT_KEY_PAIR_ID']}")
-    logger.debug(f"Private key file: {config['CLOUDFRONT_PRIVATE_KEY_PATH']}")
+    signer, key_stamp = get_cloudfront_signer(client_id)
+    _, expires = get_signature_window()
 
-    # Load the private key
-    try:
-        with open(config['CLOUDFRONT_PRIVATE_KEY_PATH'], 'rb') as key_file:
-            private_key = rsa.PrivateKey.load_pkcs1(key_file.read())
-    except Exception as e:
-        logger.error(f"Failed to load private key: {e}")
-        raise
+    url = f"{config['CLOUDFRONT_BASE_URL']}/{video_key}"
 
-    # Create a signer
-    def rsa_signer(message):
-        return rsa.sign(message, private_key, 'SHA-1')
+    def sign():
+        signed_url = signer.generate_presigned_url(url, date_less_than=datetime.fromtimestamp(expires, timezone.utc))
+        logger.debug(f"Signed URL generated: {signed_url}")
+        return signed_url
 
-    cloudfront_signer = CloudFrontSigner(config['CLOUDFRONT_KEY_PAIR_ID'], rsa_signer)
+    return _cached_signature(("url", client_id, url), expires, key_stamp, sign)
 
-    # Generate the signed URL
-    url = f"{config['CLOUDFRONT_BASE_URL']}/{video_key}"
-    signed_url = cloudfront_signer.generate_presigned_url(url, date_less_than=datetime.utcnow() + timedelta(hours=1))
+def generate_cloudfront_policy(resource_prefix, client_id='default'):
+    """Sign a wildcard custom policy covering every object under resource_prefix.
+
+    Returns the Policy, Signature and Key-Pair-Id values (usable as query parameters
+    or, prefixed with "CloudFront-", as signed cookies) plus the expiry epoch.
+    """
+    config = get_client_config(client_configs, client_id)
+    signer, key_stamp = get_cloudfront_signer(client_id)
+    _, expires = get_signature_window()
+
+    resource = f"{config['CLOUDFRONT_BASE_URL']}/{resource_prefix}*"
 
-    logger.debug(f"Signed URL generated: {signed_url}")
-    return signed_url
+    def sign():
+        policy = signer.build_policy(resource, datetime.fromtimestamp(expires, timezone.utc)).encode('utf-8')
+        logger.debug(f"Wildcard policy signed for: {resource}")
+        return {
+            "Policy": _cloudfront_b64encode(policy),
+            "Signature": _cloudfront_b64encode(signer.rsa_signer(policy)),
+            "Key-Pair-Id": config['CLOUDFRONT_KEY_PAIR_ID'],
+            "expires": expires
+        }
+
+    return _cached_signature(("policy", client_id, resource), expires, key_stamp, sign)
 
 def generate_signed_url(filename, client_id='default'):
     """Generate a signed URL for secure access to files"""
@@ -111,7 +247,34 @@ def generate_signed_url(filename, client_id='default'):
     token = serializer.dumps(filename)
     return f"/api/storage-secure/{token}"
 
+def generate_signed_dir_url(dir_path, client_id='default'):
+    """Generate a signed URL prefix granting access to every file in a storage directory"""
+    token = serializer.dumps(dir_path, salt="storage-dir")
+    return f"/api/storage-dir/{token}"
+
+def generate_session_token(conversation_id):
+    """Sign a chat conversation id; a reconnecting client presents it to resume the conversation"""
+    return serializer.dumps(conversation_id, salt="chat-session")
+
+def verify_session_token(token, max_age):
+    """Return the conversation id of a session token, or None if it is missing, forged or expired"""
+    if not isinstance(token, str):
+        return None
+    try:
+        return serializer.loads(token, max_age=max_age, salt="chat-session")
+    except BadSignature:
+        logger.warning("Invalid chat session token")
+        return None
+
 # File helpers
+def resolve_storage_path(relative_path):
+    """Resolve a path inside STORAGE_DIR, returning None if it escapes the storage root"""
+    storage_root = os.path.realpath(STORAGE_DIR)
+    full_path = os.path.realpath(os.path.join(storage_root, relative_path))
+    if os.path.commonpath([storage_root, full_path]) != storage_root:
+        return None
+    return full_path
+
 def create_temp_file(content, suffix=".wav"):
     """Create a temporary file with given content"""
     tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
@@ -171,9 +334,67 @@ def get_supported_languages():
         'fr': 'French'
     }
 
+# Subtitle helpers
+def _list_storage_dir(dir_path):
+    """Return {filename: stat_result} for the .vtt files in a storage directory"""
+    entries = {}
+    try:
+        with os.scandir(os.path.join(STORAGE_DIR, dir_path)) as it:
+            for entry in it:
+                if entry.name.endswith(".vtt") and entry.is_file():
+                    entries[entry.name] = entry.stat()
+    except OSError:
+        pass
+    return entries
+
+def subtitle_path_for(video_key, lang_code, suffix=".vtt"):
+    """Return (base_key_dir, filename) of a video's subtitle artifact for a language"""
+    base_key_dir = os.path.splitext(video_key)[0]
+    filename_base = clean_filename(os.path.basename(base_key_dir))
+    # Default English subtitle without _en
+    if lang_code == 'en':
+        return base_key_dir, f"{filename_base}{suffix}"
+    return base_key_dir, f"{filename_base}_{lang_code}{suffix}"
+
+def _match_subtitle_tracks(video_key, entries):
+    base_key_dir = os.path.splitext(video_key)[0]
+
+    tracks = []
+    for lang_code, lang_label in get_supported_languages().items():
+        _, filename = subtitle_path_for(video_key, lang_code)
+        stat = entries.get(filename)
+        if stat is not None:
+            tracks.append((lang_code, lang_label, filename, stat))
+
+    return base_key_dir, tracks
+
+def find_subtitle_tracks(video_key):
+    """Locate stored subtitle files for a video.
+
+    Subtitles are stored under STORAGE_DIR/<base_key>/<filename>.vtt where <base_key> is the
+    full video key without extension (may contain parentheses). English has no language suffix.
+    Returns (base_key_dir, [(lang_code, lang_label, filename, stat_result), ...]).
+    """
+    return _match_subtitle_tracks(video_key, _list_storage_dir(os.path.splitext(video_key)[0]))
+
+def find_hls_subtitle_playlists(base_key_dir):
+    """Return [(lang_code, stat_result), ...] for the segmented HLS subtitle playlists of a video"""
+    playlists = []
+    try:
+        with os.scandir(os.path.join(STORAGE_DIR, base_key_dir, HLS_SUBTITLE_DIR)) as it:
+            for entry in it:
+                if entry.name.endswith(".m3u8") and entry.is_file():
+                    playlists.append((entry.name[:-len(".m3u8")], entry.stat()))
+    except OSError:
+        pass
+    return sorted(playlists)
+
 # Video URL helpers
-def build_video_urls(video_key, config, advanced=False, client_id='default'):
-    """Build video streaming URLs with proper sanitization and CloudFront signing"""
+def build_video_urls(video_key, config, advanced=False, client_id='default', signing_mode=None):
+    """Build video streaming URLs with proper sanitization and CloudFront signing.
+
+    signing_mode overrides the client's CLOUDFRONT_SIGNING_MODE.
+    """
     media_path = os.path.splitext(video_key)[0]
     extension = os.path.splitext(video_key)[1]
     filename_base = sanitize_filename(os.path.basename(media_path))
@@ -189,12 +410,53 @@ def build_video_urls(video_key, config, advanced=False, client_id='default'):
 
     preview_key = f"{base_key}/img/{filename_base}_01.png"
 
-    # Apply CloudFront signing with sanitization
-    return {
-        "dash_url": generate_signed_cloudfront_url(clean_path(dash_key), client_id),
-        "hls_url": generate_signed_cloudfront_url(clean_path(hls_key), client_id),
-        "preview_url": generate_signed_cloudfront_url(clean_path(preview_key), client_id)
+    asset_keys = {
+        "dash_url": clean_path(dash_key),
+        "hls_url": clean_path(hls_key),
+        "preview_url": clean_path(preview_key)
     }
 
+    signing_mode = signing_mode or config.get('CLOUDFRONT_SIGNING_MODE', 'canned')
+    if signing_mode not in SIGNING_MODES:
+        logger.warning(f"Unknown CLOUDFRONT_SIGNING_MODE '{signing_mode}', using canned")
+        signing_mode = 'canned'
+
+    if signing_mode == 'canned':
+        # Apply CloudFront signing with sanitization
+        return {
+            name: generate_signed_cloudfront_url(key, client_id)
+            for name, key in asset_keys.items()
+        }
+
+    # One wildcard signature for the video's stream directory covers its manifests and segments.
+    # The prefix ends at a "/" so it never matches sibling videos whose keys share a leading part.
+    resource_prefix = os.path.commonpath([asset_keys["dash_url"], asset_keys["hls_url"]]) + "/"
+    policy = generate_cloudfront_policy(resource_prefix, client_id)
+    signed_params = {name: policy[name] for name in ("Policy", "Signature", "Key-Pair-Id")}
+    covered = {name: key for name, key in asset_keys.items() if key.startswith(resource_prefix)}
+    urls = {
+        name: f"{config['CLOUDFRONT_BASE_URL']}/{key}"
+        for name, key in covered.items()
+    }
+
+    if signing_mode == 'query':
+        query = "&".join(f"{name}={value}" for name, value in signed_params.items())
+        urls = {name: f"{url}?{query}" for name, url in urls.items()}
+        # Players append these to segment requests as well
+        urls["signed_query"] = query
+    else:
+        urls["signed_cookies"] = {
+            f"CloudFront-{name}": value for name, value in signed_params.items()
+        }
+        # Scoped to the stream directory so cookies of different videos do not overwrite each other
+        urls["signed_cookie_path"] = f"{urlparse(config['CLOUDFRONT_BASE_URL']).path.rstrip('/')}/{resource_prefix}"
+
+    # Assets outside the stream directory (the preview in advanced mode) get their own canned URL
+    for name, key in asset_keys.items():
+        if name not in covered:
+            urls[name] = generate_signed_cloudfront_url(key, client_id)
+    urls["signed_expires"] = policy["expires"]
+    return urls
+
 # Initialize AWS credentials on module load
 setup_aws_credentials() 
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+Segmented WebVTT renditions for HLS.
+
+Splits a subtitle track into fixed-duration .webvtt segments, each carrying an
+X-TIMESTAMP-MAP header, plus a VOD media playlist that players can reference
+as an EXT-X-MEDIA TYPE=SUBTITLES rendition next to the video playlists.
+"""
+
+import math
+import os
+
+HLS_SUBTITLE_DIR = "hls_subs"
+HLS_SUBTITLE_SEGMENT_DURATION = float(os.getenv("HLS_SUBTITLE_SEGMENT_DURATION", "6"))
+# MPEG-TS timestamp of media time zero in the video segments (90 kHz clock)
+HLS_SUBTITLE_MPEGTS = int(os.getenv("HLS_SUBTITLE_MPEGTS", "900000"))
+
+
+def format_vtt_timestamp(seconds):
+    """Format seconds as HH:MM:SS.mmm"""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
+
+
+def segment_filename(lang, index):
+    return f"{lang}/{index:05d}.webvtt"
+
+
+def build_segmented_webvtt(cues, lang, segment_duration=HLS_SUBTITLE_SEGMENT_DURATION,
+                           mpegts=HLS_SUBTITLE_MPEGTS):
+    """Split cues into HLS WebVTT segments.
+
+    Args:
+        cues: list of (start_seconds, end_seconds, text) sorted by start
+        lang: language code, used for segment file names
+        segment_duration: target segment duration in seconds, should match the video segments
+        mpegts: MPEG-TS timestamp that maps to local time 00:00:00.000
+
+    Returns:
+        (playlist_text, [(relative_segment_path, segment_text), ...])
+    """
+    total_duration = max((end for _, end, _ in cues), default=0.0)
+    segment_count = max(1, math.ceil(total_duration / segment_duration))
+    header = f"WEBVTT\nX-TIMESTAMP-MAP=MPEGTS:{mpegts},LOCAL:00:00:00.000\n\n"
+
+    segments = []
+    durations = []
+    cue_start = 0
+    for index in range(segment_count):
+        window_start = index * segment_duration
+        window_end = window_start + segment_duration
+
+        # Cues are sorted by start; skip those that ended before this window
+        while cue_start < len(cues) and cues[cue_start][1] <= window_start:
+            cue_start += 1
+
+        body = []
+        for start, end, text in cues[cue_start:]:
+            if start >= window_end:
+                break
+            if end > window_start:
+                # Cues spanning a boundary are repeated in each segment, as HLS requires
+                body.append(f"{format_vtt_timestamp(start)} --> {format_vtt_timestamp(end)}\n{text}\n")
+
+        segments.append((segment_filename(lang, index), header + "\n".join(body)))
+        durations.append(min(segment_duration, max(total_duration, segment_duration) - window_start))
+
+    playlist = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{math.ceil(segment_duration)}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    for (name, _), duration in zip(segments, durations):
+        playlist.append(f"#EXTINF:{duration:.3f},")
+        playlist.append(name)
+    playlist.append("#EXT-X-ENDLIST")
+
+    return "\n".join(playlist) + "\n", segments
+
+
+def build_media_tag(lang, label, uri, default=False):
+    """EXT-X-MEDIA line for adding a subtitle rendition to a master playlist"""
+    return (
+        f'#EXT-X-MEDIA:TYPE=SUBTITLES,GROUP-ID="subs",NAME="{label}",LANGUAGE="{lang}",'
+        f'DEFAULT={"YES" if default else "NO"},AUTOSELECT=YES,URI="{uri}"'
+    )
@@ -0,0 +1,235 @@
+"""
+Job store and single-flight coalescing for transcription jobs.
+
+Identical transcription requests (same bucket, key, languages and mode) are
+collapsed into one pipeline run. Within a process later callers await the
+running task; across worker processes the first worker claims the job with a
+lock file under STORAGE_DIR/.jobs and the others poll the store until the
+owner publishes the result. Published records, and locks left by workers
+that died, are purged once they are older than JOB_RECORD_TTL_SECONDS.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from logger_config import logger
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORAGE_DIR = os.path.join(BASE_DIR, "storage")
+JOBS_DIR = os.path.join(STORAGE_DIR, ".jobs")
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2.0"))
+# Finished and failed records only serve callers waiting on the run; keep them this long
+JOB_RECORD_TTL_SECONDS = int(os.getenv("JOB_RECORD_TTL_SECONDS", "3600"))
+JOB_PURGE_INTERVAL = float(os.getenv("JOB_PURGE_INTERVAL", "600"))
+
+
+class JobFailedError(Exception):
+    """Raised to callers attached to a job that failed in another worker"""
+
+
+def make_job_id(bucket: str, target: str, languages=None, mode: Optional[Dict[str, Any]] = None) -> str:
+    """Build a stable job id from (bucket, key, languages, mode)"""
+    payload = json.dumps({
+        "bucket": bucket,
+        "target": target,
+        "languages": sorted(languages or []),
+        "mode": mode or {},
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class JobStore:
+    """File-backed job records shared by all worker processes"""
+
+    def __init__(self, jobs_dir: str = JOBS_DIR, lease_seconds: int = JOB_LEASE_SECONDS,
+                 record_ttl: int = JOB_RECORD_TTL_SECONDS, purge_interval: float = JOB_PURGE_INTERVAL):
+        self.jobs_dir = jobs_dir
+        self.lease_seconds = lease_seconds
+        self.record_ttl = record_ttl
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    def _lock_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.lock")
+
+    def _record_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _is_stale(self, lock_path: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(lock_path) > self.lease_seconds
+        except FileNotFoundError:
+            return False
+
+    def try_claim(self, job_id: str) -> Optional[str]:
+        """Claim a job for this process. Returns the run id or None if already running elsewhere."""
+        lock_path = self._lock_path(job_id)
+        for _ in range(2):
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._is_stale(lock_path):
+                    return None
+                logger.warning(f"Removing stale job lock {lock_path}")
+                try:
+                    os.remove(lock_path)
+                except FileNotFoundError:
+                    pass
+                continue
+            run_id = uuid.uuid4().hex
+            with os.fdopen(fd, "w") as f:
+                json.dump({"run_id": run_id, "pid": os.getpid(), "started_at": time.time()}, f)
+            return run_id
+        return None
+
+    def current_run(self, job_id: str) -> Optional[str]:
+        """Return the run id of the live lock holder, if any"""
+        lock_path = self._lock_path(job_id)
+        if self._is_stale(lock_path):
+            return None
+        try:
+            with open(lock_path, "r") as f:
+                return json.load(f).get("run_id")
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def heartbeat(self, job_id: str):
+        """Extend the lease of a running job"""
+        try:
+            os.utime(self._lock_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def _publish(self, job_id: str, record: Dict[str, Any]):
+        record_path = self._record_path(job_id)
+        tmp_path = f"{record_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, record_path)
+        try:
+            os.remove(self._lock_path(job_id))
+        except FileNotFoundError:
+            pass
+        if time.time() - self._last_purge >= self.purge_interval:
+            self.purge()
+
+    def complete(self, job_id: str, run_id: str, result: Any):
+        """Publish a finished job result and release the lock"""
+        self._publish(job_id, {"run_id": run_id, "status": "done", "result": result, "finished_at": time.time()})
+
+    def fail(self, job_id: str, run_id: str, error: str):
+        """Publish a job failure and release the lock"""
+        self._publish(job_id, {"run_id": run_id, "status": "failed", "error": error, "finished_at": time.time()})
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Read the last published record for a job"""
+        try:
+            with open(self._record_path(job_id), "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def purge(self) -> int:
+        """Remove records, abandoned locks and temp files older than the record TTL"""
+        self._last_purge = now = time.time()
+        # Live locks are refreshed every lease / 3, so anything this old is abandoned
+        cutoff = now - max(self.record_ttl, self.lease_seconds)
+        removed = 0
+        try:
+            with os.scandir(self.jobs_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith((".json", ".lock", ".tmp")):
+                        continue
+                    try:
+                        if entry.stat().st_mtime < cutoff:
+                            os.remove(entry.path)
+                            removed += 1
+                    except FileNotFoundError:
+                        # Another worker purged or replaced it first
+                        pass
+        except OSError as e:
+            logger.warning(f"Failed to purge job store {self.jobs_dir}: {e}")
+        if removed:
+            logger.info(f"Purged {removed} old job files from {self.jobs_dir}")
+        return removed
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same job id into a single run"""
+
+    def __init__(self, store: JobStore, poll_interval: float = JOB_POLL_INTERVAL):
+        self.store = store
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def run(self, job_id: str, func: Callable[[], Any]) -> Any:
+        """Run func once per job id; concurrent callers receive the same result"""
+        task = self._inflight.get(job_id)
+        if task is None:
+            task = asyncio.create_task(self._run_or_attach(job_id, func))
+            self._inflight[job_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(job_id, None))
+        else:
+            logger.info(f"Attaching to in-flight job {job_id[:12]}")
+        return await asyncio.shield(task)
+
+    async def _run_or_attach(self, job_id: str, func: Callable[[], Any]) -> Any:
+        while True:
+            run_id = self.store.try_claim(job_id)
+            if run_id:
+                return await self._run_owned(job_id, run_id, func)
+
+            other_run = self.store.current_run(job_id)
+            if other_run is None:
+                # Lock is being written or was just released
+                await asyncio.sleep(0.05)
+                continue
+            logger.info(f"Job {job_id[:12]} is running in another worker, waiting for run {other_run[:8]}")
+            record = await self._wait_for_run(job_id, other_run)
+            if record is None:
+                # Owner went away without publishing; try to take over
+                continue
+            if record["status"] == "failed":
+                raise JobFailedError(record.get("error", "Job failed"))
+            return record["result"]
+
+    async def _run_owned(self, job_id: str, run_id: str, func: Callable[[], Any]) -> Any:
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            result = await asyncio.to_thread(func)
+        except Exception as e:
+            self.store.fail(job_id, run_id, str(e))
+            raise
+        finally:
+            heartbeat.cancel()
+        self.store.complete(job_id, run_id, result)
+        return result
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.store.lease_seconds / 3)
+            self.store.heartbeat(job_id)
+
+    async def _wait_for_run(self, job_id: str, run_id: str) -> Optional[Dict[str, Any]]:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            record = self.store.get(job_id)
+            if record and record.get("run_id") == run_id:
+                return record
+            if self.store.current_run(job_id) != run_id:
+                # Lock released or went stale; give the record one last look
+                record = self.store.get(job_id)
+                if record and record.get("run_id") == run_id:
+                    return record
+                return None
+
+
+# Global job coordinator for transcription requests
+transcription_jobs = SingleFlight(JobStore())
@@ -6,7 +6,7 @@ FastAPI-only version with all functionality migrated from Flask
 
 import uvicorn
 import os
-from websocket_service import app
+from websocket_bus import WORKERS
 
 if __name__ == "__main__":
     # Get port from environment or default to 80
@@ -18,10 +18,14 @@ if __name__ == "__main__":
     print(f"  - WebSocket: ws://localhost:{port}/ws/{{client_id}}")
     print(f"  - Health check: http://localhost:{port}/api/health")
     print(f"  - Services: http://localhost:{port}/api/services")
+    print(f"Worker processes: {WORKERS}")
     
+    # Workers are separate processes, so uvicorn needs the app as an import string;
+    # they share WebSocket routing through websocket_bus and conversations through conversation_store
     uvicorn.run(
-        app,
+        "websocket_service:app",
         host="0.0.0.0",
         port=port,
-        log_level="info"
-    ) 
\ No newline at end of file
+        log_level="info",
+        workers=WORKERS
+    )
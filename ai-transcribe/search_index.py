@@ -0,0 +1,442 @@
+"""
+Full-text transcript search index.
+
+One inverted index per tenant and language lives under
+STORAGE_DIR/.search/<client_id>/<lang>/. It is updated incrementally as
+subtitle tracks are written: every track becomes a small immutable segment
+file, and segments of similar size are merged as part of the write (tiered,
+so total merge work stays O(n log n)). A manifest maps each video to
+the segment holding its current version; older versions are ignored at query
+time and dropped on merge.
+
+Segment layout (little endian, memory-mappable):
+
+    header   8 x u32   magic, n_docs, n_cues, n_terms, n_postings,
+                       doc_blob_size, cue_text_size, term_blob_size
+    doc_off      u32[n_docs+1]   video keys in the doc blob
+    cue_doc      u32[n_cues]     doc id of each cue
+    cue_start_ms u32[n_cues]
+    cue_text_off u32[n_cues+1]   cue texts in the cue text blob
+    term_off     u32[n_terms+1]  terms (sorted by UTF-8 bytes) in the term blob
+    post_off     u32[n_terms+1]  postings range of each term
+    postings     u32[n_postings] cue ids, ascending per term
+    doc blob | cue text blob | term blob
+"""
+
+import fcntl
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+from hls_subtitles import HLS_SUBTITLE_DIR
+from logger_config import logger
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORAGE_DIR = os.path.join(BASE_DIR, "storage")
+SEARCH_DIR = os.path.join(STORAGE_DIR, ".search")
+
+SEGMENT_MAGIC = 0x31584953  # "SIX1"
+SEGMENT_SUFFIX = ".idx"
+MERGE_FACTOR = int(os.getenv("SEARCH_MERGE_FACTOR", "4"))
+# Open (memory-mapped) indexes kept per process, least recently used closed first
+SEARCH_MAX_OPEN_INDEXES = int(os.getenv("SEARCH_MAX_OPEN_INDEXES", "64"))
+_HEADER = struct.Struct("<8I")
+
+# CJK scripts have no spaces between words, so every character is a token there
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_TOKEN_RE = re.compile(rf"[{_CJK}]|[^\W{_CJK}]+")
+
+
+def tokenize(text):
+    """Lowercase word tokens; CJK characters are single tokens"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _tenant_dir(client_id, lang):
+    for part in (client_id, lang):
+        if not part or "/" in part or part.startswith("."):
+            raise ValueError(f"Invalid search index scope: {client_id}/{lang}")
+    return os.path.join(SEARCH_DIR, client_id, lang)
+
+
+def build_segment(documents):
+    """Serialize documents into a segment.
+
+    Args:
+        documents: list of (video_key, [(start_seconds, text), ...])
+    """
+    doc_keys = []
+    cue_doc, cue_start, cue_texts = [], [], []
+    term_cues = defaultdict(set)
+
+    for doc_id, (video_key, cues) in enumerate(documents):
+        doc_keys.append(video_key.encode("utf-8"))
+        for start, text in cues:
+            cue_id = len(cue_texts)
+            cue_doc.append(doc_id)
+            cue_start.append(round(start * 1000))
+            cue_texts.append(text.encode("utf-8"))
+            for term in set(tokenize(text)):
+                term_cues[term.encode("utf-8")].add(cue_id)
+
+    terms = sorted(term_cues)
+    postings = [sorted(term_cues[t]) for t in terms]
+
+    def offsets(lengths):
+        out = np.zeros(len(lengths) + 1, dtype="<u4")
+        if lengths:
+            out[1:] = np.cumsum(lengths)
+        return out
+
+    doc_off = offsets([len(k) for k in doc_keys])
+    cue_text_off = offsets([len(t) for t in cue_texts])
+    term_off = offsets([len(t) for t in terms])
+    post_off = offsets([len(p) for p in postings])
+    flat_postings = np.array([c for p in postings for c in p], dtype="<u4")
+
+    doc_blob = b"".join(doc_keys)
+    cue_blob = b"".join(cue_texts)
+    term_blob = b"".join(terms)
+
+    return b"".join([
+        _HEADER.pack(SEGMENT_MAGIC, len(doc_keys), len(cue_texts), len(terms), len(flat_postings),
+                     len(doc_blob), len(cue_blob), len(term_blob)),
+        doc_off.tobytes(),
+        np.array(cue_doc, dtype="<u4").tobytes(),
+        np.array(cue_start, dtype="<u4").tobytes(),
+        cue_text_off.tobytes(),
+        term_off.tobytes(),
+        post_off.tobytes(),
+        flat_postings.tobytes(),
+        doc_blob,
+        cue_blob,
+        term_blob,
+    ])
+
+
+class Segment:
+    """Read-only, memory-mapped index segment"""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, self.n_docs, self.n_cues, self.n_terms, n_postings,
+         doc_blob_size, cue_text_size, term_blob_size) = _HEADER.unpack_from(self._mmap, 0)
+        if magic != SEGMENT_MAGIC:
+            raise ValueError(f"Not a search segment: {path}")
+
+        offset = _HEADER.size
+
+        def array(count):
+            nonlocal offset
+            arr = np.frombuffer(self._mmap, dtype="<u4", count=count, offset=offset)
+            offset += 4 * count
+            return arr
+
+        self.doc_off = array(self.n_docs + 1)
+        self.cue_doc = array(self.n_cues)
+        self.cue_start_ms = array(self.n_cues)
+        self.cue_text_off = array(self.n_cues + 1)
+        self.term_off = array(self.n_terms + 1)
+        self.post_off = array(self.n_terms + 1)
+        self.postings = array(n_postings)
+        self._doc_base = offset
+        self._cue_base = self._doc_base + doc_blob_size
+        self._term_base = self._cue_base + cue_text_size
+
+    def _blob(self, base, offsets, i):
+        return self._mmap[base + int(offsets[i]):base + int(offsets[i + 1])]
+
+    def doc_key(self, doc_id):
+        return self._blob(self._doc_base, self.doc_off, doc_id).decode("utf-8")
+
+    def cue_text(self, cue_id):
+        return self._blob(self._cue_base, self.cue_text_off, cue_id).decode("utf-8")
+
+    def lookup(self, term):
+        """Cue ids containing term (binary search over the sorted term dictionary)"""
+        target = term.encode("utf-8")
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._blob(self._term_base, self.term_off, mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_terms and self._blob(self._term_base, self.term_off, lo) == target:
+            return self.postings[int(self.post_off[lo]):int(self.post_off[lo + 1])]
+        return np.empty(0, dtype="<u4")
+
+    def documents(self, doc_ids=None):
+        """Yield (video_key, [(start_seconds, text), ...]) for the given (or all) docs"""
+        wanted = set(range(self.n_docs)) if doc_ids is None else set(doc_ids)
+        cues = defaultdict(list)
+        for cue_id in range(self.n_cues):
+            doc_id = int(self.cue_doc[cue_id])
+            if doc_id in wanted:
+                cues[doc_id].append((int(self.cue_start_ms[cue_id]) / 1000.0, self.cue_text(cue_id)))
+        for doc_id in sorted(wanted):
+            yield self.doc_key(doc_id), cues[doc_id]
+
+
+def _level(n_docs):
+    level = 0
+    while n_docs >= MERGE_FACTOR:
+        n_docs //= MERGE_FACTOR
+        level += 1
+    return level
+
+
+class SearchIndex:
+    """Inverted index for one tenant and language"""
+
+    def __init__(self, client_id, lang):
+        self.client_id = client_id
+        self.lang = lang
+        self.dir = _tenant_dir(client_id, lang)
+        self.manifest_path = os.path.join(self.dir, "manifest.json")
+        self._segments = {}
+        # Per segment: which of its docs hold the live version of their video
+        self._live_masks = {}
+        self._manifest = {"segments": [], "live": {}}
+        self._manifest_mtime = None
+        self._lock = threading.Lock()
+
+    # --- writing -----------------------------------------------------------
+
+    def _locked(self):
+        os.makedirs(self.dir, exist_ok=True)
+        lock_file = open(os.path.join(self.dir, "lock"), "w")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"segments": [], "live": {}}
+
+    def _write_file(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _write_segment(self, documents):
+        name = f"seg-{int(time.time() * 1000):x}-{uuid.uuid4().hex[:8]}{SEGMENT_SUFFIX}"
+        self._write_file(os.path.join(self.dir, name), build_segment(documents))
+        return name
+
+    def add_document(self, video_key, cues):
+        """Index (or re-index) one video's cues, given as [(start_seconds, text), ...]"""
+        lock_file = self._locked()
+        try:
+            manifest = self._read_manifest()
+            name = self._write_segment([(video_key, cues)])
+            manifest["segments"].append({"name": name, "docs": 1})
+            manifest["live"][video_key] = name
+            self._merge_tiers(manifest)
+            self._write_file(self.manifest_path, json.dumps(manifest).encode("utf-8"))
+            self._remove_unreferenced(manifest)
+        finally:
+            lock_file.close()
+        logger.debug(f"Indexed {video_key} ({len(cues)} cues) for {self.client_id}/{self.lang}")
+
+    def _merge_tiers(self, manifest):
+        while True:
+            by_level = defaultdict(list)
+            for seg in manifest["segments"]:
+                by_level[_level(seg["docs"])].append(seg)
+            group = next((segs for _, segs in sorted(by_level.items()) if len(segs) >= MERGE_FACTOR), None)
+            if group is None:
+                return
+
+            documents = []
+            for seg in group:
+                segment = Segment(os.path.join(self.dir, seg["name"]))
+                live_ids = [
+                    doc_id for doc_id in range(segment.n_docs)
+                    if manifest["live"].get(segment.doc_key(doc_id)) == seg["name"]
+                ]
+                documents.extend(segment.documents(live_ids))
+
+            merged = self._write_segment(documents)
+            names = {seg["name"] for seg in group}
+            manifest["segments"] = [s for s in manifest["segments"] if s["name"] not in names]
+            manifest["segments"].append({"name": merged, "docs": len(documents)})
+            for video_key, _ in documents:
+                manifest["live"][video_key] = merged
+
+    def _remove_unreferenced(self, manifest):
+        referenced = {seg["name"] for seg in manifest["segments"]}
+        for name in os.listdir(self.dir):
+            if name.endswith(SEGMENT_SUFFIX) and name not in referenced:
+                # Readers that still map the file keep working; the inode goes away with them
+                os.remove(os.path.join(self.dir, name))
+
+    # --- reading -----------------------------------------------------------
+
+    def _refresh(self):
+        # A writer may replace the manifest and remove the segments it dropped
+        # between our reading it and opening them; then read the new one once more.
+        # The manifest, segments and masks are swapped in together, so a failed
+        # refresh leaves the previous consistent view in place and is retried.
+        for attempt in range(2):
+            try:
+                mtime = os.stat(self.manifest_path).st_mtime_ns
+            except FileNotFoundError:
+                return False
+            with self._lock:
+                if mtime == self._manifest_mtime:
+                    return True
+                manifest = self._read_manifest()
+                try:
+                    segments = {
+                        seg["name"]: self._segments.get(seg["name"]) or Segment(os.path.join(self.dir, seg["name"]))
+                        for seg in manifest["segments"]
+                    }
+                except FileNotFoundError:
+                    if attempt == 0:
+                        continue
+                    logger.warning(f"Search index {self.client_id}/{self.lang} changed while loading, keeping the previous view")
+                    return self._manifest_mtime is not None
+                live = manifest["live"]
+                live_masks = {
+                    name: np.array(
+                        [live.get(segment.doc_key(doc_id)) == name for doc_id in range(segment.n_docs)], dtype=bool
+                    )
+                    for name, segment in segments.items()
+                }
+                self._manifest, self._segments, self._live_masks = manifest, segments, live_masks
+                self._manifest_mtime = mtime
+                return True
+
+    def search(self, query, limit=50):
+        """Return hits for cues containing every query term, best-matching videos first.
+
+        Matches are counted and ranked per video as arrays; hit dicts are only
+        built for the `limit` cues that are returned.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self._refresh():
+            return []
+
+        with self._lock:
+            segments = list(self._segments.values())
+            live_masks = self._live_masks
+
+        seg_ids, matched, docs = [], [], []
+        for i, segment in enumerate(segments):
+            cue_ids = None
+            for term in terms:
+                postings = segment.lookup(term)
+                cue_ids = postings if cue_ids is None else np.intersect1d(cue_ids, postings, assume_unique=True)
+                if not len(cue_ids):
+                    break
+            if not len(cue_ids):
+                continue
+            cue_ids = cue_ids[live_masks[segment.name][segment.cue_doc[cue_ids]]]
+            seg_ids.append(np.full(len(cue_ids), i, dtype=np.int64))
+            matched.append(cue_ids.astype(np.int64))
+            docs.append(segment.cue_doc[cue_ids].astype(np.int64))
+        if not matched:
+            return []
+
+        seg_ids = np.concatenate(seg_ids)
+        cue_ids = np.concatenate(matched)
+        # A video's live version is in exactly one segment, so (segment, doc) identifies the video
+        doc_ids = np.concatenate(docs)
+        videos, video_of_cue, counts = np.unique((seg_ids << 32) | doc_ids, return_inverse=True, return_counts=True)
+
+        # Only videos that can make the first `limit` hits (plus ties, ordered by key) are looked at
+        order = np.argsort(-counts, kind="stable")
+        filled = min(int(np.searchsorted(np.cumsum(counts[order]), limit)), len(order) - 1)
+        candidates = order[counts[order] >= counts[order[filled]]]
+        keyed = sorted(
+            (-int(counts[v]), segments[int(videos[v] >> 32)].doc_key(int(videos[v] & 0xFFFFFFFF)), int(v))
+            for v in candidates
+        )
+
+        by_video = np.argsort(video_of_cue, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)])
+        hits = []
+        for _, video_key, v in keyed:
+            rows = by_video[starts[v]:starts[v + 1]]
+            segment = segments[int(videos[v] >> 32)]
+            video_cues = cue_ids[rows]
+            for cue_id in video_cues[np.argsort(segment.cue_start_ms[video_cues], kind="stable")]:
+                hits.append({
+                    "video_key": video_key,
+                    "start": int(segment.cue_start_ms[cue_id]) / 1000.0,
+                    "snippet": segment.cue_text(int(cue_id))
+                })
+                if len(hits) >= limit:
+                    return hits
+        return hits
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(client_id, lang):
+    """Shared SearchIndex instance per tenant and language (an LRU of SEARCH_MAX_OPEN_INDEXES)"""
+    with _indexes_lock:
+        index = _indexes.get((client_id, lang))
+        if index is None:
+            index = SearchIndex(client_id, lang)
+            _indexes[(client_id, lang)] = index
+            while len(_indexes) > SEARCH_MAX_OPEN_INDEXES:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end((client_id, lang))
+        return index
+
+
+def index_subtitle_track(client_id, lang, video_key, cues):
+    """Add a parsed subtitle track ([(start, end, text), ...]) to the tenant's index"""
+    get_search_index(client_id, lang).add_document(video_key, [(start, text) for start, _, text in cues])
+
+
+if __name__ == "__main__":
+    # Backfill: index every stored track under a prefix for one tenant
+    import argparse
+    from cue_index import parse_vtt_cues
+
+    SUPPORTED_LANGUAGES = ["en", "de", "es", "hu", "cs", "sv", "ru", "zh", "ja", "he", "ro", "fr"]
+
+    parser = argparse.ArgumentParser(description="Build the transcript search index from stored subtitles")
+    parser.add_argument("--client", default="default", help="Tenant (client id) to index into")
+    parser.add_argument("--source-lang", default="en", help="Language of tracks without a language suffix")
+    parser.add_argument("--video-ext", default=".mp4", help="Extension of the original video keys")
+    args = parser.parse_args()
+
+    count = 0
+    for root, dirs, files in os.walk(STORAGE_DIR):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d != HLS_SUBTITLE_DIR]
+        base_key = os.path.relpath(root, STORAGE_DIR)
+        filename_base = os.path.basename(base_key)
+        for name in files:
+            if not name.startswith(filename_base) or not name.endswith(".vtt"):
+                continue
+            suffix = name[len(filename_base):-len(".vtt")]
+            lang = suffix[1:] if suffix.startswith("_") and suffix[1:] in SUPPORTED_LANGUAGES else None
+            if suffix and lang is None:
+                continue
+            with open(os.path.join(root, name), "r", encoding="utf-8") as f:
+                cues = parse_vtt_cues(f.read())
+            index_subtitle_track(args.client, lang or args.source_lang, base_key + args.video_ext, cues)
+            count += 1
+    print(f"Indexed {count} subtitle tracks for {args.client}")
@@ -0,0 +1,143 @@
+import asyncio
+import os
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import tiktoken
+
+from logger_config import logger
+
+# Tokens of recent turns sent verbatim with every request
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "3000"))
+# Turns that fell out of the window are folded into the summary once they add up to this many tokens
+CHAT_SUMMARY_TRIGGER_TOKENS = int(os.getenv("CHAT_SUMMARY_TRIGGER_TOKENS", "1500"))
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "400"))
+CHAT_SUMMARY_MODEL = os.getenv("CHAT_SUMMARY_MODEL", "gpt-4o-mini")
+CHAT_TOKENIZER_MODEL = "gpt-4o"
+
+# Role and separators the API adds around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens of text for the chat model.
+
+    Falls back to a four-characters-per-token estimate when the tokenizer
+    files cannot be loaded (they are downloaded on first use).
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.encoding_for_model(CHAT_TOKENIZER_MODEL)
+        except Exception as e:
+            logger.warning(f"Tokenizer for {CHAT_TOKENIZER_MODEL} unavailable, estimating token counts: {e}")
+            _encoding = False
+    if _encoding is False:
+        return len(text) // 4 + 1
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+class ConversationMemory:
+    """Chat history of one client, kept under a token budget.
+
+    The most recent turns that fit in `budget` tokens are sent verbatim;
+    older turns are folded into a running summary by a background task, so
+    the prompt stays the same size however long the conversation runs.
+    """
+
+    def __init__(self, summarize: Callable[[str, List[Dict[str, str]]], Awaitable[str]],
+                 spawn: Callable = asyncio.create_task, budget: int = CHAT_HISTORY_TOKEN_BUDGET,
+                 summary_trigger: int = CHAT_SUMMARY_TRIGGER_TOKENS,
+                 count_tokens: Callable[[str], int] = count_tokens):
+        self.summarize = summarize
+        self.spawn = spawn
+        self.budget = budget
+        self.summary_trigger = summary_trigger
+        self.count_tokens = count_tokens
+        self.turns = deque()
+        self.summary = ""
+        self.summaries = 0
+        self.last_prompt_tokens = 0
+        self._summary_task: Optional[asyncio.Task] = None
+
+    def add(self, role: str, content: str):
+        self.turns.append(({'role': role, 'content': content}, self.count_tokens(content) + MESSAGE_OVERHEAD_TOKENS))
+
+    def _window_start(self) -> int:
+        """Index of the oldest turn in the window; the newest turn is always included"""
+        used = 0
+        start = len(self.turns)
+        while start > 0:
+            used += self.turns[start - 1][1]
+            if used > self.budget and start < len(self.turns):
+                break
+            start -= 1
+        return start
+
+    def messages(self, system_prompt: str, context_message: Optional[Dict[str, str]] = None) -> List[Dict[str, str]]:
+        """Messages for the next request: system prompt, summary, recent turns.
+
+        The context message is placed before the newest turn and is not stored.
+        """
+        messages = [{'role': 'system', 'content': system_prompt}]
+        if self.summary:
+            messages.append({'role': 'system', 'content': f'Summary of the earlier conversation:\n{self.summary}'})
+        window = [message for message, _ in list(self.turns)[self._window_start():]]
+        if context_message and window:
+            window.insert(len(window) - 1, context_message)
+        messages.extend(window)
+        self.last_prompt_tokens = sum(
+            self.count_tokens(m['content']) + MESSAGE_OVERHEAD_TOKENS for m in messages
+        )
+        self._refresh_summary()
+        return messages
+
+    def _refresh_summary(self):
+        if self._summary_task is not None and not self._summary_task.done():
+            return
+        evicted = list(self.turns)[:self._window_start()]
+        if sum(tokens for _, tokens in evicted) < self.summary_trigger:
+            return
+        self._summary_task = self.spawn(self._fold([message for message, _ in evicted]))
+
+    async def _fold(self, evicted: List[Dict[str, str]]):
+        try:
+            summary = await self.summarize(self.summary, evicted)
+        except Exception as e:
+            # The turns are dropped anyway so memory stays bounded
+            logger.warning(f"Conversation summary failed, dropping {len(evicted)} old turns: {str(e)}")
+            summary = self.summary
+        for _ in evicted:
+            self.turns.popleft()
+        self.summary = summary
+        self.summaries += 1
+
+    def to_state(self) -> Dict[str, Any]:
+        """JSON-serializable form for a conversation store"""
+        return {
+            'turns': [message for message, _ in self.turns],
+            'summary': self.summary,
+            'summaries': self.summaries
+        }
+
+    def restore(self, state: Dict[str, Any]):
+        """Replace the history with one saved by to_state"""
+        self.turns.clear()
+        for message in state.get('turns', []):
+            self.add(message['role'], message['content'])
+        self.summary = state.get('summary', "")
+        self.summaries = state.get('summaries', 0)
+
+    def approx_bytes(self) -> int:
+        return len(self.summary) + sum(len(message['content']) + 64 for message, _ in self.turns)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'turns': len(self.turns),
+            'window_turns': len(self.turns) - self._window_start(),
+            'summaries': self.summaries,
+            'summary_tokens': self.count_tokens(self.summary) if self.summary else 0,
+            'last_prompt_tokens': self.last_prompt_tokens
+        }
@@ -0,0 +1,78 @@
+"""
+Coalescing of streamed chat text deltas into fewer WebSocket frames.
+
+The chat model streams a delta every few tokens, and sending each as its own
+frame costs a JSON encode and a socket write per token. The chat service
+passes its answer stream through a DeltaCoalescer, which merges deltas that
+arrive within CHAT_DELTA_WINDOW_MS of each other (up to CHAT_DELTA_MAX_BYTES)
+while still sending the first token at once.
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+# Deltas arriving within this window after a frame are merged into the next one
+CHAT_DELTA_WINDOW_MS = float(os.getenv("CHAT_DELTA_WINDOW_MS", "40"))
+# A merged frame is flushed early once its text reaches this size
+CHAT_DELTA_MAX_BYTES = int(os.getenv("CHAT_DELTA_MAX_BYTES", "512"))
+
+
+def is_text_delta(chunk: Dict[str, Any]) -> bool:
+    return 'content' in chunk and 'type' not in chunk
+
+
+class DeltaCoalescer:
+    """Merges chat text deltas into fewer frames.
+
+    Works as a leading-edge throttle: a delta that arrives when no frame went
+    out during the last window is sent immediately (so the first token is
+    never delayed), later ones are merged until the window expires or the
+    merged text reaches max_bytes. Non-text chunks flush the pending text and
+    pass through unchanged, keeping the stream order.
+    """
+
+    def __init__(self, window_ms: float = CHAT_DELTA_WINDOW_MS, max_bytes: int = CHAT_DELTA_MAX_BYTES):
+        self.window = window_ms / 1000.0
+        self.max_bytes = max_bytes
+        self.pending: Optional[Dict[str, Any]] = None
+        self.pending_bytes = 0
+        self.last_sent = float('-inf')
+        self.deltas_in = 0
+        self.frames_out = 0
+
+    def timeout(self, now: float) -> Optional[float]:
+        """Seconds until pending text must be flushed, or None if nothing is pending"""
+        if self.pending is None:
+            return None
+        return max(0.0, self.last_sent + self.window - now)
+
+    def push(self, chunk: Dict[str, Any], now: float) -> List[Dict[str, Any]]:
+        """Add a chunk and return the frames that are ready to send"""
+        if not is_text_delta(chunk):
+            return self.flush(now) + [chunk]
+
+        self.deltas_in += 1
+        if self.pending is None:
+            if now - self.last_sent >= self.window:
+                return self._emit(dict(chunk), now)
+            self.pending = dict(chunk)
+            self.pending_bytes = len(chunk['content'].encode('utf-8'))
+        else:
+            self.pending['content'] += chunk['content']
+            self.pending_bytes += len(chunk['content'].encode('utf-8'))
+
+        if self.pending_bytes >= self.max_bytes:
+            return self.flush(now)
+        return []
+
+    def flush(self, now: float) -> List[Dict[str, Any]]:
+        """Return the pending text as a frame, if any"""
+        if self.pending is None:
+            return []
+        frame, self.pending, self.pending_bytes = self.pending, None, 0
+        return self._emit(frame, now)
+
+    def _emit(self, frame: Dict[str, Any], now: float) -> List[Dict[str, Any]]:
+        self.last_sent = now
+        self.frames_out += 1
+        return [frame]
@@ -2,60 +2,125 @@ import openai
 import os
 import time
 import asyncio
-from typing import Dict, Any, Optional
+import base64
+import itertools
+import uuid
+from typing import Callable, Dict, Any, List, Optional
 from services.base_service import BaseService, ServiceType, ServiceMessage
-from services.speech_recognition_service import SpeechRecognitionService
+from services.speech_recognition_service import SpeechRecognitionService, SpeechSession
 from services.streaming_tts_service import StreamingTTSService
+from services.delta_coalescer import DeltaCoalescer
+from services.sentence_segmenter import SentenceSegmenter
+from services.speech_pipeline import SpeechPipeline, merge_streams
+from services.conversation_memory import ConversationMemory, CHAT_SUMMARY_MAX_TOKENS, CHAT_SUMMARY_MODEL
+from services.session_store import ChatSession, SessionStore, SessionLimitError
+from helpers import resolve_storage_path, subtitle_path_for, generate_session_token, verify_session_token
+from conversation_store import get_conversation_store, CONVERSATION_TTL_S
+from transcript_index import retrieve_passages
 from logger_config import logger
 
-# Import chat service (conditional)
-try:
-    from chat_service import ChatService
-    CHAT_SERVICE_AVAILABLE = True
-except ImportError:
-    logger.warning("ChatService not available, using basic OpenAI client")
-    CHAT_SERVICE_AVAILABLE = False
+# Number of transcript passages injected into a chat request about a video
+CHAT_CONTEXT_PASSAGES = int(os.getenv("CHAT_CONTEXT_PASSAGES", "4"))
+
+# Marks the end of a stream pumped through a tracked task
+_STREAM_END = object()
 
 class EnhancedChatService(BaseService):
     """Enhanced ChatService with streaming capabilities"""
     
     def __init__(self):
         super().__init__(ServiceType.AI_CHAT)
-        if CHAT_SERVICE_AVAILABLE:
-            self.chat_service = ChatService()
-        else:
-            # Create basic OpenAI client
-            self.chat_service = None
-            self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Async client so a streaming answer never blocks the event loop
+        self.openai_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.speech_service = SpeechRecognitionService()
         self.tts_service = StreamingTTSService()
-        self.client_sessions: Dict[str, Dict[str, Any]] = {}
+        # Bounded by idle TTL and count; sessions outlive a connection so a reconnect keeps the conversation
+        self.client_sessions = SessionStore(self._new_session, on_evict=self._evict_session)
+        # Shared with other workers, so a reconnect to any of them continues the conversation
+        self.conversation_store = get_conversation_store()
+        self._audio_stream_ids = itertools.count(1)
+        # Set by the WebSocket server: queues a message for a client outside of a message handler
+        self.send: Optional[Callable[[str, Dict[str, Any]], None]] = None
+    
+    def _new_session(self, client_id: str, session_id: Optional[str] = None) -> ChatSession:
+        session = ChatSession(client_id, session_id)
+        session.memory = self._new_memory(client_id)
+        return session
+    
+    def _new_memory(self, client_id: str) -> ConversationMemory:
+        return ConversationMemory(
+            self._summarize_conversation,
+            spawn=lambda coro: self._track(client_id, asyncio.create_task(coro))
+        )
+    
+    async def _evict_session(self, session: ChatSession):
+        """Cancel the in-flight work of a session that is being dropped"""
+        await self._cancel_tasks(session)
+        if session.connected:
+            await self._save_session(session)
     
     async def handle_connection(self, client_id: str, session_id: Optional[str] = None):
         """Handle new AIChat client connection"""
-        self.client_sessions[client_id] = {
-            'session_id': session_id,
-            'conversation_history': [],
-            'is_listening': False,
-            'speech_confidence_analysis': False,
-            'current_request': None
-        }
-        logger.info(f"AIChat client connected: {client_id}")
+        session = await self.client_sessions.acquire(client_id, session_id)
+        if not session.connected:
+            session.connected = True
+            # client_id is chosen by the client, so a new connection starts empty; only a
+            # connect message carrying the conversation's session token resumes it
+            session.conversation_id = None
+            session.memory = self._new_memory(client_id)
+            session.speech_confidence_analysis = False
+            session.restored = None
+            logger.info(f"AIChat client connected: {client_id}")
+        if session.restored is not None:
+            # Shielded so a cancelled message handler does not abort the load for the others
+            await asyncio.shield(session.restored)
+    
+    async def _restore_session(self, session: ChatSession):
+        """Load the session's saved conversation from the conversation store"""
+        try:
+            state = await self.conversation_store.load(session.conversation_id)
+        except Exception as e:
+            logger.error(f"Failed to load conversation for {session.client_id}: {str(e)}")
+            return
+        if state:
+            session.memory.restore(state['memory'])
+            session.speech_confidence_analysis = state.get('speech_confidence_analysis', False)
+    
+    async def _save_session(self, session: ChatSession):
+        """Write the session's conversation to the conversation store"""
+        if session.conversation_id is None:
+            # Never issued a session token, so nobody could resume it
+            return
+        try:
+            await self.conversation_store.save(session.conversation_id, {
+                'memory': session.memory.to_state(),
+                'speech_confidence_analysis': session.speech_confidence_analysis
+            })
+        except Exception as e:
+            logger.error(f"Failed to save conversation for {session.client_id}: {str(e)}")
     
     async def handle_disconnection(self, client_id: str):
-        """Handle AIChat client disconnection"""
-        if client_id in self.client_sessions:
-            await self.cleanup(client_id)
-            del self.client_sessions[client_id]
+        """Handle AIChat client disconnection; the session stays so a reconnect can resume it"""
+        await self.cleanup(client_id)
         logger.info(f"AIChat client disconnected: {client_id}")
     
     async def handle_message(self, message: ServiceMessage):
         """Handle AIChat specific messages"""
         client_id = message.client_id
         
-        # Ensure client session exists
-        if client_id not in self.client_sessions:
-            await self.handle_connection(client_id)
+        # Ensure client session exists, is loaded and counts as recently used
+        try:
+            await self.handle_connection(client_id, message.session_id)
+        except SessionLimitError as e:
+            logger.warning(f"Refusing AIChat client {client_id}: {str(e)}")
+            yield {
+                "type": "error",
+                "service_type": "ai_chat",
+                "data": {"error": "Server is at capacity, try again later", "code": "session_limit"},
+                "client_id": client_id,
+                "timestamp": time.time()
+            }
+            return
         
         if message.message_type == "connect":
             async for response in self._handle_connect(message):
@@ -84,20 +149,93 @@ class EnhancedChatService(BaseService):
                 "timestamp": time.time()
             }
     
+    def _track(self, client_id: str, task: asyncio.Task) -> asyncio.Task:
+        """Register in-flight work so interrupt and disconnect can cancel it"""
+        tasks = self.client_sessions[client_id].tasks
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return task
+    
+    async def _cancel_tasks(self, session: ChatSession) -> int:
+        """Cancel a session's in-flight work and wait until upstream streams are closed"""
+        if not session.tasks:
+            return 0
+        tasks = list(session.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return len(tasks)
+    
+    async def _run_tracked(self, client_id: str, stream, coalescer: Optional[DeltaCoalescer] = None):
+        """Drive an async generator in a tracked task and re-yield its items.
+        
+        Cancelling the task (interrupt, disconnect) raises CancelledError inside
+        the generator at its current await, so the upstream request is aborted
+        instead of running to completion unobserved. With a coalescer, text
+        deltas are merged into fewer items.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        
+        async def pump():
+            try:
+                async for item in stream:
+                    queue.put_nowait(item)
+            finally:
+                queue.put_nowait(_STREAM_END)
+        
+        task = self._track(client_id, asyncio.create_task(pump()))
+        try:
+            while True:
+                timeout = coalescer.timeout(loop.time()) if coalescer else None
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    for chunk in coalescer.flush(loop.time()):
+                        yield chunk
+                    continue
+                if item is _STREAM_END:
+                    break
+                for chunk in coalescer.push(item, loop.time()) if coalescer else (item,):
+                    yield chunk
+            if coalescer:
+                for chunk in coalescer.flush(loop.time()):
+                    yield chunk
+                logger.debug(f"Coalesced {coalescer.deltas_in} deltas into {coalescer.frames_out} frames")
+        finally:
+            # The consumer went away (e.g. the connection task was cancelled)
+            task.cancel()
+        
+        if not task.cancelled():
+            task.result()
+    
     async def _handle_connect(self, message: ServiceMessage):
         """Handle initial connection with configuration"""
         client_id = message.client_id
         config = message.data
+        session = self.client_sessions[client_id]
         
-        self.client_sessions[client_id]['speech_confidence_analysis'] = config.get(
-            'speech_confidence_analysis', False
+        conversation_id = verify_session_token(config.get('session_token'), max_age=CONVERSATION_TTL_S)
+        if conversation_id is not None and conversation_id != session.conversation_id:
+            # Another worker may have continued the conversation since this one last saw it
+            session.conversation_id = conversation_id
+            session.memory = self._new_memory(client_id)
+            session.restored = asyncio.create_task(self._restore_session(session))
+            await asyncio.shield(session.restored)
+        elif session.conversation_id is None:
+            session.conversation_id = uuid.uuid4().hex
+        
+        session.speech_confidence_analysis = config.get(
+            'speech_confidence_analysis', session.speech_confidence_analysis
         )
         
         yield {
             "type": "connect_ack",
             "service_type": "ai_chat",
             "supported_features": ["streaming", "speech_recognition", "tts"],
-            "speech_confidence_analysis": self.client_sessions[client_id]['speech_confidence_analysis']
+            "speech_confidence_analysis": session.speech_confidence_analysis,
+            # Sent back in the next connect message to resume this conversation
+            "session_token": generate_session_token(session.conversation_id)
         }
     
     async def _handle_chat_request(self, message: ServiceMessage):
@@ -106,19 +244,32 @@ class EnhancedChatService(BaseService):
         request_data = message.data
         
         # Store current request for potential interruption
-        self.client_sessions[client_id]['current_request'] = request_data
+        self.client_sessions[client_id].current_request = request_data
         
         try:
             # Get system prompt from config or use default
             system_prompt = request_data.get('prompt') or self._get_default_system_prompt()
             
-            # Stream chat response
-            async for chunk in self._stream_chat_response(
+            # Ground the answer in the transcript of the video being watched
+            context_message = await self._build_transcript_context(
+                request_data.get('video_key'),
+                request_data.get('lang', 'en'),
+                request_data['message']
+            )
+            
+            # Stream chat response from a tracked task so an interrupt can cancel it
+            # Text deltas are merged per CHAT_DELTA_WINDOW_MS; the first one goes out immediately
+            async for chunk in self._run_tracked(client_id, self._stream_chat_response(
                 client_id=client_id,
                 user_instructions=request_data['message'],
                 system_prompt=system_prompt,
-                speech_confidence_analysis=request_data.get('speech_confidence_analysis', False)
-            ):
+                speech_confidence_analysis=request_data.get('speech_confidence_analysis', False),
+                context_message=context_message
+            ), coalescer=DeltaCoalescer()):
+                if 'type' in chunk:
+                    # Audio and control messages are already complete messages
+                    yield chunk
+                    continue
                 yield {
                     "type": "chat_response_chunk",
                     "service_type": "ai_chat",
@@ -126,7 +277,6 @@ class EnhancedChatService(BaseService):
                     "client_id": client_id,
                     "timestamp": time.time()
                 }
-            
         
         except Exception as e:
             logger.error(f"Error in chat request: {str(e)}")
@@ -137,98 +287,106 @@ class EnhancedChatService(BaseService):
                 "client_id": client_id,
                 "timestamp": time.time()
             }
+        finally:
+            session = self.client_sessions.get(client_id)
+            if session is not None and session.current_request is request_data:
+                session.current_request = None
+    
+    async def _build_transcript_context(self, video_key: Optional[str], lang: str, query: str):
+        """Retrieve the transcript passages relevant to a question as a system message"""
+        if not video_key:
+            return None
+        
+        vtt_path = resolve_storage_path(os.path.join(*subtitle_path_for(video_key, lang)))
+        if not vtt_path or not os.path.exists(vtt_path):
+            logger.warning(f"No {lang} transcript for {video_key}, answering without context")
+            return None
+        
+        try:
+            passages = await asyncio.to_thread(retrieve_passages, vtt_path, query, CHAT_CONTEXT_PASSAGES)
+        except Exception as e:
+            logger.error(f"Transcript retrieval failed for {video_key}: {str(e)}")
+            return None
+        
+        if not passages:
+            return None
+        
+        excerpts = "\n\n".join(
+            f"[{self._format_time(p['start'])} - {self._format_time(p['end'])}] {p['text']}"
+            for p in passages
+        )
+        return {
+            'role': 'system',
+            'content': (
+                'Relevant excerpts from the transcript of the video the user is watching '
+                f'(timestamps are positions in the video):\n\n{excerpts}'
+            )
+        }
+    
+    @staticmethod
+    def _format_time(seconds: float) -> str:
+        minutes, secs = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
     
     async def _stream_chat_response(self, client_id: str, user_instructions: str, 
-                                   system_prompt: str, speech_confidence_analysis: bool):
-        """Stream chat response using OpenAI"""
+                                   system_prompt: str, speech_confidence_analysis: bool,
+                                   context_message: Optional[Dict[str, str]] = None):
+        """Stream chat response using OpenAI.
+        
+        With speech enabled, completed sentences are handed to TTS while the
+        model keeps generating, so audio starts after the first sentence
+        rather than after the whole answer.
+        """
+        response = None
+        pipeline = None
         try:
-            if CHAT_SERVICE_AVAILABLE:
-                # Use existing chat service
-                if client_id not in self.chat_service.conversations:
-                    self.chat_service.conversations[client_id] = [{
-                        'role': 'system',
-                        'content': system_prompt
-                    }]
-                
-                self.chat_service.conversations[client_id].append({
-                    'role': 'user', 
-                    'content': user_instructions
-                })
-                
-                response = self.chat_service.client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=self.chat_service.conversations[client_id],
-                    temperature=0.5,
-                    stream=True
-                )
-                
-                assistant_message = ""
-                for chunk in response:
-                    if chunk.choices[0].delta.content:
-                        content = chunk.choices[0].delta.content
-                        assistant_message += content
-                        yield {
-                            'content': content,
-                            'timestamp': time.time()
-                        }
-                
-                self.chat_service.conversations[client_id].append({
-                    'role': 'assistant', 
-                    'content': assistant_message
-                })
-                
-                # Generate TTS audio if speech confidence analysis is enabled
-                if speech_confidence_analysis and assistant_message.strip():
-                    try:
-                        logger.info(f"Generating TTS audio for message: {assistant_message[:50]}...")
-                        async for audio_chunk in self.tts_service.stream_audio(assistant_message):
-                            yield {
-                                "type": "audio_chunk",
-                                "service_type": "ai_chat",
-                                "data": audio_chunk,
-                                "client_id": client_id,
-                                "timestamp": time.time()
-                            }
-                    except Exception as e:
-                        logger.error(f"Error generating TTS audio: {str(e)}")
-            else:
-                # Use basic OpenAI client
-                messages = [
-                    {'role': 'system', 'content': system_prompt},
-                    {'role': 'user', 'content': user_instructions}
-                ]
-                
-                response = self.openai_client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=messages,
-                    temperature=0.5,
-                    stream=True
-                )
-                
-                assistant_message = ""
-                for chunk in response:
-                    if chunk.choices[0].delta.content:
+            # Recent turns within the token budget plus a summary of the older ones;
+            # transcript context is sent with this request only, never stored in the history
+            session = self.client_sessions[client_id]
+            memory = session.memory
+            memory.add('user', user_instructions)
+            messages = memory.messages(system_prompt, context_message)
+            logger.debug(f"Chat prompt for {client_id}: {memory.last_prompt_tokens} tokens")
+            
+            response = await self.openai_client.chat.completions.create(
+                model="gpt-4o",
+                messages=messages,
+                temperature=0.5,
+                stream=True
+            )
+            
+            # Generate TTS audio if speech confidence analysis is enabled
+            if speech_confidence_analysis:
+                pipeline = SpeechPipeline(self.tts_service.stream_audio)
+            segmenter = SentenceSegmenter()
+            assistant_parts = []
+            
+            async def text_deltas():
+                async for chunk in response:
+                    if chunk.choices and chunk.choices[0].delta.content:
                         content = chunk.choices[0].delta.content
-                        assistant_message += content
+                        assistant_parts.append(content)
                         yield {
                             'content': content,
                             'timestamp': time.time()
                         }
-                
-                # Generate TTS audio if speech confidence analysis is enabled
-                if speech_confidence_analysis and assistant_message.strip():
-                    try:
-                        logger.info(f"Generating TTS audio for message: {assistant_message[:50]}...")
-                        async for audio_chunk in self.tts_service.stream_audio(assistant_message):
-                            yield {
-                                "type": "audio_chunk",
-                                "service_type": "ai_chat",
-                                "data": audio_chunk,
-                                "client_id": client_id,
-                                "timestamp": time.time()
-                            }
-                    except Exception as e:
-                        logger.error(f"Error generating TTS audio: {str(e)}")
+                        if pipeline:
+                            for sentence in segmenter.feed(content):
+                                pipeline.submit(sentence)
+                if pipeline:
+                    for sentence in segmenter.flush():
+                        pipeline.submit(sentence)
+                    pipeline.close()
+            
+            streams = [text_deltas()]
+            if pipeline:
+                streams.append(self._stream_tts(client_id, pipeline))
+            async for item in merge_streams(*streams):
+                yield item
+            
+            memory.add('assistant', "".join(assistant_parts))
+            await self._save_session(session)
             
         except Exception as e:
             logger.error(f"Error streaming chat response: {str(e)}")
@@ -236,11 +394,97 @@ class EnhancedChatService(BaseService):
                 'content': f"Sorry, I encountered an error: {str(e)}",
                 'timestamp': time.time()
             }
+        finally:
+            if pipeline:
+                pipeline.cancel()
+            # Release the upstream HTTP connection, also when cancelled mid-stream
+            if response is not None:
+                await response.close()
+    
+    async def _summarize_conversation(self, summary: str, turns):
+        """Fold conversation turns into the running summary"""
+        transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        response = await self.openai_client.chat.completions.create(
+            model=CHAT_SUMMARY_MODEL,
+            messages=[
+                {'role': 'system', 'content': (
+                    'Update the summary of a tutoring conversation with the new turns. '
+                    'Keep the facts, questions and answers the tutor may need to refer back to; '
+                    'reply with the updated summary only.'
+                )},
+                {'role': 'user', 'content': f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"}
+            ],
+            temperature=0,
+            max_tokens=CHAT_SUMMARY_MAX_TOKENS
+        )
+        return response.choices[0].message.content.strip()
+    
+    async def _stream_tts(self, client_id: str, pipeline: SpeechPipeline):
+        """Yield the audio of a spoken answer as audio_chunk messages of one audio stream.
+        
+        The audio bytes are sent as binary frames (see audio_frames) whose
+        sequence numbers run across all sentences. An audio_start control
+        message announces the stream id and codec, an audio_segment message
+        marks where each sentence begins, and an empty frame flagged final
+        ends the stream.
+        """
+        stream_id = None
+        codec = self.tts_service.codec
+        seq = 0
+        try:
+            async for index, text, chunks in pipeline.segments():
+                if stream_id is None:
+                    stream_id = next(self._audio_stream_ids) & 0xFFFFFFFF
+                    yield {
+                        "type": "audio_start",
+                        "service_type": "ai_chat",
+                        "data": {"stream_id": stream_id, "codec": codec},
+                        "client_id": client_id,
+                        "timestamp": time.time()
+                    }
+                yield {
+                    "type": "audio_segment",
+                    "service_type": "ai_chat",
+                    "data": {"stream_id": stream_id, "segment": index, "seq": seq, "text": text},
+                    "client_id": client_id,
+                    "timestamp": time.time()
+                }
+                async for audio_chunk in chunks:
+                    if 'error' in audio_chunk:
+                        raise RuntimeError(audio_chunk['error'])
+                    yield self._audio_message(client_id, stream_id, seq, codec, audio_chunk['audio_chunk'])
+                    seq += 1
+        except Exception as e:
+            logger.error(f"Error generating TTS audio: {str(e)}")
+            yield {
+                "type": "error",
+                "service_type": "ai_chat",
+                "data": {"error": f"TTS failed: {str(e)}", "stream_id": stream_id},
+                "client_id": client_id,
+                "timestamp": time.time()
+            }
+        finally:
+            pipeline.cancel()
+        
+        if stream_id is not None:
+            yield self._audio_message(client_id, stream_id, seq, codec, b"", is_final=True)
+    
+    @staticmethod
+    def _audio_message(client_id: str, stream_id: int, seq: int, codec: str, audio: bytes, is_final: bool = False):
+        return {
+            "type": "audio_chunk",
+            "service_type": "ai_chat",
+            "data": {"audio": audio, "stream_id": stream_id, "seq": seq, "codec": codec, "is_final": is_final},
+            "client_id": client_id,
+            "timestamp": time.time()
+        }
     
     async def _handle_speech_start(self, message: ServiceMessage):
         """Handle speech recognition start"""
         client_id = message.client_id
-        self.client_sessions[client_id]['is_listening'] = True
+        session = self.client_sessions[client_id]
+        session.is_listening = True
+        session.speech = self._new_speech_session(client_id)
         
         yield {
             "type": "speech_start_ack",
@@ -250,42 +494,73 @@ class EnhancedChatService(BaseService):
             "timestamp": time.time()
         }
     
-    async def _handle_speech_data(self, message: ServiceMessage):
-        """Handle incoming speech data"""
-        client_id = message.client_id
-        audio_data = message.data['audio_data']
-        
-        # Transcribe audio
-        transcription = await self.speech_service.transcribe_audio(
-            audio_data,
-            use_microsoft=self.client_sessions[client_id]['speech_confidence_analysis']
+    def _new_speech_session(self, client_id: str) -> SpeechSession:
+        return SpeechSession(
+            self.speech_service,
+            # Transcriptions are tracked so an interrupt aborts the upload
+            spawn=lambda coro: self._track(client_id, asyncio.create_task(coro)),
+            use_microsoft=self.client_sessions[client_id].speech_confidence_analysis,
+            # Transcripts go out as soon as they are ready instead of with the next message
+            on_results=(lambda results: self._push_speech_results(client_id, results)) if self.send else None
         )
-        
-        if transcription:
-            yield {
-                "type": "speech_transcription",
-                "service_type": "ai_chat",
-                "data": {
-                    "text": transcription['text'],
-                    "confidence": transcription.get('confidence'),
-                    "is_final": transcription.get('is_final', False)
-                },
-                "client_id": client_id,
-                "timestamp": time.time()
-            }
-        else:
-            yield {
+    
+    def _push_speech_results(self, client_id: str, results: List[Dict[str, Any]]):
+        for result in results:
+            self.send(client_id, self._speech_transcription_message(client_id, result))
+    
+    def _speech_transcription_message(self, client_id: str, result: Dict[str, Any]):
+        if 'error' in result:
+            return {
                 "type": "error",
                 "service_type": "ai_chat",
-                "data": {"error": "Transcription failed"},
+                "data": {"error": result['error'], "utterance": result['utterance']},
                 "client_id": client_id,
                 "timestamp": time.time()
             }
+        return {
+            "type": "speech_transcription",
+            "service_type": "ai_chat",
+            "data": result,
+            "client_id": client_id,
+            "timestamp": time.time()
+        }
+    
+    async def _handle_speech_data(self, message: ServiceMessage):
+        """Handle incoming speech data
+        
+        Audio is buffered per session and only complete utterances are sent to
+        Whisper. Transcripts are pushed as soon as they finish; without a send
+        hook they are returned with the next speech_data or speech_end message.
+        """
+        client_id = message.client_id
+        session = self.client_sessions[client_id]
+        audio_data = message.data['audio_data']
+        if isinstance(audio_data, str):
+            # Legacy JSON clients send base64; binary audio frames carry raw bytes
+            audio_data = base64.b64decode(audio_data)
+        if session.speech is None:
+            session.speech = self._new_speech_session(client_id)
+        speech = session.speech
+        
+        # Legacy messages without a stream id each carry a complete recording
+        is_final = message.data.get('is_final', False) or 'stream_id' not in message.data
+        speech.feed(audio_data, message.data.get('codec', 'wav'), final=is_final)
+        results = await speech.drain() if is_final else speech.completed()
+        
+        for result in results:
+            yield self._speech_transcription_message(client_id, result)
     
     async def _handle_speech_end(self, message: ServiceMessage):
         """Handle speech recognition end"""
         client_id = message.client_id
-        self.client_sessions[client_id]['is_listening'] = False
+        session = self.client_sessions[client_id]
+        session.is_listening = False
+        
+        speech, session.speech = session.speech, None
+        if speech is not None:
+            speech.end()
+            for result in await speech.drain():
+                yield self._speech_transcription_message(client_id, result)
         
         yield {
             "type": "speech_end_ack",
@@ -299,29 +574,33 @@ class EnhancedChatService(BaseService):
         """Handle conversation interruption"""
         client_id = message.client_id
         
-        # Cancel current request if any
-        if self.client_sessions[client_id]['current_request']:
-            # Implementation for canceling ongoing requests
-            self.client_sessions[client_id]['current_request'] = None
+        # Cancel in-flight chat, TTS and transcription work
+        session = self.client_sessions[client_id]
+        cancelled = await self._cancel_tasks(session)
+        session.current_request = None
+        logger.info(f"Interrupted {cancelled} task(s) for {client_id}")
         
         yield {
             "type": "interrupt_ack",
             "service_type": "ai_chat",
-            "data": {"status": "interrupted"},
+            "data": {"status": "interrupted", "cancelled": cancelled},
             "client_id": client_id,
             "timestamp": time.time()
         }
     
     async def cleanup(self, client_id: str):
         """Cleanup AIChat resources for client"""
-        if client_id in self.client_sessions:
-            session = self.client_sessions[client_id]
-            if session['is_listening']:
-                # Stop speech recognition
-                pass
-            if session['current_request']:
-                # Cancel ongoing request
-                pass
+        session = self.client_sessions.get(client_id)
+        if session is not None:
+            # The session and its conversation stay until they expire, so a reconnect can resume
+            await self._cancel_tasks(session)
+            if session.connected:
+                await self._save_session(session)
+            session.connected = False
+            session.last_active = time.monotonic()
+            session.is_listening = False
+            session.current_request = None
+            session.speech = None
     
     def _get_default_system_prompt(self):
         """Get default system prompt"""
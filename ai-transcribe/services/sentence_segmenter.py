@@ -0,0 +1,56 @@
+import os
+import re
+from typing import List
+
+# Shorter fragments are kept and prepended to the next sentence
+TTS_MIN_SENTENCE_CHARS = int(os.getenv("TTS_MIN_SENTENCE_CHARS", "12"))
+# Long runs without a sentence end are cut at a clause boundary
+TTS_MAX_SENTENCE_CHARS = int(os.getenv("TTS_MAX_SENTENCE_CHARS", "200"))
+
+# Terminal punctuation (with closing quotes/brackets) followed by whitespace; CJK needs no space
+_SENTENCE_END = re.compile(r'[.!?…]+["\'”’)\]]*\s+|[。！？]+')
+_CLAUSE_END = re.compile(r'[,;:—、，]\s+')
+_ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "prof", "st", "vs", "etc", "e.g", "i.e", "z.b", "bzw", "ca"}
+
+
+class SentenceSegmenter:
+    """Cuts a stream of text deltas into sentences (or clauses) for speech synthesis"""
+
+    def __init__(self, min_chars: int = TTS_MIN_SENTENCE_CHARS, max_chars: int = TTS_MAX_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add a delta and return the sentences it completed"""
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self.buffer):
+            candidate = self.buffer[start:match.end()].strip()
+            if len(candidate) < self.min_chars or self._ends_with_abbreviation(candidate):
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+
+        # No sentence end in sight: speak up to the last clause boundary (or word) instead
+        while len(self.buffer) > self.max_chars:
+            head = self.buffer[:self.max_chars]
+            clauses = list(_CLAUSE_END.finditer(head))
+            cut = clauses[-1].end() if clauses else head.rfind(" ") + 1
+            if cut <= 0:
+                cut = self.max_chars
+            sentences.append(self.buffer[:cut].strip())
+            self.buffer = self.buffer[cut:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Return whatever text is left at the end of the stream"""
+        rest, self.buffer = self.buffer.strip(), ""
+        return [rest] if rest else []
+
+    @staticmethod
+    def _ends_with_abbreviation(sentence: str) -> bool:
+        words = sentence.rstrip("\"'”’)]").split()
+        return bool(words) and words[-1].rstrip(".").lower() in _ABBREVIATIONS
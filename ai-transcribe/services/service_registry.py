@@ -1,3 +1,4 @@
+import asyncio
 from typing import Dict, Type
 from .base_service import BaseService, ServiceType
 
@@ -23,10 +24,12 @@ class ServiceRegistry:
         
         return self._services[service_type]
     
-    def cleanup_client(self, client_id: str):
-        """Cleanup all services for a client"""
-        for service in self._services.values():
-            service.cleanup(client_id)
+    async def cleanup_client(self, client_id: str):
+        """Cleanup all services for a client, cancelling their in-flight work"""
+        await asyncio.gather(
+            *(service.cleanup(client_id) for service in self._services.values()),
+            return_exceptions=True
+        )
     
     def get_supported_services(self) -> list:
         """Get list of supported service types"""
@@ -0,0 +1,158 @@
+import asyncio
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from logger_config import logger
+
+# Sessions without a connection are dropped after this long; a reconnect within it keeps the conversation
+SESSION_IDLE_TTL_S = float(os.getenv("SESSION_IDLE_TTL_S", "1800"))
+# At most this many sessions; least recently used disconnected ones make room, then new clients are refused
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "1000"))
+SESSION_SWEEP_INTERVAL_S = float(os.getenv("SESSION_SWEEP_INTERVAL_S", "60"))
+
+
+class ChatSession:
+    """State of one AI chat client"""
+
+    __slots__ = (
+        'client_id', 'session_id', 'conversation_id', 'memory', 'is_listening', 'speech_confidence_analysis',
+        'current_request', 'speech', 'tasks', 'connected', 'restored', 'last_active'
+    )
+
+    def __init__(self, client_id: str, session_id: Optional[str] = None):
+        self.client_id = client_id
+        self.session_id = session_id
+        # Server-issued key of the saved conversation; set by a connect message
+        self.conversation_id = None
+        self.memory = None
+        self.is_listening = False
+        self.speech_confidence_analysis = False
+        self.current_request = None
+        self.speech = None
+        self.tasks = set()
+        self.connected = False
+        # Loads the saved conversation when the client (re)connects
+        self.restored = None
+        self.last_active = time.monotonic()
+
+    def approx_bytes(self) -> int:
+        """Rough size of the session: the object itself plus buffered text and audio"""
+        size = sys.getsizeof(self) + sys.getsizeof(self.tasks)
+        if self.memory is not None:
+            size += self.memory.approx_bytes()
+        if self.speech is not None:
+            size += self.speech.approx_bytes()
+        return size
+
+
+class SessionLimitError(Exception):
+    """Raised for a new client when every session up to the limit is connected"""
+
+
+class SessionStore:
+    """Chat sessions by client id, bounded by an idle TTL and a maximum count.
+
+    Disconnected sessions expire after `ttl` seconds, and the least recently
+    used disconnected ones make room for new clients at `max_sessions`.
+    Connected sessions are never evicted; when all of them are connected a
+    new client is refused with SessionLimitError. `on_evict` is awaited for
+    every session that is dropped, so in-flight work is cancelled before its
+    state goes away.
+    """
+
+    def __init__(self, factory: Callable[[str, Optional[str]], ChatSession],
+                 on_evict: Callable[[ChatSession], Awaitable[None]],
+                 ttl: float = SESSION_IDLE_TTL_S, max_sessions: int = SESSION_MAX_COUNT,
+                 sweep_interval: float = SESSION_SWEEP_INTERVAL_S):
+        self.factory = factory
+        self.on_evict = on_evict
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._last_sweep = time.monotonic()
+        self.stats = {"created": 0, "expired": 0, "evicted": 0, "refused": 0}
+
+    def __contains__(self, client_id: str) -> bool:
+        return client_id in self._sessions
+
+    def __getitem__(self, client_id: str) -> ChatSession:
+        return self._sessions[client_id]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, client_id: str) -> Optional[ChatSession]:
+        return self._sessions.get(client_id)
+
+    async def acquire(self, client_id: str, session_id: Optional[str] = None) -> ChatSession:
+        """Return the client's session, creating it if needed, and mark it as recently used.
+
+        Raises SessionLimitError if a new session is needed and there is no room for it.
+        """
+        session = self._sessions.get(client_id)
+        if session is None:
+            if len(self._sessions) >= self.max_sessions:
+                await self.sweep(room=1)
+                if len(self._sessions) >= self.max_sessions:
+                    self.stats["refused"] += 1
+                    raise SessionLimitError(f"Chat session limit of {self.max_sessions} reached")
+            session = self.factory(client_id, session_id)
+            self._sessions[client_id] = session
+            self.stats["created"] += 1
+        else:
+            self._sessions.move_to_end(client_id)
+        session.last_active = time.monotonic()
+
+        if session.last_active - self._last_sweep >= self.sweep_interval:
+            await self.sweep(keep=client_id)
+        return session
+
+    async def remove(self, client_id: str):
+        session = self._sessions.pop(client_id, None)
+        if session is not None:
+            await self._evict(session)
+
+    async def sweep(self, keep: Optional[str] = None, room: int = 0):
+        """Drop expired sessions, then least recently used disconnected ones until `room`
+        sessions fit under the limit. Connected sessions and `keep` are never dropped."""
+        now = time.monotonic()
+        self._last_sweep = now
+        # OrderedDict order is least recently used first
+        disconnected = [
+            session for session in self._sessions.values()
+            if not session.connected and session.client_id != keep
+        ]
+        expired = [session for session in disconnected if now - session.last_active > self.ttl]
+        self.stats["expired"] += len(expired)
+
+        excess = len(self._sessions) - len(expired) - (self.max_sessions - room)
+        victims = []
+        if excess > 0:
+            expired_ids = {session.client_id for session in expired}
+            victims = [session for session in disconnected if session.client_id not in expired_ids][:excess]
+            self.stats["evicted"] += len(victims)
+
+        dropped = expired + victims
+        for session in dropped:
+            del self._sessions[session.client_id]
+        if dropped:
+            await asyncio.gather(*(self._evict(session) for session in dropped))
+            logger.info(f"Dropped {len(expired)} expired and {len(victims)} least recently used chat sessions")
+
+    async def _evict(self, session: ChatSession):
+        try:
+            await self.on_evict(session)
+        except Exception as e:
+            logger.error(f"Cleanup of chat session {session.client_id} failed: {str(e)}")
+
+    def metrics(self) -> Dict[str, Any]:
+        return dict(
+            self.stats,
+            sessions=len(self._sessions),
+            connected=sum(1 for session in self._sessions.values() if session.connected),
+            approx_bytes=sum(session.approx_bytes() for session in self._sessions.values())
+        )
@@ -0,0 +1,104 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Callable, Dict, List
+
+# Sentences synthesized ahead of the one currently being played out
+TTS_PIPELINE_CONCURRENCY = int(os.getenv("TTS_PIPELINE_CONCURRENCY", "3"))
+
+_END = object()
+
+
+class SpeechPipeline:
+    """Synthesizes sentences concurrently while emitting their audio in order.
+
+    Sentences are submitted while the LLM is still generating; up to
+    `concurrency` of them are synthesized at once, and `segments()` hands them
+    out in submission order, each as a stream of audio chunks that starts
+    flowing as soon as its synthesis does.
+    """
+
+    def __init__(self, synthesize: Callable[[str], AsyncIterator[Dict[str, Any]]],
+                 concurrency: int = TTS_PIPELINE_CONCURRENCY):
+        self._synthesize = synthesize
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._segments: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._cancelled = False
+
+    def submit(self, text: str):
+        """Queue a sentence for synthesis"""
+        if self._cancelled:
+            return
+        chunks: asyncio.Queue = asyncio.Queue()
+        self._tasks.append(asyncio.create_task(self._run(text, chunks)))
+        self._segments.put_nowait((text, chunks))
+
+    def close(self):
+        """No more sentences will be submitted"""
+        self._segments.put_nowait(_END)
+
+    def cancel(self):
+        self._cancelled = True
+        for task in self._tasks:
+            task.cancel()
+
+    async def _run(self, text: str, chunks: asyncio.Queue):
+        try:
+            # Semaphore waiters are woken in FIFO order, so sentences start in order
+            async with self._semaphore:
+                async for chunk in self._synthesize(text):
+                    chunks.put_nowait(chunk)
+        except Exception as e:
+            chunks.put_nowait({'error': str(e)})
+        finally:
+            chunks.put_nowait(_END)
+
+    async def segments(self):
+        """Yield (index, text, chunks) in submission order; chunks is an async iterator of audio dicts"""
+        index = 0
+        while True:
+            segment = await self._segments.get()
+            if segment is _END:
+                return
+            text, chunks = segment
+            yield index, text, self._drain(chunks)
+            index += 1
+
+    @staticmethod
+    async def _drain(chunks: asyncio.Queue):
+        while True:
+            chunk = await chunks.get()
+            if chunk is _END:
+                return
+            yield chunk
+
+
+async def merge_streams(*streams):
+    """Yield items from several async generators as they arrive"""
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump(stream):
+        try:
+            async for item in stream:
+                queue.put_nowait((True, item))
+        except BaseException as e:
+            queue.put_nowait((False, e))
+            raise
+        finally:
+            queue.put_nowait((False, None))
+
+    tasks = [asyncio.create_task(pump(stream)) for stream in streams]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            is_item, value = await queue.get()
+            if is_item:
+                yield value
+            elif value is None:
+                remaining -= 1
+            elif not isinstance(value, asyncio.CancelledError):
+                raise value
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
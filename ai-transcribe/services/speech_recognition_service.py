@@ -1,11 +1,18 @@
+import asyncio
 import openai
 import os
 import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+from services.voice_activity import VoiceActivityDetector, pcm16_to_wav
 from logger_config import logger
 
+# Compressed audio buffered per stream; about 20 minutes of 48 kbit/s Opus, under Whisper's 25 MB upload limit
+SPEECH_MAX_ENCODED_BYTES = int(os.getenv("SPEECH_MAX_ENCODED_BYTES", str(8 * 1024 * 1024)))
+
 class SpeechRecognitionService:
     def __init__(self):
-        self.whisper_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.whisper_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.microsoft_speech = None
         
     def initialize_microsoft_speech(self):
@@ -23,18 +30,19 @@ class SpeechRecognitionService:
         except Exception as e:
             logger.error(f"Failed to initialize Microsoft Speech SDK: {e}")
     
-    async def transcribe_audio(self, audio_data, use_microsoft=False):
+    async def transcribe_audio(self, audio_data, use_microsoft=False, audio_format="wav"):
         """
         Transcribe audio using either OpenAI Whisper or Microsoft Speech
         
         Args:
             audio_data: Audio data to transcribe
             use_microsoft: Whether to use Microsoft Speech SDK
+            audio_format: Container/codec of audio_data (file extension, e.g. wav, webm)
         """
         if use_microsoft and self.microsoft_speech:
             return await self._transcribe_with_microsoft(audio_data)
         else:
-            return await self._transcribe_with_whisper(audio_data)
+            return await self._transcribe_with_whisper(audio_data, audio_format)
     
     async def _transcribe_with_microsoft(self, audio_data):
         """Transcribe using Microsoft Speech SDK with confidence scoring"""
@@ -52,38 +60,149 @@ class SpeechRecognitionService:
             logger.error(f"Microsoft speech transcription error: {str(e)}")
             return None
     
-    async def _transcribe_with_whisper(self, audio_data):
+    async def _transcribe_with_whisper(self, audio_data, audio_format="wav"):
         """Transcribe using OpenAI Whisper"""
         try:
-            # Convert audio_data to file-like object if needed
-            import tempfile
-            import io
-            
-            # Create a temporary file for the audio data
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                temp_file.write(audio_data)
-                temp_file_path = temp_file.name
+            # Upload straight from memory; the SDK only needs a file name for the format
+            response = await self.whisper_client.audio.transcriptions.create(
+                model="whisper-1",
+                file=(f"speech.{audio_format}", audio_data),
+                response_format="verbose_json"
+            )
             
-            try:
-                with open(temp_file_path, "rb") as audio_file:
-                    response = self.whisper_client.audio.transcriptions.create(
-                        model="whisper-1",
-                        file=audio_file,
-                        response_format="verbose_json"
-                    )
-                
-                return {
-                    'text': response.text,
-                    'confidence': 1.0,  # Whisper doesn't provide confidence scores
-                    'segments': response.segments,
-                    'is_final': True
-                }
-            finally:
-                # Clean up temporary file
-                import os
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
+            return {
+                'text': response.text,
+                'confidence': 1.0,  # Whisper doesn't provide confidence scores
+                'segments': response.segments,
+                'is_final': True
+            }
                     
         except Exception as e:
             logger.error(f"Whisper transcription error: {str(e)}")
-            return None 
\ No newline at end of file
+            return None
+
+
+class SpeechSession:
+    """Buffers one client's microphone audio and transcribes it per utterance.
+    
+    Raw PCM (codec pcm16) goes through voice activity detection, so Whisper
+    only sees complete utterances (plus optional interim snapshots) instead of
+    every fragment. Compressed streams (webm, opus, ...) cannot be split
+    without decoding and are transcribed whole when the client marks the end
+    of the stream, or once they reach `max_encoded_bytes`; the rest of such a
+    stream is dropped with an error result.
+    
+    Transcriptions run as tasks created through `spawn`. Each finished task
+    hands the results that are ready, in utterance order, to `on_results`;
+    without it `completed()` returns them without waiting.
+    """
+    
+    def __init__(self, service: SpeechRecognitionService, spawn: Callable, use_microsoft: bool = False,
+                 on_results: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                 max_encoded_bytes: int = SPEECH_MAX_ENCODED_BYTES):
+        self.service = service
+        self.spawn = spawn
+        self.use_microsoft = use_microsoft
+        self.on_results = on_results
+        self.max_encoded_bytes = max_encoded_bytes
+        self.detector = VoiceActivityDetector()
+        self.encoded = bytearray()
+        self.codec = None
+        # Set once a compressed stream hit the size cap; its remaining audio is dropped
+        self.truncated = False
+        self.utterance = 0
+        self.pending = deque()
+        self.whisper_calls = 0
+    
+    def feed(self, audio: bytes, codec: str, final: bool = False):
+        """Add audio from one speech_data message; final marks the end of the client's stream"""
+        if codec == "pcm16":
+            for kind, pcm in self.detector.feed(audio):
+                self._transcribe(kind, pcm16_to_wav(pcm, self.detector.sample_rate), "wav")
+        elif not self.truncated:
+            if len(self.encoded) + len(audio) > self.max_encoded_bytes:
+                # The buffered prefix is still a valid recording; later chunks are not without it
+                self.truncated = True
+                utterance = self.utterance
+                self.end()
+                self._report_error(
+                    utterance, f"Recording exceeds {self.max_encoded_bytes} bytes, the rest was not transcribed"
+                )
+            else:
+                self.encoded += audio
+                self.codec = codec
+        if final:
+            self.end()
+            self.truncated = False
+    
+    def end(self):
+        """Transcribe whatever is buffered as a final utterance"""
+        for kind, pcm in self.detector.flush():
+            self._transcribe(kind, pcm16_to_wav(pcm, self.detector.sample_rate), "wav")
+        if self.encoded:
+            self._transcribe("final", bytes(self.encoded), self.codec)
+            self.encoded.clear()
+    
+    def _transcribe(self, kind: str, audio: bytes, audio_format: str):
+        is_final = kind == "final"
+        if not is_final and any(not task.done() for _, _, task in self.pending):
+            # An interim result would arrive after fresher audio anyway
+            return
+        self.whisper_calls += 1
+        task = self.spawn(self.service.transcribe_audio(audio, use_microsoft=self.use_microsoft, audio_format=audio_format))
+        self._add_pending(self.utterance, is_final, task)
+        if is_final:
+            self.utterance += 1
+    
+    def _report_error(self, utterance: int, error: str):
+        """Queue an error result behind the transcriptions already pending"""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result({'error': error})
+        self._add_pending(utterance, True, future)
+    
+    def _add_pending(self, utterance: int, is_final: bool, task: asyncio.Future):
+        self.pending.append((utterance, is_final, task))
+        if self.on_results is not None:
+            task.add_done_callback(self._push_completed)
+    
+    def _push_completed(self, _task: asyncio.Future):
+        results = self.completed()
+        if results:
+            self.on_results(results)
+    
+    def approx_bytes(self) -> int:
+        detector = self.detector
+        buffered = len(detector._utterance or b"") + len(detector._remainder) + sum(len(f) for f in detector._pre_roll)
+        return buffered + len(self.encoded)
+    
+    def completed(self) -> List[Dict[str, Any]]:
+        """Finished transcriptions not yet handed out, in order, as speech_transcription payloads"""
+        results = []
+        while self.pending and self.pending[0][2].done():
+            utterance, is_final, task = self.pending.popleft()
+            if task.cancelled():
+                continue
+            transcription = task.exception() is None and task.result()
+            if not transcription or 'error' in transcription:
+                if is_final:
+                    error = transcription['error'] if transcription else "Transcription failed"
+                    results.append({"error": error, "utterance": utterance})
+                continue
+            if not is_final and any(u == utterance and f for u, f, _ in self.pending):
+                # The final transcript of this utterance is already on its way
+                continue
+            results.append({
+                "text": transcription['text'],
+                "confidence": transcription.get('confidence'),
+                "is_final": is_final,
+                "utterance": utterance
+            })
+        return results
+    
+    async def drain(self) -> List[Dict[str, Any]]:
+        """Wait for every pending transcription and return the results"""
+        tasks = [task for _, _, task in self.pending]
+        if tasks:
+            # asyncio.wait never raises for the tasks themselves, only if we are cancelled
+            await asyncio.wait(tasks)
+        return self.completed()
@@ -1,16 +1,46 @@
 import openai
 import os
 import asyncio
+import time
+from collections import deque
+from services.tts_cache import TTSCache, tts_cache_key
 from logger_config import logger
 
+# Streaming-friendly output formats and the codec they map to in audio frames
+TTS_FORMAT_CODECS = {
+    "opus": "opus",
+    "pcm": "pcm16",  # raw 24 kHz mono 16-bit little endian
+    "mp3": "mp3",
+    "aac": "aac",
+    "flac": "flac",
+    "wav": "wav",
+}
+TTS_RESPONSE_FORMAT = os.getenv("TTS_RESPONSE_FORMAT", "opus")
+TTS_MODEL = os.getenv("TTS_MODEL", "tts-1")
+TTS_VOICE = os.getenv("TTS_VOICE", "alloy")
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+# Size of the chunks cache hits are streamed in
+TTS_CACHE_CHUNK_BYTES = 16 * 1024
+
 class StreamingTTSService:
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, response_format: str = TTS_RESPONSE_FORMAT):
+        if response_format not in TTS_FORMAT_CODECS:
+            raise ValueError(f"Unsupported TTS response format: {response_format}")
+        self.client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.response_format = response_format
+        # Codec of the generated audio, as announced in audio frames
+        self.codec = TTS_FORMAT_CODECS[response_format]
+        self.streams = 0
+        self._ttfa_ms = deque(maxlen=500)
+        self.cache = TTSCache() if TTS_CACHE_ENABLED else None
     
     async def stream_audio(self, text: str):
         """
         Stream audio from text using OpenAI TTS
         
+        Bytes are forwarded as they arrive from the API, so playback can start
+        after the first chunk instead of after the whole synthesis.
+        
         Args:
             text: Text to convert to speech
             
@@ -18,32 +48,37 @@ class StreamingTTSService:
             Audio chunks as bytes
         """
         try:
-            logger.info(f"Generating audio for text: {text[:50]}...")
-            
-            # For now, we'll use the regular TTS API and simulate streaming
-            # In a real implementation, you'd use OpenAI's streaming TTS API
-            response = self.client.audio.speech.create(
-                model="tts-1",
-                voice="alloy",
-                input=text
-            )
+            started = time.perf_counter()
+            cache_key = tts_cache_key(text, TTS_VOICE, TTS_MODEL, self.response_format)
+            cached = await asyncio.to_thread(self.cache.get, cache_key) if self.cache else None
+            if cached is not None:
+                logger.info(f"Serving cached audio for text: {text[:50]}...")
+                self._record_first_audio((time.perf_counter() - started) * 1000)
+                for i in range(0, len(cached), TTS_CACHE_CHUNK_BYTES):
+                    yield {'audio_chunk': cached[i:i + TTS_CACHE_CHUNK_BYTES]}
+                return
             
-            # Read the audio data in chunks to simulate streaming
-            audio_data = response.content
-            chunk_size = 1024  # 1KB chunks
+            logger.info(f"Generating audio for text: {text[:50]}...")
+            first_chunk = True
+            parts = []
             
-            for i in range(0, len(audio_data), chunk_size):
-                chunk = audio_data[i:i + chunk_size]
-                yield {
-                    'audio_chunk': chunk,
-                    'is_final': i + chunk_size >= len(audio_data),
-                    'progress': min(1.0, (i + chunk_size) / len(audio_data))
-                }
-                
-                # Simulate some processing time
-                await asyncio.sleep(0.01)
+            async with self.client.audio.speech.with_streaming_response.create(
+                model=TTS_MODEL,
+                voice=TTS_VOICE,
+                input=text,
+                response_format=self.response_format
+            ) as response:
+                async for chunk in response.iter_bytes():
+                    if first_chunk:
+                        first_chunk = False
+                        self._record_first_audio((time.perf_counter() - started) * 1000)
+                    parts.append(chunk)
+                    yield {'audio_chunk': chunk}
             
-            logger.info("Audio generation completed")
+            logger.info(f"Audio generation completed in {(time.perf_counter() - started) * 1000:.0f} ms")
+            # Only complete syntheses are cached; cancelled or failed streams never get here
+            if self.cache:
+                await asyncio.to_thread(self.cache.put, cache_key, b"".join(parts))
             
         except Exception as e:
             logger.error(f"Error generating audio: {str(e)}")
@@ -52,6 +87,25 @@ class StreamingTTSService:
                 'is_final': True
             }
     
+    def _record_first_audio(self, elapsed_ms: float):
+        self.streams += 1
+        self._ttfa_ms.append(elapsed_ms)
+        logger.debug(f"TTS time to first audio: {elapsed_ms:.0f} ms")
+    
+    def metrics(self):
+        """Time-to-first-audio over the most recent streams, and cache counters"""
+        samples = sorted(self._ttfa_ms)
+        metrics = {"streams": self.streams, "format": self.response_format}
+        if samples:
+            metrics.update(
+                ttfa_ms_last=round(self._ttfa_ms[-1], 1),
+                ttfa_ms_p50=round(samples[len(samples) // 2], 1),
+                ttfa_ms_p95=round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 1),
+            )
+        if self.cache:
+            metrics["cache"] = self.cache.metrics()
+        return metrics
+    
     async def generate_audio_file(self, text: str, output_path: str = None):
         """
         Generate complete audio file from text
@@ -66,10 +120,11 @@ class StreamingTTSService:
         try:
             logger.info(f"Generating audio file for text: {text[:50]}...")
             
-            response = self.client.audio.speech.create(
-                model="tts-1",
-                voice="alloy",
-                input=text
+            response = await self.client.audio.speech.create(
+                model=TTS_MODEL,
+                voice=TTS_VOICE,
+                input=text,
+                response_format=self.response_format
             )
             
             audio_data = response.content
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from logger_config import logger
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(BASE_DIR, "storage", ".tts_cache"))
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+TTS_CACHE_DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+# Long answers are unlikely to repeat verbatim; don't let them push out the short phrases
+TTS_CACHE_MAX_ENTRY_BYTES = int(os.getenv("TTS_CACHE_MAX_ENTRY_BYTES", str(2 * 1024 * 1024)))
+
+
+def normalize_tts_text(text: str) -> str:
+    """Canonical form of a TTS input.
+
+    Unicode and whitespace are normalized; case and punctuation are kept
+    because they change the prosody of the synthesized audio.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def tts_cache_key(text: str, voice: str, model: str, response_format: str) -> str:
+    payload = "\x00".join([normalize_tts_text(text), voice, model, response_format])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Content-addressed cache of synthesized audio: a memory LRU over a disk tier, each with a byte budget"""
+
+    def __init__(self, cache_dir: str = TTS_CACHE_DIR, memory_bytes: int = TTS_CACHE_MEMORY_BYTES,
+                 disk_bytes: int = TTS_CACHE_DISK_BYTES, max_entry_bytes: int = TTS_CACHE_MAX_ENTRY_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_used = 0
+        self._disk_used: Optional[int] = None
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Look a key up in memory, then on disk (promoting disk hits to memory)"""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return audio
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            # mtime doubles as last-use time for disk eviction
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+
+        with self._lock:
+            self.stats["disk_hits"] += 1
+            self._remember(key, audio)
+        return audio
+
+    def put(self, key: str, audio: bytes):
+        """Store synthesized audio in both tiers"""
+        if not audio or len(audio) > self.max_entry_bytes:
+            return
+        with self._lock:
+            self._remember(key, audio)
+            self.stats["stores"] += 1
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        # Storing a key again replaces its file, so only the size difference counts
+        try:
+            previous_size = os.stat(path).st_size
+        except FileNotFoundError:
+            previous_size = 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._disk_used is None:
+                self._disk_used = self._scan_disk_usage()
+            else:
+                self._disk_used += len(audio) - previous_size
+            over_budget = self._disk_used > self.disk_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _remember(self, key: str, audio: bytes):
+        # Caller holds the lock
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_used -= len(previous)
+        self._memory[key] = audio
+        self._memory_used += len(audio)
+        while self._memory_used > self.memory_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
+
+    def _disk_entries(self):
+        for shard in os.scandir(self.cache_dir):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if not entry.name.endswith(".tmp"):
+                        yield entry
+
+    def _scan_disk_usage(self) -> int:
+        try:
+            return sum(entry.stat().st_size for entry in self._disk_entries())
+        except FileNotFoundError:
+            return 0
+
+    def _evict_disk(self):
+        """Delete least recently used files until the disk tier is at 90% of its budget"""
+        started = time.perf_counter()
+        entries = []
+        for entry in self._disk_entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        used = sum(size for _, size, _ in entries)
+        target = self.disk_bytes * 0.9
+        removed = 0
+        for _, size, path in entries:
+            if used <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            used -= size
+            removed += 1
+
+        with self._lock:
+            self._disk_used = used
+            self.stats["evictions"] += removed
+        logger.info(f"Evicted {removed} TTS cache files in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def metrics(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                memory_entries=len(self._memory),
+                memory_bytes=self._memory_used,
+                disk_bytes=self._disk_used,
+            )
@@ -0,0 +1,123 @@
+import io
+import os
+import wave
+from collections import deque
+from typing import List, Tuple
+
+import numpy as np
+
+SPEECH_SAMPLE_RATE = int(os.getenv("SPEECH_SAMPLE_RATE", "16000"))
+VAD_FRAME_MS = 30
+# Frames louder than this (dBFS) count as speech
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "-45"))
+# Silence that ends an utterance: lower answers sooner, higher splits fewer sentences mid-pause
+SPEECH_END_SILENCE_MS = int(os.getenv("SPEECH_END_SILENCE_MS", "700"))
+# Shorter bursts (clicks, bumps) are discarded
+SPEECH_MIN_MS = int(os.getenv("SPEECH_MIN_MS", "250"))
+# Audio kept from before the speech onset so the first syllable is not clipped
+SPEECH_PRE_ROLL_MS = int(os.getenv("SPEECH_PRE_ROLL_MS", "300"))
+# Utterances are cut after this long even without a pause
+SPEECH_MAX_UTTERANCE_S = float(os.getenv("SPEECH_MAX_UTTERANCE_S", "30"))
+# Interim transcripts of the utterance so far; 0 disables them
+SPEECH_INTERIM_INTERVAL_MS = int(os.getenv("SPEECH_INTERIM_INTERVAL_MS", "2000"))
+
+
+def frame_energies_db(pcm: bytes, frame_samples: int) -> np.ndarray:
+    """RMS level in dBFS of each complete frame of 16-bit mono PCM"""
+    samples = np.frombuffer(pcm, dtype="<i2")
+    count = len(samples) // frame_samples
+    frames = samples[:count * frame_samples].reshape(count, frame_samples).astype(np.float32)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(rms / 32768.0 + 1e-10)
+
+
+def pcm16_to_wav(pcm: bytes, sample_rate: int = SPEECH_SAMPLE_RATE) -> bytes:
+    """Wrap 16-bit mono PCM in an in-memory WAV container"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class VoiceActivityDetector:
+    """Energy-based utterance detection over a stream of 16-bit mono PCM.
+
+    `feed` returns ("interim", pcm) snapshots of the utterance in progress and
+    ("final", pcm) once it is followed by enough silence.
+    """
+
+    def __init__(self, sample_rate: int = SPEECH_SAMPLE_RATE, threshold_db: float = VAD_THRESHOLD_DB,
+                 end_silence_ms: int = SPEECH_END_SILENCE_MS, min_speech_ms: int = SPEECH_MIN_MS,
+                 pre_roll_ms: int = SPEECH_PRE_ROLL_MS, max_utterance_s: float = SPEECH_MAX_UTTERANCE_S,
+                 interim_interval_ms: int = SPEECH_INTERIM_INTERVAL_MS):
+        self.sample_rate = sample_rate
+        self.threshold_db = threshold_db
+        self.frame_samples = sample_rate * VAD_FRAME_MS // 1000
+        self.frame_bytes = self.frame_samples * 2
+        self.end_silence_frames = max(1, end_silence_ms // VAD_FRAME_MS)
+        self.min_speech_frames = max(1, min_speech_ms // VAD_FRAME_MS)
+        self.max_utterance_frames = int(max_utterance_s * 1000 // VAD_FRAME_MS)
+        self.interim_frames = interim_interval_ms // VAD_FRAME_MS
+        self._remainder = b""
+        self._pre_roll = deque(maxlen=max(1, pre_roll_ms // VAD_FRAME_MS))
+        self._reset()
+
+    def _reset(self):
+        self._utterance = None
+        self._utterance_frames = 0
+        self._speech_frames = 0
+        self._silence_frames = 0
+        self._frames_since_interim = 0
+
+    @property
+    def in_speech(self) -> bool:
+        return self._utterance is not None
+
+    def feed(self, pcm: bytes) -> List[Tuple[str, bytes]]:
+        """Add audio and return the interim/final utterances it produced"""
+        data = self._remainder + pcm
+        usable = len(data) - len(data) % self.frame_bytes
+        self._remainder = data[usable:]
+        if not usable:
+            return []
+
+        events = []
+        voiced = frame_energies_db(data[:usable], self.frame_samples) > self.threshold_db
+        for i, is_voiced in enumerate(voiced):
+            frame = data[i * self.frame_bytes:(i + 1) * self.frame_bytes]
+            if self._utterance is None:
+                self._pre_roll.append(frame)
+                if is_voiced:
+                    self._utterance = bytearray(b"".join(self._pre_roll))
+                    self._utterance_frames = len(self._pre_roll)
+                    self._speech_frames = 1
+                    self._pre_roll.clear()
+                continue
+
+            self._utterance += frame
+            self._utterance_frames += 1
+            if is_voiced:
+                self._speech_frames += 1
+                self._silence_frames = 0
+            else:
+                self._silence_frames += 1
+            self._frames_since_interim += 1
+
+            if self._silence_frames >= self.end_silence_frames or self._utterance_frames >= self.max_utterance_frames:
+                events.extend(self.flush())
+            elif (self.interim_frames and self._frames_since_interim >= self.interim_frames
+                  and self._speech_frames >= self.min_speech_frames):
+                self._frames_since_interim = 0
+                events.append(("interim", bytes(self._utterance)))
+        return events
+
+    def flush(self) -> List[Tuple[str, bytes]]:
+        """End the utterance in progress, if it contained enough speech"""
+        utterance, speech_frames = self._utterance, self._speech_frames
+        self._reset()
+        if utterance is None or speech_frames < self.min_speech_frames:
+            return []
+        return [("final", bytes(utterance))]
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Test script for binary WebSocket audio frames
+"""
+
+from audio_frames import (
+    AUDIO_FRAME_HEADER_SIZE,
+    decode_audio_frame,
+    encode_audio_frame,
+    frame_from_audio_message,
+    speech_message_from_frame,
+)
+
+
+def test_round_trip():
+    """Header fields and raw payload survive encoding, with a fixed 12-byte overhead"""
+    print("Testing frame round trip...")
+
+    payload = bytes(range(256)) * 4
+    frame = encode_audio_frame(7, 42, "opus", payload, final=True)
+    assert len(frame) == AUDIO_FRAME_HEADER_SIZE + len(payload) == 12 + 1024
+
+    audio = decode_audio_frame(frame)
+    assert (audio.stream_id, audio.seq, audio.codec, audio.final) == (7, 42, "opus", True)
+    assert audio.payload == payload
+    print("✓ Frame round trip")
+
+
+def test_messages_and_malformed_frames():
+    """Inbound frames become speech_data messages; outbound audio_chunk messages become frames"""
+    print("Testing message conversion...")
+
+    message = speech_message_from_frame(encode_audio_frame(1, 0, "webm", b"\x1a\x45"))
+    assert message["type"] == "speech_data"
+    assert message["data"]["audio_data"] == b"\x1a\x45" and message["data"]["codec"] == "webm"
+
+    frame = frame_from_audio_message({
+        "type": "audio_chunk",
+        "data": {"audio": b"ID3", "stream_id": 3, "seq": 1, "codec": "mp3", "is_final": False}
+    })
+    assert decode_audio_frame(frame).payload == b"ID3"
+    assert frame_from_audio_message({"type": "chat_response_chunk", "data": {"content": "hi"}}) is None
+
+    for bad in (b"\x01\x01", b"\x09" + bytes(11), encode_audio_frame(1, 0, "mp3", b"")[:2] + b"\xff" + bytes(9)):
+        try:
+            decode_audio_frame(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted malformed frame {bad!r}")
+    print("✓ Messages converted, malformed frames rejected")
+
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_messages_and_malformed_frames()
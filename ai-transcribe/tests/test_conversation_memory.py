@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for token-budgeted conversation memory
+"""
+
+import asyncio
+
+from services.conversation_memory import ConversationMemory
+
+
+def count_words(text):
+    return len(text.split())
+
+
+async def summarize(summary, turns):
+    await asyncio.sleep(0)
+    return (summary + " " + " ".join(turn['content'].split()[0] for turn in turns)).strip()
+
+
+def test_window_stays_within_budget():
+    """Only the newest turns that fit the budget are sent; the newest one always is"""
+    print("Testing history window...")
+
+    async def run():
+        memory = ConversationMemory(summarize, budget=50, summary_trigger=10_000, count_tokens=count_words)
+        for i in range(20):
+            memory.add('user', f"question{i} " + "word " * 10)
+            memory.add('assistant', f"answer{i} " + "word " * 10)
+        messages = memory.messages("system prompt")
+        assert messages[0] == {'role': 'system', 'content': 'system prompt'}
+        assert messages[-1]['content'].startswith("answer19")
+        assert len(messages) == 1 + 3
+        assert memory.last_prompt_tokens < 70
+
+        memory.add('user', "long " * 500)
+        context = {'role': 'system', 'content': 'transcript excerpt'}
+        messages = memory.messages("system prompt", context)
+        assert [m['content'] for m in messages[1:]] == ['transcript excerpt', "long " * 500]
+
+    asyncio.run(run())
+    print("✓ Window within budget")
+
+
+def test_old_turns_folded_into_summary():
+    """Turns leaving the window are summarized in the background and then dropped"""
+    print("Testing summary folding...")
+
+    async def run():
+        memory = ConversationMemory(summarize, budget=60, summary_trigger=40, count_tokens=count_words)
+        prompt_sizes = []
+        for i in range(30):
+            memory.add('user', f"question{i} " + "word " * 10)
+            prompt_sizes.append(len(memory.messages("system prompt")))
+            await asyncio.sleep(0.001)
+            memory.add('assistant', f"answer{i} " + "word " * 10)
+
+        assert memory.summaries > 0
+        assert memory.summary.startswith("question0 answer0 question1")
+        assert memory.messages("system prompt")[1]['content'].startswith("Summary of the earlier conversation")
+        assert len(memory.turns) < 12
+        assert max(prompt_sizes[5:]) <= 1 + 1 + 4
+        print(f"  {memory.stats()}")
+
+    asyncio.run(run())
+    print("✓ Old turns summarized")
+
+
+def test_failed_summary_keeps_memory_bounded():
+    """A failing summarizer keeps the previous summary and still drops the old turns"""
+    print("Testing summary failure...")
+
+    async def failing(summary, turns):
+        raise RuntimeError("summary model unavailable")
+
+    async def run():
+        memory = ConversationMemory(failing, budget=30, summary_trigger=20, count_tokens=count_words)
+        for i in range(40):
+            memory.add('user', "word " * 10)
+            memory.messages("system prompt")
+            await asyncio.sleep(0.001)
+        assert memory.summary == ""
+        assert len(memory.turns) < 10
+
+    asyncio.run(run())
+    print("✓ Memory bounded")
+
+
+if __name__ == "__main__":
+    test_window_stays_within_budget()
+    test_old_turns_folded_into_summary()
+    test_failed_summary_keeps_memory_bounded()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared conversation store backends
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+# Keep the chat service's conversation database out of the source tree
+os.environ["CONVERSATION_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "conversations.db")
+
+from conversation_store import MemoryConversationStore, SQLiteConversationStore
+from services.base_service import ServiceMessage, ServiceType
+from services.conversation_memory import ConversationMemory
+from services.enhanced_chat_service import EnhancedChatService
+
+
+async def summarize(summary, turns):
+    return summary
+
+
+def test_memory_state_roundtrip():
+    """A conversation saved with to_state is restored with the same turns and summary"""
+    print("Testing conversation state...")
+
+    memory = ConversationMemory(summarize, count_tokens=lambda text: len(text.split()))
+    memory.add('user', "What is a derivative?")
+    memory.add('assistant', "The rate of change of a function.")
+    memory.summary = "The student studies calculus."
+
+    restored = ConversationMemory(summarize, count_tokens=lambda text: len(text.split()))
+    restored.restore(memory.to_state())
+    assert restored.messages("system") == memory.messages("system")
+    print("✓ State roundtrip")
+
+
+def test_sqlite_shared_between_instances():
+    """Two store instances on one database (two workers) see each other's writes, in WAL mode"""
+    print("Testing SQLite backend...")
+
+    async def run():
+        path = os.path.join(tempfile.mkdtemp(), "conversations.db")
+        worker_a = SQLiteConversationStore(path)
+        worker_b = SQLiteConversationStore(path)
+        assert await worker_b.load("client") is None
+
+        await worker_a.save("client", {"memory": {"turns": [{"role": "user", "content": "hi"}]}})
+        assert (await worker_b.load("client"))["memory"]["turns"][0]["content"] == "hi"
+        await worker_b.save("client", {"memory": {"turns": []}})
+        assert (await worker_a.load("client"))["memory"]["turns"] == []
+
+        await worker_a.delete("client")
+        assert await worker_b.load("client") is None
+        assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    asyncio.run(run())
+    print("✓ SQLite shared")
+
+
+def test_expired_conversations_are_not_loaded():
+    """Conversations older than the TTL are forgotten"""
+    print("Testing expiry...")
+
+    async def run():
+        path = os.path.join(tempfile.mkdtemp(), "conversations.db")
+        store = SQLiteConversationStore(path, ttl=60)
+        await store.save("client", {"memory": {}})
+        with sqlite3.connect(path) as conn:
+            conn.execute("UPDATE chat_conversations SET updated_at = ?", (time.time() - 120,))
+        assert await store.load("client") is None
+
+        store = MemoryConversationStore(ttl=-1)
+        await store.save("client", {"memory": {}})
+        assert await store.load("client") is None
+
+    asyncio.run(run())
+    print("✓ Expired conversations dropped")
+
+
+def test_conversations_resume_only_with_session_token():
+    """A conversation is keyed by a server-issued token, not by the client-chosen client_id"""
+    print("Testing session tokens...")
+
+    async def run():
+        service = EnhancedChatService()
+        service.conversation_store = MemoryConversationStore()
+
+        async def connect(data):
+            message = ServiceMessage(ServiceType.AI_CHAT, "connect", data, "client")
+            return [response async for response in service.handle_message(message)][0]
+
+        token = (await connect({}))["session_token"]
+        service.client_sessions["client"].memory.add('user', "My name is Ada.")
+        await service.cleanup("client")
+
+        # Same client_id, no token: a fresh conversation with a different token
+        ack = await connect({})
+        assert ack["session_token"] != token
+        assert len(service.client_sessions["client"].memory.turns) == 0
+        await service.cleanup("client")
+
+        # A forged token is ignored
+        await connect({"session_token": token + "x"})
+        assert len(service.client_sessions["client"].memory.turns) == 0
+        await service.cleanup("client")
+
+        await connect({"session_token": token})
+        turns = service.client_sessions["client"].memory.turns
+        assert [message['content'] for message, _ in turns] == ["My name is Ada."]
+        await service.cleanup("client")
+
+    asyncio.run(run())
+    print("✓ Conversations resume with their session token only")
+
+
+def test_data_dir_outside_served_roots():
+    """The conversation database defaults to a directory outside the source tree and STORAGE_DIR"""
+    print("Testing data directory...")
+
+    import conversation_store
+    from helpers import BASE_DIR, STORAGE_DIR
+
+    data_dir = os.path.realpath(conversation_store.DATA_DIR)
+    for root in (BASE_DIR, STORAGE_DIR):
+        assert os.path.commonpath([data_dir, os.path.realpath(root)]) != os.path.realpath(root)
+    print("✓ Data directory is private")
+
+
+if __name__ == "__main__":
+    test_memory_state_roundtrip()
+    test_sqlite_shared_between_instances()
+    test_expired_conversations_are_not_loaded()
+    test_conversations_resume_only_with_session_token()
+    test_data_dir_outside_served_roots()
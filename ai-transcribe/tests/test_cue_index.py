@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test script for the binary cue index and time-window queries
+"""
+
+import os
+import tempfile
+
+from cue_index import parse_vtt_cues, write_cue_index, open_cue_index, CueIndex, cue_index_path
+
+SAMPLE_VTT = """WEBVTT
+
+1
+00:00:00.000 --> 00:00:04.000
+Welcome to the lecture.
+
+2
+00:00:04.000 --> 00:00:30.000
+A long cue that spans
+two lines.
+
+3
+00:00:05,500 --> 00:00:07,000
+Overlapping cue with comma separators.
+
+00:01:00.000 --> 00:01:02.000
+Cue without a number.
+
+4
+01:00:00.000 --> 01:00:01.500
+Ünïcödé at one hour.
+"""
+
+
+def write_sample(tmp_dir):
+    vtt_path = os.path.join(tmp_dir, "lecture.vtt")
+    with open(vtt_path, "w", encoding="utf-8") as f:
+        f.write(SAMPLE_VTT)
+    return vtt_path
+
+
+def test_parse_vtt_cues():
+    """Parser handles numbered, unnumbered and comma-separated cues"""
+    print("Testing VTT parsing...")
+
+    cues = parse_vtt_cues(SAMPLE_VTT)
+
+    assert len(cues) == 5
+    assert cues[1] == (4.0, 30.0, "A long cue that spans\ntwo lines.")
+    assert cues[2][0] == 5.5
+    assert cues[-1][0] == 3600.0
+    print("✓ Parsed 5 cues")
+
+
+def test_window_queries():
+    """Queries return exactly the cues overlapping [from, to)"""
+    print("Testing window queries...")
+
+    tmp_dir = tempfile.mkdtemp()
+    vtt_path = write_sample(tmp_dir)
+    index = CueIndex(write_cue_index(vtt_path, SAMPLE_VTT))
+
+    def texts(start, end):
+        return [cue["text"].split()[0] for cue in index.query(start, end)]
+
+    assert texts(0, 1) == ["Welcome"]
+    # The long cue started before the window but is still showing
+    assert texts(10, 20) == ["A"]
+    assert texts(4, 6) == ["A", "Overlapping"]
+    # End is exclusive, and a cue ending at the window start is excluded
+    assert texts(30, 60) == []
+    assert texts(3599, 3601) == ["Ünïcödé"]
+    assert index.query(0, 7200, limit=2)[1]["end"] == 30.0
+    print("✓ Window queries correct")
+
+
+def test_open_rebuilds_stale_index():
+    """open_cue_index builds a missing index and rebuilds it when the track changes"""
+    print("Testing lazy index builds...")
+
+    tmp_dir = tempfile.mkdtemp()
+    vtt_path = write_sample(tmp_dir)
+
+    assert open_cue_index(vtt_path).count == 5
+    assert os.path.exists(cue_index_path(vtt_path))
+
+    with open(vtt_path, "w", encoding="utf-8") as f:
+        f.write("WEBVTT\n\n00:00:01.000 --> 00:00:02.000\nOnly cue\n")
+    os.utime(vtt_path, ns=(os.stat(vtt_path).st_atime_ns, os.stat(cue_index_path(vtt_path)).st_mtime_ns + 1))
+
+    assert open_cue_index(vtt_path).count == 1
+    print("✓ Stale index rebuilt")
+
+
+if __name__ == "__main__":
+    test_parse_vtt_cues()
+    test_window_queries()
+    test_open_rebuilds_stale_index()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Test script for coalescing chat text deltas into fewer WebSocket frames
+"""
+
+from services.delta_coalescer import DeltaCoalescer
+
+
+def delta(content):
+    return {'content': content, 'timestamp': 0}
+
+
+def test_first_delta_is_immediate_and_rest_merged():
+    """The first token is not delayed; deltas inside the window share one frame"""
+    print("Testing window coalescing...")
+
+    coalescer = DeltaCoalescer(window_ms=40, max_bytes=1024)
+    assert coalescer.push(delta("Hel"), now=0.0) == [delta("Hel")]
+    assert coalescer.push(delta("lo"), now=0.01) == []
+    assert coalescer.push(delta(" wor"), now=0.02) == []
+    assert abs(coalescer.timeout(now=0.02) - 0.02) < 1e-9
+    assert coalescer.flush(now=0.04) == [delta("lo wor")]
+    # Idle for longer than the window: sent right away again
+    assert coalescer.push(delta("ld"), now=1.0) == [delta("ld")]
+    assert (coalescer.deltas_in, coalescer.frames_out) == (4, 3)
+    print("✓ First delta immediate, later deltas merged")
+
+
+def test_byte_threshold_and_passthrough():
+    """Large merged text flushes early; audio chunks flush pending text and keep order"""
+    print("Testing threshold and passthrough...")
+
+    coalescer = DeltaCoalescer(window_ms=40, max_bytes=8)
+    coalescer.push(delta("a"), now=0.0)
+    assert coalescer.push(delta("bcdefghij"), now=0.001) == [delta("bcdefghij")]
+
+    audio = {'type': 'audio_chunk', 'data': {}}
+    coalescer.push(delta("k"), now=0.002)
+    assert coalescer.push(audio, now=0.003) == [delta("k"), audio]
+    print("✓ Threshold flush and ordered passthrough")
+
+
+if __name__ == "__main__":
+    test_first_delta_is_immediate_and_rest_merged()
+    test_byte_threshold_and_passthrough()
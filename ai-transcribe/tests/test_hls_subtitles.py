@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script for segmented WebVTT renditions for HLS
+"""
+
+from hls_subtitles import build_segmented_webvtt, build_media_tag, format_vtt_timestamp
+
+CUES = [
+    (0.5, 2.0, "First cue"),
+    (5.0, 7.5, "Spans a segment boundary"),
+    (13.0, 14.25, "Last cue"),
+]
+
+
+def test_segmented_webvtt():
+    """Cues are split into fixed-duration segments with an X-TIMESTAMP-MAP header"""
+    print("Testing WebVTT segmentation...")
+
+    _, segments = build_segmented_webvtt(CUES, "de", segment_duration=6, mpegts=900000)
+
+    assert [name for name, _ in segments] == ["de/00000.webvtt", "de/00001.webvtt", "de/00002.webvtt"]
+    for _, text in segments:
+        assert text.startswith("WEBVTT\nX-TIMESTAMP-MAP=MPEGTS:900000,LOCAL:00:00:00.000\n\n")
+
+    # A cue crossing a boundary is repeated in both segments, with its original times
+    assert "First cue" in segments[0][1] and "Spans a segment boundary" in segments[0][1]
+    assert "00:00:05.000 --> 00:00:07.500\nSpans a segment boundary" in segments[1][1]
+    assert "First cue" not in segments[1][1]
+    assert "Last cue" in segments[2][1] and "Spans" not in segments[2][1]
+    assert format_vtt_timestamp(3723.0045) == "01:02:03.004"
+    print("✓ 3 segments, boundary cue repeated")
+
+
+def test_media_playlist():
+    """The VOD media playlist lists every segment with its duration"""
+    print("Testing media playlist...")
+
+    playlist, _ = build_segmented_webvtt(CUES, "de", segment_duration=6)
+    lines = playlist.splitlines()
+
+    assert lines[0] == "#EXTM3U"
+    assert "#EXT-X-TARGETDURATION:6" in lines
+    assert "#EXT-X-PLAYLIST-TYPE:VOD" in lines
+    assert [line for line in lines if line.startswith("#EXTINF")] == [
+        "#EXTINF:6.000,", "#EXTINF:6.000,", "#EXTINF:2.250,"
+    ]
+    assert lines[-1] == "#EXT-X-ENDLIST"
+
+    # A track without cues still gets one (empty) segment
+    playlist, segments = build_segmented_webvtt([], "en", segment_duration=6)
+    assert len(segments) == 1 and playlist.count("#EXTINF") == 1
+    print("✓ Playlist correct")
+
+
+def test_media_tag():
+    """EXT-X-MEDIA tags reference the subtitle playlist in the "subs" group"""
+    print("Testing EXT-X-MEDIA tag...")
+
+    tag = build_media_tag("de", "German", "/api/storage-dir/token/de.m3u8", default=True)
+    assert tag == (
+        '#EXT-X-MEDIA:TYPE=SUBTITLES,GROUP-ID="subs",NAME="German",LANGUAGE="de",'
+        'DEFAULT=YES,AUTOSELECT=YES,URI="/api/storage-dir/token/de.m3u8"'
+    )
+    assert "DEFAULT=NO" in build_media_tag("fr", "French", "fr.m3u8")
+    print("✓ Media tag correct")
+
+
+if __name__ == "__main__":
+    test_segmented_webvtt()
+    test_media_playlist()
+    test_media_tag()
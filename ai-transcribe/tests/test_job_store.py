@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test script for single-flight coalescing of transcription jobs
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+from job_store import JobStore, SingleFlight, make_job_id
+
+
+def test_job_id_is_order_insensitive():
+    """Languages are part of the key but their order is not"""
+    print("Testing job id stability...")
+
+    a = make_job_id("bucket", "videos/a.mp4", ["de", "fr"], {"prompt_lang": "en"})
+    b = make_job_id("bucket", "videos/a.mp4", ["fr", "de"], {"prompt_lang": "en"})
+    c = make_job_id("bucket", "videos/a.mp4", ["de"], {"prompt_lang": "en"})
+
+    assert a == b
+    assert a != c
+    print("✓ Job ids are stable")
+
+
+def test_coalesces_within_process():
+    """Concurrent callers in one process share a single run"""
+    print("Testing in-process coalescing...")
+
+    calls = []
+
+    def pipeline():
+        calls.append(threading.get_ident())
+        time.sleep(0.2)
+        return [{"source_video": "videos/a.mp4"}]
+
+    async def run():
+        flight = SingleFlight(JobStore(tempfile.mkdtemp()), poll_interval=0.05)
+        return await asyncio.gather(*[flight.run("job", pipeline) for _ in range(5)])
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(r == results[0] for r in results)
+    print("✓ Five callers, one pipeline run")
+
+
+def test_coalesces_across_workers():
+    """A second worker attaches to the job claimed by the first through the store"""
+    print("Testing cross-worker coalescing...")
+
+    jobs_dir = tempfile.mkdtemp()
+    calls = []
+
+    def pipeline():
+        calls.append(1)
+        time.sleep(0.3)
+        return {"status": "done"}
+
+    async def run():
+        worker_a = SingleFlight(JobStore(jobs_dir), poll_interval=0.05)
+        worker_b = SingleFlight(JobStore(jobs_dir), poll_interval=0.05)
+        first = asyncio.create_task(worker_a.run("job", pipeline))
+        await asyncio.sleep(0.05)
+        second = await worker_b.run("job", pipeline)
+        return await first, second
+
+    first, second = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert first == second == {"status": "done"}
+    print("✓ Second worker received the first worker's result")
+
+
+def test_old_records_and_locks_are_purged():
+    """Records and abandoned locks older than the TTL are removed; fresh ones stay"""
+    print("Testing job store purge...")
+
+    jobs_dir = tempfile.mkdtemp()
+    store = JobStore(jobs_dir, lease_seconds=60, record_ttl=3600)
+    store.complete("old-done", store.try_claim("old-done"), {"status": "done"})
+    store.fail("old-failed", store.try_claim("old-failed"), "boom")
+    store.try_claim("abandoned")
+    store.complete("fresh", store.try_claim("fresh"), {"status": "done"})
+    store.try_claim("running")
+
+    long_ago = time.time() - 7200
+    for name in ("old-done.json", "old-failed.json", "abandoned.lock"):
+        os.utime(os.path.join(jobs_dir, name), (long_ago, long_ago))
+
+    assert store.purge() == 3
+    assert sorted(os.listdir(jobs_dir)) == ["fresh.json", "running.lock"]
+    assert store.get("old-done") is None and store.get("fresh")["status"] == "done"
+    assert store.current_run("running") is not None
+    print("✓ Old job files purged")
+
+
+if __name__ == "__main__":
+    test_job_id_is_order_insensitive()
+    test_coalesces_within_process()
+    test_coalesces_across_workers()
+    test_old_records_and_locks_are_purged()
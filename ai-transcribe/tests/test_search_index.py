@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test script for the incremental transcript search index
+"""
+
+import tempfile
+
+import search_index
+from search_index import SearchIndex, tokenize
+
+
+def make_index():
+    search_index.SEARCH_DIR = tempfile.mkdtemp()
+    return SearchIndex("default", "en")
+
+
+def test_tokenize():
+    """Word tokens are lowercased; CJK characters are indexed one by one"""
+    print("Testing tokenizer...")
+
+    assert tokenize("The Preposition AT, again!") == ["the", "preposition", "at", "again"]
+    assert tokenize("東京です") == ["東", "京", "で", "す"]
+    print("✓ Tokenizer works")
+
+
+def test_search_hits_point_to_cues():
+    """All query terms must appear in the same cue; hits carry timestamp and snippet"""
+    print("Testing search hits...")
+
+    index = make_index()
+    index.add_document("course/intro.mp4", [
+        (0.0, "Welcome to the grammar course"),
+        (12.5, "The word at shows a place"),
+        (30.0, "Another place to be"),
+    ])
+    index.add_document("course/lesson2.mp4", [(4.0, "We are at the station")])
+
+    hits = index.search("at place")
+    assert hits == [{"video_key": "course/intro.mp4", "start": 12.5, "snippet": "The word at shows a place"}]
+
+    videos = [hit["video_key"] for hit in index.search("AT")]
+    assert sorted(videos) == ["course/intro.mp4", "course/lesson2.mp4"]
+    assert index.search("missing") == []
+    print("✓ Hits point to cue start times")
+
+
+def test_reindex_and_merge():
+    """Re-indexed videos replace their old version, also across tiered merges"""
+    print("Testing re-indexing and merges...")
+
+    index = make_index()
+    for i in range(10):
+        index.add_document(f"videos/v{i}.mp4", [(float(i), f"lecture number {i} about verbs")])
+    index.add_document("videos/v3.mp4", [(99.0, "rewritten lecture about nouns")])
+
+    assert len(index._read_manifest()["segments"]) < 11
+    assert len(index.search("lecture")) == 10
+    assert [h["start"] for h in index.search("verbs") if h["video_key"] == "videos/v3.mp4"] == []
+    assert index.search("nouns")[0]["start"] == 99.0
+    print("✓ Old versions dropped, segments merged")
+
+
+def test_ranking_and_limit():
+    """Videos with more matching cues come first, ties by key; only `limit` hits are returned"""
+    print("Testing ranking...")
+
+    index = make_index()
+    index.add_document("b.mp4", [(float(t), "the lecture") for t in (30, 10, 20)])
+    index.add_document("a.mp4", [(5.0, "the lecture")])
+    index.add_document("c.mp4", [(1.0, "a lecture"), (2.0, "the lecture")])
+    index.add_document("d.mp4", [(7.0, "the lecture")])
+
+    hits = index.search("the lecture", limit=5)
+    assert [(h["video_key"], h["start"]) for h in hits] == [
+        ("b.mp4", 10.0), ("b.mp4", 20.0), ("b.mp4", 30.0), ("a.mp4", 5.0), ("c.mp4", 2.0)
+    ]
+    assert len(index.search("lecture", limit=2)) == 2
+    print("✓ Ranked and limited")
+
+
+def test_refresh_survives_concurrent_merge():
+    """A segment removed by another writer while loading is retried, never leaving a half-updated view"""
+    print("Testing refresh during a merge...")
+
+    writer = make_index()
+    writer.add_document("a.mp4", [(1.0, "first lecture")])
+    reader = SearchIndex("default", "en")
+    assert len(reader.search("lecture")) == 1
+
+    def segment_vanishing(times):
+        calls = []
+        def open_segment(path):
+            calls.append(path)
+            if len(calls) <= times:
+                raise FileNotFoundError(path)
+            return real_segment(path)
+        return open_segment
+
+    real_segment = search_index.Segment
+    try:
+        # Removed once: the refresh reads the manifest again and succeeds
+        writer.add_document("b.mp4", [(2.0, "second lecture")])
+        search_index.Segment = segment_vanishing(1)
+        assert len(reader.search("lecture")) == 2
+
+        # Removed on every attempt: the previous view stays consistent and in use
+        writer.add_document("c.mp4", [(3.0, "third lecture")])
+        search_index.Segment = segment_vanishing(2)
+        assert len(reader.search("lecture")) == 2
+    finally:
+        search_index.Segment = real_segment
+
+    # Nothing was committed, so the next search loads the new manifest
+    assert len(reader.search("lecture")) == 3
+    print("✓ Refresh retried, view stays consistent")
+
+
+if __name__ == "__main__":
+    test_tokenize()
+    test_search_hits_point_to_cues()
+    test_reindex_and_merge()
+    test_ranking_and_limit()
+    test_refresh_survives_concurrent_merge()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for the bounded chat session store
+"""
+
+import asyncio
+import time
+
+from services.session_store import ChatSession, SessionStore, SessionLimitError
+
+
+def make_store(evicted, **kwargs):
+    async def on_evict(session):
+        await asyncio.sleep(0)
+        evicted.append(session.client_id)
+    return SessionStore(ChatSession, on_evict, **kwargs)
+
+
+def test_lru_eviction_spares_connected():
+    """At the limit the least recently used disconnected sessions make room; connected ones are never evicted"""
+    print("Testing LRU eviction...")
+
+    async def run():
+        evicted = []
+        store = make_store(evicted, max_sessions=3, ttl=3600)
+        for client_id in ("a", "b", "c"):
+            (await store.acquire(client_id)).connected = True
+        store["b"].connected = False
+        store["c"].connected = False
+        await store.acquire("b")
+        (await store.acquire("d")).connected = True
+        # c was used less recently than b
+        assert evicted == ["c"]
+        await store.acquire("e")
+        assert evicted == ["c", "b"]
+        store["e"].connected = True
+        assert len(store) == 3 and store.metrics()["evicted"] == 2
+
+        # Every session is connected: a new client is refused, existing ones still get theirs
+        try:
+            await store.acquire("f")
+            assert False, "expected SessionLimitError"
+        except SessionLimitError:
+            pass
+        assert "f" not in store and len(store) == 3
+        assert (await store.acquire("a")).connected
+        assert store.metrics()["refused"] == 1 and evicted == ["c", "b"]
+
+    asyncio.run(run())
+    print("✓ LRU eviction of disconnected sessions only")
+
+
+def test_idle_sessions_expire():
+    """Disconnected sessions are dropped after the TTL; connected ones are kept"""
+    print("Testing TTL expiry...")
+
+    async def run():
+        evicted = []
+        store = make_store(evicted, ttl=60, sweep_interval=0)
+        idle = await store.acquire("idle")
+        live = await store.acquire("live")
+        live.connected = True
+        idle.last_active = live.last_active = time.monotonic() - 120
+        await store.acquire("new")
+        assert evicted == ["idle"]
+        assert "live" in store and "idle" not in store
+        assert store.metrics()["expired"] == 1
+
+    asyncio.run(run())
+    print("✓ Idle sessions expire")
+
+
+def test_remove_awaits_cleanup_and_metrics():
+    """remove awaits the eviction hook; gauges count sessions and bytes"""
+    print("Testing cleanup and gauges...")
+
+    async def run():
+        evicted = []
+        store = make_store(evicted)
+        session = await store.acquire("a", "session-1")
+        assert session.session_id == "session-1"
+        metrics = store.metrics()
+        assert metrics["sessions"] == 1 and metrics["approx_bytes"] > 0
+        await store.remove("a")
+        assert evicted == ["a"]
+        assert store.metrics()["sessions"] == 0
+
+    asyncio.run(run())
+    print("✓ Cleanup awaited")
+
+
+if __name__ == "__main__":
+    test_lru_eviction_spares_connected()
+    test_idle_sessions_expire()
+    test_remove_awaits_cleanup_and_metrics()
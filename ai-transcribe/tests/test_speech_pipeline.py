@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test script for sentence-pipelined text-to-speech
+"""
+
+import asyncio
+import time
+
+from services.sentence_segmenter import SentenceSegmenter
+from services.speech_pipeline import SpeechPipeline
+
+
+def test_segmenter_cuts_sentences_from_deltas():
+    """Sentences are cut at terminal punctuation, not inside numbers or abbreviations"""
+    print("Testing sentence segmentation...")
+
+    segmenter = SentenceSegmenter(min_chars=4, max_chars=200)
+    sentences = []
+    for delta in ["CORRECT! Th", "e word at costs 3.", "5 euros, e.g. here. Next", " one?"]:
+        sentences += segmenter.feed(delta)
+    sentences += segmenter.flush()
+
+    assert sentences == ["CORRECT!", "The word at costs 3.5 euros, e.g. here.", "Next one?"]
+    print("✓ Sentences segmented")
+
+
+def test_long_run_cut_at_clause():
+    """Text without a sentence end is spoken up to a clause boundary once it gets long"""
+    print("Testing clause fallback...")
+
+    segmenter = SentenceSegmenter(min_chars=4, max_chars=40)
+    sentences = segmenter.feed("first part of a rather long answer, and then it goes on and on")
+    assert sentences == ["first part of a rather long answer,"]
+    print("✓ Long run cut at clause boundary")
+
+
+def test_pipeline_overlaps_synthesis_and_keeps_order():
+    """Later sentences are synthesized while earlier ones stream, audio stays in order"""
+    print("Testing pipeline...")
+
+    async def synthesize(text):
+        # Longer sentences take longer to synthesize
+        for i in range(2):
+            await asyncio.sleep(0.01 * len(text))
+            yield {'audio_chunk': f"{text}-{i}".encode()}
+
+    async def run():
+        pipeline = SpeechPipeline(synthesize, concurrency=3)
+        started = time.perf_counter()
+        for text in ["aaaaaaaaaa", "bb", "c"]:
+            pipeline.submit(text)
+        pipeline.close()
+        audio = []
+        async for index, text, chunks in pipeline.segments():
+            async for chunk in chunks:
+                audio.append(chunk['audio_chunk'])
+        return audio, time.perf_counter() - started
+
+    audio, elapsed = asyncio.run(run())
+
+    assert audio == [b"aaaaaaaaaa-0", b"aaaaaaaaaa-1", b"bb-0", b"bb-1", b"c-0", b"c-1"]
+    # Sequential synthesis would take 0.26 s
+    assert elapsed < 0.24
+    print(f"✓ Ordered audio in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    test_segmenter_cuts_sentences_from_deltas()
+    test_long_run_cut_at_clause()
+    test_pipeline_overlaps_synthesis_and_keeps_order()
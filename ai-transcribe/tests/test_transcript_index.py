@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test script for the transcript embedding index used to ground chat answers
+"""
+
+import os
+import tempfile
+
+from transcript_index import (
+    HashingEmbeddingBackend,
+    build_passages,
+    open_transcript_index,
+    retrieve_passages,
+    transcript_index_paths,
+    write_transcript_index,
+)
+
+CUES = [
+    (0.0, 4.0, "Welcome to the lecture about prepositions."),
+    (4.0, 9.0, "Today we look at the word at."),
+    (40.0, 45.0, "Photosynthesis turns sunlight into chemical energy."),
+    (45.0, 50.0, "Plants store that energy as sugar."),
+    (90.0, 95.0, "Volcanoes erupt when magma pressure builds up."),
+]
+
+
+def write_vtt(directory):
+    path = os.path.join(directory, "lecture.vtt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("WEBVTT\n\n")
+        for i, (start, end, text) in enumerate(CUES, 1):
+            f.write(f"{i}\n00:{int(start) // 60:02d}:{int(start) % 60:02d}.000 --> "
+                    f"00:{int(end) // 60:02d}:{int(end) % 60:02d}.000\n{text}\n\n")
+    return path
+
+
+def test_hashing_backend_is_deterministic():
+    """The local stand-in must return identical vectors across calls and instances"""
+    print("Testing hashing backend...")
+
+    a = HashingEmbeddingBackend().embed(["sunlight energy", "magma"])
+    b = HashingEmbeddingBackend().embed(["sunlight energy", "magma"])
+    assert a.shape == (2, 512)
+    assert (a == b).all()
+    print("✓ Hashing backend is deterministic")
+
+
+def test_passages_group_cues_by_window():
+    """Consecutive cues are merged into passages of about 30 seconds"""
+    print("Testing passage windows...")
+
+    passages = build_passages(CUES, window_seconds=30)
+    assert [(p["start"], p["end"]) for p in passages] == [(0.0, 9.0), (40.0, 50.0), (90.0, 95.0)]
+    assert passages[1]["text"].startswith("Photosynthesis") and "sugar" in passages[1]["text"]
+    print("✓ Passages grouped by window")
+
+
+def test_retrieval_returns_relevant_passage():
+    """The passage sharing the most words with the question ranks first"""
+    print("Testing retrieval...")
+
+    backend = HashingEmbeddingBackend()
+    vtt_path = write_vtt(tempfile.mkdtemp())
+    write_transcript_index(vtt_path, CUES, backend)
+
+    passages = retrieve_passages(vtt_path, "how do plants store energy from sunlight", top_k=1, backend=backend)
+    assert len(passages) == 1
+    assert passages[0]["start"] == 40.0
+
+    # Index files from a different model are rebuilt on open
+    index = open_transcript_index(vtt_path, HashingEmbeddingBackend(dim=64))
+    assert index.matrix.shape == (3, 64)
+    assert all(os.path.exists(p) for p in transcript_index_paths(vtt_path))
+
+    # Index files deleted under the cache are a miss, not an error
+    for path in transcript_index_paths(vtt_path):
+        os.remove(path)
+    index = open_transcript_index(vtt_path, HashingEmbeddingBackend(dim=64))
+    assert index.matrix.shape == (3, 64)
+    assert all(os.path.exists(p) for p in transcript_index_paths(vtt_path))
+    print("✓ Retrieval returns relevant passage")
+
+
+if __name__ == "__main__":
+    test_hashing_backend_is_deterministic()
+    test_passages_group_cues_by_window()
+    test_retrieval_returns_relevant_passage()
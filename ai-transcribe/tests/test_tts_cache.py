@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script for the content-addressed TTS audio cache
+"""
+
+import os
+import tempfile
+import time
+
+from services.tts_cache import TTSCache, tts_cache_key
+
+
+def test_key_normalizes_text_only():
+    """Whitespace variants share a key; voice, model, format and case do not"""
+    print("Testing cache keys...")
+
+    key = tts_cache_key("CORRECT!  Well done.", "alloy", "tts-1", "opus")
+    assert key == tts_cache_key(" CORRECT!\nWell done. ", "alloy", "tts-1", "opus")
+    assert key != tts_cache_key("CORRECT! Well done.", "nova", "tts-1", "opus")
+    assert key != tts_cache_key("CORRECT! Well done.", "alloy", "tts-1", "mp3")
+    assert key != tts_cache_key("correct! well done.", "alloy", "tts-1", "opus")
+    print("✓ Keys normalized")
+
+
+def test_memory_and_disk_tiers():
+    """Memory LRU respects its budget; evicted entries are still served from disk"""
+    print("Testing tiers...")
+
+    cache = TTSCache(tempfile.mkdtemp(), memory_bytes=250, disk_bytes=10_000)
+    for name in ("a", "b", "c"):
+        cache.put(name * 64, name.encode() * 100)
+
+    assert cache.metrics()["memory_entries"] == 2
+    assert cache.get("a" * 64) == b"a" * 100
+    assert cache.get("c" * 64) == b"c" * 100
+    assert cache.get("d" * 64) is None
+    assert (cache.stats["disk_hits"], cache.stats["memory_hits"], cache.stats["misses"]) == (1, 1, 1)
+    print("✓ Memory and disk tiers")
+
+
+def test_disk_budget_evicts_least_recently_used():
+    """The disk tier drops the least recently used files once over budget"""
+    print("Testing disk eviction...")
+
+    cache_dir = tempfile.mkdtemp()
+    cache = TTSCache(cache_dir, memory_bytes=0, disk_bytes=250)
+    cache.put("a" * 64, b"a" * 100)
+    cache.put("b" * 64, b"b" * 100)
+    past = time.time() - 60
+    os.utime(os.path.join(cache_dir, "bb", "b" * 64), (past, past))
+    cache.put("c" * 64, b"c" * 100)
+
+    assert cache.get("b" * 64) is None
+    assert cache.get("a" * 64) == b"a" * 100
+    assert cache.metrics()["disk_bytes"] == 200
+    print("✓ Disk budget enforced")
+
+
+def test_overwriting_a_key_keeps_disk_usage_exact():
+    """Storing a key again replaces its file without growing the disk usage"""
+    print("Testing overwrites...")
+
+    cache = TTSCache(tempfile.mkdtemp(), memory_bytes=0, disk_bytes=250)
+    cache.put("a" * 64, b"a" * 100)
+    for _ in range(5):
+        cache.put("b" * 64, b"b" * 100)
+    cache.put("b" * 64, b"b" * 50)
+
+    assert cache.metrics()["disk_bytes"] == 150
+    assert cache.stats["evictions"] == 0
+    assert cache.get("a" * 64) == b"a" * 100
+    print("✓ Overwrites counted once")
+
+
+if __name__ == "__main__":
+    test_key_normalizes_text_only()
+    test_memory_and_disk_tiers()
+    test_disk_budget_evicts_least_recently_used()
+    test_overwriting_a_key_keeps_disk_usage_exact()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Test script for the video and subtitle HTTP endpoints: CloudFront signing modes,
+subtitle caching, storage downloads and batch requests
+"""
+
+import base64
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from urllib.parse import parse_qs, urlparse
+
+# Keep the chat service's conversation database out of the source tree
+os.environ["CONVERSATION_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "conversations.db")
+
+import rsa
+from fastapi.testclient import TestClient
+
+import helpers
+from transcribe import write_to_local
+from helpers import client_configs, SIGNED_URL_TTL, STORAGE_DIR, generate_signed_url, generate_signed_dir_url
+import websocket_service
+from websocket_service import app
+
+BASE_URL = "https://dtest.cloudfront.net"
+
+
+def write_private_key():
+    _, private_key = rsa.newkeys(1024)
+    fd, key_path = tempfile.mkstemp(suffix=".pem")
+    with os.fdopen(fd, "wb") as f:
+        f.write(private_key.save_pkcs1())
+    return key_path
+
+
+KEY_PATH = write_private_key()
+
+client = TestClient(app)
+
+
+def add_client(client_id, signing_mode, key_path=KEY_PATH):
+    """Register a test tenant using the given signing mode"""
+    client_configs[client_id] = {
+        "CLOUDFRONT_BASE_URL": BASE_URL,
+        "CLOUDFRONT_KEY_PAIR_ID": "KTESTPAIR",
+        "CLOUDFRONT_PRIVATE_KEY_PATH": key_path,
+        "CLOUDFRONT_SIGNING_MODE": signing_mode,
+        "CLOUDFRONT_COOKIE_DOMAIN": "dtest.cloudfront.net"
+    }
+
+
+# Test tenants, one per signing mode
+for mode in ("canned", "query", "cookie"):
+    add_client(f"test-{mode}", mode)
+
+
+SAMPLE_VTT = "WEBVTT\n\n00:00:00.000 --> 00:00:02.000\nHello and welcome.\n"
+
+
+def make_video(files):
+    """Write files into a fresh storage directory for a video.
+
+    Returns (video_key, directory to remove afterwards).
+    """
+    root = f"test-endpoints-{uuid.uuid4().hex[:8]}"
+    video_dir = os.path.join(STORAGE_DIR, root, "lesson")
+    os.makedirs(video_dir)
+    for name, content in files.items():
+        os.makedirs(os.path.dirname(os.path.join(video_dir, name)), exist_ok=True)
+        with open(os.path.join(video_dir, name), "wb") as f:
+            f.write(content if isinstance(content, bytes) else content.encode("utf-8"))
+    return f"{root}/lesson.mp4", os.path.join(STORAGE_DIR, root)
+
+
+def decode_policy(value):
+    """Decode CloudFront's URL-safe base64 policy into its single statement"""
+    raw = value.replace("-", "+").replace("_", "=").replace("~", "/")
+    return json.loads(base64.b64decode(raw))["Statement"][0]
+
+
+def test_signed_url_reuse_and_key_rotation():
+    """Signers and signed URLs are reused within a window and re-signed when the key changes"""
+    print("Testing signed URL reuse...")
+
+    key_path = write_private_key()
+    add_client("test-rotation", "canned", key_path)
+
+    def sign():
+        return client.post("/api/sign-url", json={"key": "course/a.mp4", "client_id": "test-rotation"}).json()
+
+    first = sign()["signed_url"]
+    signer = helpers._signer_cache["test-rotation"][0]
+    assert sign()["signed_url"] == first
+    assert helpers._signer_cache["test-rotation"][0] is signer
+    # However late in its window a URL is issued, it stays valid for the full TTL
+    expires = int(parse_qs(urlparse(first).query)["Expires"][0])
+    assert expires >= time.time() + SIGNED_URL_TTL
+    window_start, window_expires = helpers.get_signature_window()
+    assert helpers.get_signature_window(expires - SIGNED_URL_TTL - 1) == (window_start, window_expires)
+
+    # Rotate the key in place: new key material means a new signer and signature
+    with open(key_path, "wb") as f, open(write_private_key(), "rb") as new_key:
+        f.write(new_key.read())
+    rotated = sign()["signed_url"]
+    assert helpers._signer_cache["test-rotation"][0] is not signer
+    assert rotated != first
+    print("✓ Reused within the window, re-signed after rotation")
+
+
+def test_wildcard_policy_scope():
+    """Wildcard policies cover one video's stream directory and never its siblings"""
+    print("Testing wildcard policy scope...")
+
+    data = client.get("/api/subtitles", params={
+        "video_key": "course/lesson1.mp4", "advanced": True, "client_id": "test-query"
+    }).json()
+
+    resource = decode_policy(parse_qs(urlparse(data["hls_url"]).query)["Policy"][0])["Resource"]
+    assert resource == f"{BASE_URL}/course/lesson1.mp4/*"
+    # A character-wise common prefix of the asset keys would also cover these
+    assert not f"{BASE_URL}/course/lesson10.mp4/hls/lesson10.m3u8".startswith(resource[:-1])
+    assert not f"{BASE_URL}/course/lesson1/img/lesson1_01.png".startswith(resource[:-1])
+    # So the preview, outside the stream directory, gets its own canned signature
+    assert "Expires=" in data["preview_url"] and "Policy=" not in data["preview_url"]
+
+    data = client.get("/api/subtitles", params={
+        "video_key": "course/lesson1.mp4", "client_id": "test-query"
+    }).json()
+    resource = decode_policy(parse_qs(urlparse(data["dash_url"]).query)["Policy"][0])["Resource"]
+    assert resource == f"{BASE_URL}/course/lesson1/*"
+    assert "Policy=" in data["preview_url"]
+    print("✓ Policies scoped to the video's directory")
+
+
+def test_signed_cookie_path():
+    """Signed cookies are scoped to the video's directory so videos do not overwrite each other's cookies"""
+    print("Testing signed cookie paths...")
+
+    response = client.get("/api/subtitles", params={
+        "video_key": "course/lesson1.mp4", "client_id": "test-cookie"
+    })
+    data = response.json()
+    cookies = response.headers.get_list("set-cookie")
+
+    assert {cookie.split("=", 1)[0] for cookie in cookies} == {
+        "CloudFront-Policy", "CloudFront-Signature", "CloudFront-Key-Pair-Id"
+    }
+    assert all("Path=/course/lesson1/" in cookie for cookie in cookies)
+    assert "signed_cookies" not in data and "signed_cookie_path" not in data
+    assert data["hls_url"] == f"{BASE_URL}/course/lesson1/hls/master.m3u8"
+    print("✓ Cookies scoped to /course/lesson1/")
+
+
+def test_subtitle_conditional_requests():
+    """/api/subtitles answers revalidations with 304 until the track set changes"""
+    print("Testing subtitle ETags...")
+
+    video_key, cleanup_dir = make_video({"lesson.vtt": SAMPLE_VTT, "lesson_de.vtt": SAMPLE_VTT})
+    try:
+        params = {"video_key": video_key, "client_id": "test-canned"}
+        response = client.get("/api/subtitles", params=params)
+        etag = response.headers["etag"]
+        assert [track["lang"] for track in response.json()["tracks"]] == ["en", "de"]
+        assert response.headers["cache-control"].startswith("public, max-age=")
+        assert "last-modified" in response.headers
+
+        response = client.get("/api/subtitles", params=params, headers={"If-None-Match": etag})
+        assert response.status_code == 304 and response.content == b""
+        assert response.headers["etag"] == etag
+        response = client.get("/api/subtitles", params=params, headers={"If-None-Match": '"other", ' + etag})
+        assert response.status_code == 304
+
+        # A new track changes the ETag
+        video_dir = os.path.join(STORAGE_DIR, os.path.splitext(video_key)[0])
+        with open(os.path.join(video_dir, "lesson_fr.vtt"), "w", encoding="utf-8") as f:
+            f.write(SAMPLE_VTT)
+        response = client.get("/api/subtitles", params=params, headers={"If-None-Match": etag})
+        assert response.status_code == 200 and response.headers["etag"] != etag
+        assert len(response.json()["tracks"]) == 3
+
+        # Cookie-signed responses must not be stored by shared caches
+        response = client.get("/api/subtitles", params=dict(params, client_id="test-cookie"))
+        assert response.headers["cache-control"].startswith("private")
+    finally:
+        shutil.rmtree(cleanup_dir)
+    print("✓ 304 until the tracks change")
+
+
+def test_storage_range_requests_and_traversal():
+    """Storage endpoints serve byte ranges with strong validators and reject paths outside the granted directory"""
+    print("Testing storage downloads...")
+
+    video_key, cleanup_dir = make_video({"lesson.vtt": SAMPLE_VTT, "hls_subs/en.m3u8": "#EXTM3U\n"})
+    base_key_dir = os.path.splitext(video_key)[0]
+    try:
+        url = generate_signed_url(f"{base_key_dir}/lesson.vtt")
+        response = client.get(url)
+        assert response.status_code == 200 and response.text == SAMPLE_VTT
+        assert response.headers["content-type"] == "text/vtt; charset=utf-8"
+        etag = response.headers["etag"]
+        assert not etag.startswith("W/")
+
+        response = client.get(url, headers={"Range": "bytes=0-5"})
+        assert response.status_code == 206 and response.content == b"WEBVTT"
+        assert response.headers["content-range"] == f"bytes 0-5/{len(SAMPLE_VTT)}"
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        dir_url = generate_signed_dir_url(f"{base_key_dir}/hls_subs")
+        response = client.get(f"{dir_url}/en.m3u8", headers={"Range": "bytes=1-"})
+        assert response.status_code == 206 and response.content == b"EXTM3U\n"
+        assert response.headers["content-type"] == "application/vnd.apple.mpegurl"
+
+        # The token grants hls_subs only; .. must not reach the track next to it
+        for escape in ("%2E%2E/lesson.vtt", "..%2Flesson.vtt", "%2E%2E/%2E%2E/%2E%2E/etc/passwd"):
+            assert client.get(f"{dir_url}/{escape}").status_code == 403
+        assert client.get(generate_signed_url("../requirements.txt")).status_code == 403
+        assert client.get(url[:-2] + "xx").status_code == 401
+    finally:
+        shutil.rmtree(cleanup_dir)
+    print("✓ Ranges served, traversal rejected")
+
+
+def test_storage_hides_internal_files():
+    """Storage endpoints serve published artifacts only, never hidden state or sidecars"""
+    print("Testing internal storage files...")
+
+    video_key, cleanup_dir = make_video({
+        "lesson.vtt": SAMPLE_VTT, "lesson.vtt.gz": gzip.compress(SAMPLE_VTT.encode("utf-8")), "lesson.emb.npy": b"\x93NUMPY",
+        "lesson.emb.json": "{}", ".hidden/lesson.vtt": SAMPLE_VTT, "hls_subs/.index.vtt": SAMPLE_VTT
+    })
+    base_key_dir = os.path.splitext(video_key)[0]
+    jobs_dir = os.path.join(STORAGE_DIR, ".jobs")
+    os.makedirs(jobs_dir, exist_ok=True)
+    job_file = os.path.join(jobs_dir, f"test-{uuid.uuid4().hex[:8]}.json")
+    with open(job_file, "w", encoding="utf-8") as f:
+        f.write("{}")
+    api_key = websocket_service.STORAGE_API_KEY
+    websocket_service.STORAGE_API_KEY = "test-key"
+
+    def storage(path):
+        return client.get(f"/api/storage/{path}", params={"x_api_key": "test-key"}).status_code
+
+    try:
+        assert storage(f"{base_key_dir}/lesson.vtt") == 200
+        assert storage(f"{base_key_dir}/lesson.vtt.gz") == 200
+        assert storage(f".jobs/{os.path.basename(job_file)}") == 404
+        for name in ("lesson.emb.npy", "lesson.emb.json", ".hidden/lesson.vtt"):
+            assert storage(f"{base_key_dir}/{name}") == 404
+        assert client.get(generate_signed_url(f".jobs/{os.path.basename(job_file)}")).status_code == 404
+
+        dir_url = generate_signed_dir_url(f"{base_key_dir}/hls_subs")
+        assert client.get(f"{dir_url}/.index.vtt").status_code == 404
+    finally:
+        websocket_service.STORAGE_API_KEY = api_key
+        os.remove(job_file)
+        shutil.rmtree(cleanup_dir)
+    print("✓ Hidden files and sidecars are not served")
+
+
+def test_precompressed_variant_selection():
+    """Storage downloads pick the precompressed variant from Accept-Encoding and vary on it"""
+    print("Testing precompressed variants...")
+
+    video_key, cleanup_dir = make_video({})
+    base_key_dir = os.path.splitext(video_key)[0]
+    transcript = "WEBVTT\n\n" + "00:00:00.000 --> 00:00:02.000\nA long lecture.\n\n" * 200
+    try:
+        vtt_path = write_to_local(base_key_dir, "lesson", transcript, ".vtt")
+        assert os.path.exists(vtt_path + ".gz") and os.path.exists(vtt_path + ".br")
+        url = generate_signed_url(f"{base_key_dir}/lesson.vtt")
+
+        for accept, expected in (
+            ("gzip, deflate, br", "br"),
+            ("br;q=0, gzip", "gzip"),
+            ("gzip;q=0.5, br;q=0", "gzip"),
+            ("identity", None),
+        ):
+            response = client.get(url, headers={"Accept-Encoding": accept})
+            assert response.headers.get("content-encoding") == expected, accept
+            assert "Accept-Encoding" in response.headers["vary"]
+            assert response.text == transcript
+        assert int(client.get(url, headers={"Accept-Encoding": "br"}).headers["content-length"]) < len(transcript) // 10
+
+        # Each variant has its own ETag, so caches never mix them up
+        etags = {client.get(url, headers={"Accept-Encoding": accept}).headers["etag"] for accept in ("br", "gzip", "identity")}
+        assert len(etags) == 3
+
+        # A variant older than the track is stale and skipped
+        os.utime(vtt_path + ".br", ns=(0, os.stat(vtt_path).st_mtime_ns - 10**9))
+        assert client.get(url, headers={"Accept-Encoding": "br, gzip"}).headers["content-encoding"] == "gzip"
+    finally:
+        shutil.rmtree(cleanup_dir)
+    print("✓ Variants selected from Accept-Encoding")
+
+
+def test_batch_endpoints():
+    """Batch endpoints return one result per item, with per-item errors for invalid keys"""
+    print("Testing batch endpoints...")
+
+    video_key, cleanup_dir = make_video({"lesson.vtt": SAMPLE_VTT, "lesson_de.vtt": SAMPLE_VTT})
+    try:
+        batch = {"video_keys": [video_key, "missing/video.mp4", 42, None, ""], "client_id": "test-cookie"}
+        # Cookie tenants must opt into query signatures explicitly
+        assert "error" in client.post("/api/subtitles/batch", json=batch).json()
+        response = client.post("/api/subtitles/batch", json=dict(batch, signing_mode="query"))
+        assert response.status_code == 200
+        items = response.json()["items"]
+        assert [item["video_key"] for item in items] == [video_key, "missing/video.mp4", 42, None, ""]
+
+        single = client.get("/api/subtitles", params={"video_key": video_key, "client_id": "test-cookie"}).json()
+        assert [track["lang"] for track in items[0]["tracks"]] == [track["lang"] for track in single["tracks"]]
+        assert items[1]["tracks"] == [] and "error" not in items[1]
+        assert all("error" in item for item in items[2:])
+        # ... and then get query signatures, and no cookies
+        assert "Policy=" in items[0]["hls_url"] and "signed_query" in items[0]
+        assert "set-cookie" not in response.headers
+
+        keys = ["course/a.mp4", "course/b.mp4"]
+        response = client.post("/api/sign-url/batch", json={"keys": keys + [["nested"]], "client_id": "test-canned"})
+        data = response.json()
+        assert sorted(data["signed_urls"]) == keys
+        assert data["invalid_keys"] == [["nested"]]
+        single = client.post("/api/sign-url", json={"key": "course/a.mp4", "client_id": "test-canned"}).json()
+        assert data["signed_urls"]["course/a.mp4"] == single["signed_url"]
+
+        too_many = client.post("/api/sign-url/batch", json={"keys": ["k"] * 1000}).json()
+        assert "error" in too_many
+        assert "error" in client.post("/api/subtitles/batch", json={"video_keys": "not-a-list"}).json()
+    finally:
+        shutil.rmtree(cleanup_dir)
+    print("✓ Batches answered per item")
+
+
+def test_search_requires_api_key():
+    """/api/search lists a tenant's videos and quotes transcripts, so it needs the storage API key"""
+    print("Testing search authentication...")
+
+    api_key = websocket_service.STORAGE_API_KEY
+    websocket_service.STORAGE_API_KEY = "test-key"
+    try:
+        params = {"q": "lecture", "client_id": "test-canned"}
+        assert client.get("/api/search", params=params).status_code == 401
+        assert client.get("/api/search", params=dict(params, x_api_key="wrong")).status_code == 401
+        response = client.get("/api/search", params=dict(params, x_api_key="test-key"))
+        assert response.status_code == 200 and "hits" in response.json()
+    finally:
+        websocket_service.STORAGE_API_KEY = api_key
+    print("✓ Search needs the API key")
+
+
+def test_cues_require_track_access():
+    """/api/cues answers with the API key or the track's signed token and checks the language"""
+    print("Testing cue authentication...")
+
+    video_key, cleanup_dir = make_video({"lesson.vtt": SAMPLE_VTT, "lesson_de.vtt": SAMPLE_VTT})
+    base_key_dir = os.path.splitext(video_key)[0]
+    api_key = websocket_service.STORAGE_API_KEY
+    websocket_service.STORAGE_API_KEY = "test-key"
+
+    def cues(**params):
+        return client.get("/api/cues", params=dict({"video_key": video_key, "start": 0, "end": 5}, **params))
+
+    try:
+        assert cues().status_code == 401
+        response = cues(x_api_key="test-key")
+        assert response.status_code == 200
+        assert [cue["text"] for cue in response.json()["cues"]] == ["Hello and welcome."]
+
+        token = generate_signed_url(f"{base_key_dir}/lesson.vtt").rsplit("/", 1)[1]
+        assert cues(token=token).status_code == 200
+        # A token grants its own track only
+        assert cues(token=token, lang="de").status_code == 401
+        assert cues(token=token + "x").status_code == 401
+
+        assert "Unsupported language" in cues(x_api_key="test-key", lang="xx").json()["error"]
+    finally:
+        websocket_service.STORAGE_API_KEY = api_key
+        shutil.rmtree(cleanup_dir)
+    print("✓ Cues need the API key or the track token")
+
+
+if __name__ == "__main__":
+    test_signed_url_reuse_and_key_rotation()
+    test_wildcard_policy_scope()
+    test_signed_cookie_path()
+    test_subtitle_conditional_requests()
+    test_storage_range_requests_and_traversal()
+    test_storage_hides_internal_files()
+    test_search_requires_api_key()
+    test_cues_require_track_access()
+    test_precompressed_variant_selection()
+    test_batch_endpoints()
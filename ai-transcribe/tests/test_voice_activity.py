@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test script for voice activity detection and utterance-level speech transcription
+"""
+
+import asyncio
+import io
+import wave
+
+import numpy as np
+
+from services.speech_recognition_service import SpeechSession
+from services.voice_activity import VoiceActivityDetector, pcm16_to_wav
+
+RATE = 16000
+
+
+def tone(ms, amplitude=8000):
+    t = np.arange(RATE * ms // 1000) / RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype("<i2").tobytes()
+
+
+def silence(ms):
+    return b"\x00\x00" * (RATE * ms // 1000)
+
+
+def feed_in_chunks(vad, pcm, chunk_bytes=1000):
+    events = []
+    for i in range(0, len(pcm), chunk_bytes):
+        events.extend(vad.feed(pcm[i:i + chunk_bytes]))
+    return events
+
+
+def test_utterance_ends_after_silence():
+    """One final utterance per spoken phrase, including the pre-roll, none for clicks"""
+    print("Testing utterance detection...")
+
+    vad = VoiceActivityDetector(RATE, end_silence_ms=600, min_speech_ms=250, pre_roll_ms=300, interim_interval_ms=0)
+    events = feed_in_chunks(vad, silence(1000) + tone(60) + silence(1000))
+    assert events == []
+
+    events = feed_in_chunks(vad, silence(500) + tone(1500) + silence(800) + tone(900) + silence(800))
+    assert [kind for kind, _ in events] == ["final", "final"]
+    # 300 ms pre-roll + speech + the 600 ms of silence that ended it
+    assert abs(len(events[0][1]) / 2 / RATE - 2.4) < 0.05
+    assert not vad.in_speech
+    print("✓ Utterances detected")
+
+
+def test_interim_and_flush():
+    """Long speech yields interim snapshots; flush finalizes the utterance in progress"""
+    print("Testing interim results...")
+
+    vad = VoiceActivityDetector(RATE, interim_interval_ms=1000)
+    events = feed_in_chunks(vad, tone(3500))
+    assert [kind for kind, _ in events] == ["interim"] * 3
+    assert vad.in_speech
+    final = vad.flush()
+    assert [kind for kind, _ in final] == ["final"]
+    assert len(final[0][1]) > len(events[-1][1])
+    print("✓ Interim and flush")
+
+
+def test_pcm16_to_wav():
+    """PCM is wrapped in a valid in-memory WAV container"""
+    print("Testing WAV wrapping...")
+
+    pcm = tone(250)
+    with wave.open(io.BytesIO(pcm16_to_wav(pcm, RATE))) as wav:
+        assert (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) == (1, 2, RATE)
+        assert wav.readframes(wav.getnframes()) == pcm
+    print("✓ WAV wrapping")
+
+
+class RecordingSpeechService:
+    def __init__(self):
+        self.calls = []
+
+    async def transcribe_audio(self, audio_data, use_microsoft=False, audio_format="wav"):
+        self.calls.append(audio_format)
+        await asyncio.sleep(0.01)
+        return {"text": f"utterance {len(self.calls)}", "confidence": 1.0, "is_final": True}
+
+
+def test_session_transcribes_whole_utterances():
+    """Many small frames become one Whisper call per utterance; compressed audio is sent once at the end"""
+    print("Testing speech session...")
+
+    async def run():
+        service = RecordingSpeechService()
+        session = SpeechSession(service, spawn=asyncio.create_task)
+        session.detector = VoiceActivityDetector(RATE, end_silence_ms=600, interim_interval_ms=0)
+        pcm = silence(300) + tone(1200) + silence(700) + tone(1200) + silence(700)
+        frame_bytes = RATE * 2 * 20 // 1000
+        for i in range(0, len(pcm), frame_bytes):
+            session.feed(pcm[i:i + frame_bytes], "pcm16")
+        results = await session.drain()
+        assert [r["utterance"] for r in results] == [0, 1]
+        assert all(r["is_final"] for r in results)
+        assert service.calls == ["wav", "wav"]
+
+        session = SpeechSession(service, spawn=asyncio.create_task)
+        for _ in range(20):
+            session.feed(b"\x1a" * 200, "webm")
+        assert not session.pending
+        session.feed(b"\x1a" * 200, "webm", final=True)
+        results = await session.drain()
+        assert len(results) == 1 and service.calls[-1] == "webm"
+
+    asyncio.run(run())
+    print("✓ Whole utterances transcribed")
+
+
+def test_session_pushes_results_and_caps_compressed_audio():
+    """Finished transcripts are pushed from the task callback; compressed streams are cut at the cap"""
+    print("Testing result push and buffer cap...")
+
+    async def run():
+        service = RecordingSpeechService()
+        pushed = []
+        session = SpeechSession(service, spawn=asyncio.create_task, on_results=pushed.extend, max_encoded_bytes=1000)
+        session.detector = VoiceActivityDetector(RATE, end_silence_ms=600, interim_interval_ms=0)
+
+        session.feed(silence(300) + tone(1200) + silence(700), "pcm16")
+        # Delivered without another feed, completed() or drain() call
+        for _ in range(100):
+            if pushed:
+                break
+            await asyncio.sleep(0.01)
+        assert [(r["utterance"], r["text"]) for r in pushed] == [(0, "utterance 1")]
+        assert session.completed() == []
+
+        for _ in range(4):
+            session.feed(b"\x1a" * 300, "webm")
+        # The fourth chunk would exceed the cap: the first 900 bytes are transcribed, the rest dropped
+        assert session.whisper_calls == 2 and session.encoded == bytearray()
+        session.feed(b"\x1a" * 300, "webm")
+        assert session.encoded == bytearray()
+        await session.drain()
+        assert service.calls == ["wav", "webm"]
+        assert pushed[1] == {"text": "utterance 2", "confidence": 1.0, "is_final": True, "utterance": 1}
+        assert pushed[2]["utterance"] == 1 and "exceeds 1000 bytes" in pushed[2]["error"]
+
+        # The end of the stream clears the cap for the next recording
+        session.feed(b"\x1a" * 300, "webm", final=True)
+        session.feed(b"\x1a" * 300, "webm", final=True)
+        await session.drain()
+        assert pushed[3]["text"] == "utterance 3" and len(service.calls) == 3
+
+    asyncio.run(run())
+    print("✓ Results pushed, oversized recording cut")
+
+
+if __name__ == "__main__":
+    test_utterance_ends_after_silence()
+    test_interim_and_flush()
+    test_pcm16_to_wav()
+    test_session_transcribes_whole_utterances()
+    test_session_pushes_results_and_caps_compressed_audio()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for the cross-process WebSocket message bus
+"""
+
+import asyncio
+import os
+import tempfile
+
+from websocket_bus import WorkerBus
+
+
+def connected(buses):
+    """One hub, and every other worker registered with it"""
+    hubs = [bus for bus in buses if bus.role == "hub"]
+    return len(hubs) == 1 and all(bus.role for bus in buses) and len(hubs[0]._peers) == len(buses) - 1
+
+
+async def start_workers(path, count):
+    inboxes = [[] for _ in range(count)]
+    buses = []
+    for i in range(count):
+        bus = WorkerBus(
+            lambda client_id, message, inbox=inboxes[i]: inbox.append((client_id, message)),
+            stats=lambda i=i: {"connections": i},
+            path=path,
+            stats_interval=0.05
+        )
+        bus.worker_id = 1000 + i
+        await bus.start()
+        buses.append(bus)
+    for _ in range(100):
+        if connected(buses):
+            break
+        await asyncio.sleep(0.02)
+    return buses, inboxes
+
+
+def test_messages_reach_other_workers():
+    """A message from any worker reaches every other worker, binary payloads included"""
+    print("Testing bus routing...")
+
+    async def run():
+        path = os.path.join(tempfile.mkdtemp(), "bus.sock")
+        buses, inboxes = await start_workers(path, 3)
+        assert sorted(bus.role for bus in buses) == ["hub", "peer", "peer"]
+
+        peer = next(bus for bus in buses if bus.role == "peer")
+        peer.send("client-1", {"type": "job_progress", "data": {"progress": 50}})
+        peer.send("client-1", b"\x01\x01\x03\x00audio")
+        await asyncio.sleep(0.1)
+        for bus, inbox in zip(buses, inboxes):
+            expected = [] if bus is peer else [
+                ("client-1", {"type": "job_progress", "data": {"progress": 50}}),
+                ("client-1", b"\x01\x01\x03\x00audio")
+            ]
+            assert [m for m in inbox] == expected
+
+        assert sorted(buses[0].worker_metrics()) == [1000, 1001, 1002]
+        for bus in buses:
+            await bus.stop()
+
+    asyncio.run(run())
+    print("✓ Messages routed")
+
+
+def test_new_hub_after_hub_exits():
+    """When the hub stops, a remaining worker takes over and routing continues"""
+    print("Testing hub failover...")
+
+    async def run():
+        path = os.path.join(tempfile.mkdtemp(), "bus.sock")
+        buses, inboxes = await start_workers(path, 3)
+        hub = next(bus for bus in buses if bus.role == "hub")
+        await hub.stop()
+        rest = [bus for bus in buses if bus is not hub]
+        for _ in range(100):
+            if connected(rest):
+                break
+            await asyncio.sleep(0.05)
+        assert sorted(str(bus.role) for bus in rest) == ["hub", "peer"]
+
+        rest[0].broadcast({"type": "notice"})
+        await asyncio.sleep(0.1)
+        assert inboxes[buses.index(rest[1])][-1] == (None, {"type": "notice"})
+        for bus in rest:
+            await bus.stop()
+
+    asyncio.run(run())
+    print("✓ Hub failover")
+
+
+if __name__ == "__main__":
+    test_messages_reach_other_workers()
+    test_new_hub_after_hub_exits()
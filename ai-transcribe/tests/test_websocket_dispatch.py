@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test script for per-connection WebSocket message dispatch
+"""
+
+import asyncio
+
+from websocket_dispatch import MessageDispatcher
+
+
+def test_lanes_run_concurrently_in_order():
+    """A slow chat answer does not hold back speech chunks, which stay in order"""
+    print("Testing lanes...")
+
+    handled = []
+
+    async def handler(message):
+        if message["type"] == "chat_request":
+            await asyncio.sleep(0.2)
+        else:
+            await asyncio.sleep(0.01)
+        handled.append(message.get("seq", message["type"]))
+
+    async def run():
+        dispatcher = MessageDispatcher(handler)
+        dispatcher.submit({"type": "chat_request"})
+        for seq in range(5):
+            dispatcher.submit({"type": "speech_data", "seq": seq})
+        await asyncio.sleep(0.1)
+        speech_done = list(handled)
+        await asyncio.sleep(0.2)
+        await dispatcher.close()
+        return speech_done
+
+    speech_done = asyncio.run(run())
+
+    assert speech_done == [0, 1, 2, 3, 4]
+    assert handled[-1] == "chat_request"
+    print("✓ Speech lane ran while chat was busy, in order")
+
+
+def test_interrupt_is_handled_immediately():
+    """Control messages bypass the lanes and the in-flight limit"""
+    print("Testing interrupt...")
+
+    handled = []
+
+    async def handler(message):
+        if message["type"] == "chat_request":
+            await asyncio.sleep(1)
+        handled.append(message["type"])
+
+    async def run():
+        dispatcher = MessageDispatcher(handler, max_inflight=2)
+        assert dispatcher.submit({"type": "chat_request"})
+        assert dispatcher.submit({"type": "chat_request"})
+        assert not dispatcher.submit({"type": "chat_request"})
+        assert dispatcher.submit({"type": "interrupt"})
+        await asyncio.sleep(0.05)
+        await dispatcher.close()
+
+    asyncio.run(run())
+
+    assert handled == ["interrupt"]
+    print("✓ Interrupt handled while the chat lane was busy")
+
+
+def test_unknown_service_types_get_no_lane():
+    """Made-up service types are rejected before a lane and its worker task are created"""
+    print("Testing lane validation...")
+
+    handled = []
+
+    async def handler(message):
+        handled.append(message["service_type"])
+
+    async def run():
+        dispatcher = MessageDispatcher(handler)
+        for i in range(100):
+            assert not dispatcher.submit({"type": "chat_request", "service_type": f"made-up-{i}"})
+        assert not dispatcher.submit({"type": "chat_request", "service_type": ["ai_chat"]})
+        assert dispatcher.submit({"type": "chat_request", "service_type": "tts"})
+        await asyncio.sleep(0.05)
+        lanes = list(dispatcher._lanes)
+        await dispatcher.close()
+        return lanes
+
+    lanes = asyncio.run(run())
+
+    assert lanes == ["tts:chat"]
+    assert handled == ["tts"]
+    print("✓ Only known service types get lanes")
+
+
+if __name__ == "__main__":
+    test_lanes_run_concurrently_in_order()
+    test_interrupt_is_handled_immediately()
+    test_unknown_service_types_get_no_lane()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-connection WebSocket outbound queue
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+
+# Keep the chat service's conversation database out of the source tree
+os.environ["CONVERSATION_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "conversations.db")
+
+from fastapi.testclient import TestClient
+
+import websocket_service
+from websocket_outbound import OutboundQueue
+
+
+class SlowWebSocket:
+    """Accepts one frame per `delay` seconds"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.frames = []
+        self.close_code = None
+
+    async def send_text(self, text):
+        await asyncio.sleep(self.delay)
+        self.frames.append(json.loads(text))
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+def delta(content):
+    return {"type": "chat_response_chunk", "data": {"content": content}}
+
+
+def test_producer_never_waits_and_deltas_coalesce():
+    """A full queue absorbs text deltas into its tail instead of blocking the producer"""
+    print("Testing coalescing...")
+
+    async def run():
+        websocket = SlowWebSocket(delay=0.05)
+        outbound = OutboundQueue(websocket, max_messages=2, overflow=("coalesce", "disconnect"))
+        for i in range(20):
+            assert outbound.send(delta(str(i % 10)))
+        await asyncio.sleep(0.3)
+        metrics = outbound.metrics()
+        await outbound.close()
+        return websocket, metrics
+
+    websocket, metrics = asyncio.run(run())
+
+    assert "".join(frame["data"]["content"] for frame in websocket.frames) == "01234567890123456789"
+    assert len(websocket.frames) < 20
+    assert metrics["coalesced"] > 0 and metrics["max_depth"] == 2
+    print(f"✓ 20 deltas sent as {len(websocket.frames)} frames")
+
+
+def test_coalescing_leaves_shared_messages_alone():
+    """A broadcast delta queued for several clients is not changed by one client's coalescing"""
+    print("Testing coalescing of shared messages...")
+
+    async def run():
+        shared = delta("a")
+        slow = OutboundQueue(SlowWebSocket(delay=1), max_messages=1, overflow=("coalesce",))
+        fast = OutboundQueue(SlowWebSocket(), max_messages=1, overflow=("coalesce",))
+        slow.send({"type": "audio_chunk", "data": {}})
+        await asyncio.sleep(0)  # the slow writer blocks on its socket
+        slow.send(shared)
+        fast.send(shared)
+        assert slow.send(delta("b"))
+        await asyncio.sleep(0.05)
+        frames = fast.websocket.frames
+        await fast.close()
+        await slow.close()
+        return shared, frames
+
+    shared, frames = asyncio.run(run())
+
+    assert shared == delta("a")
+    assert [frame["data"]["content"] for frame in frames] == ["a"]
+    print("✓ Shared message unchanged")
+
+
+def test_stale_dropped_then_disconnect():
+    """Interim results are dropped first; a client that still cannot keep up is disconnected"""
+    print("Testing overflow policies...")
+
+    aborted = []
+
+    async def run():
+        websocket = SlowWebSocket(delay=1)
+        outbound = OutboundQueue(websocket, on_abort=lambda: aborted.append(True), max_messages=2,
+                                 overflow=("drop_stale", "disconnect"))
+        outbound.send({"type": "audio_chunk", "data": {}})
+        await asyncio.sleep(0)  # writer takes the first message and blocks on the socket
+        outbound.send({"type": "speech_transcription", "data": {"text": "hel", "is_final": False}})
+        outbound.send({"type": "audio_chunk", "data": {}})
+        # Queue is full: the interim transcript makes room
+        assert outbound.send({"type": "audio_chunk", "data": {}})
+        assert outbound.metrics()["dropped"] == 1
+        # Nothing stale left: the client is given up on
+        assert not outbound.send({"type": "audio_chunk", "data": {}})
+        await outbound.close()
+        return websocket
+
+    websocket = asyncio.run(run())
+
+    assert aborted == [True]
+    assert websocket.close_code == 1013
+    print("✓ Stale message dropped, slow client disconnected")
+
+
+def test_metrics_endpoint_requires_api_key():
+    """/api/websocket/metrics lists client ids, so it is only served with the storage API key"""
+    print("Testing metrics authentication...")
+
+    client = TestClient(websocket_service.app)
+    original_key = websocket_service.STORAGE_API_KEY
+    try:
+        websocket_service.STORAGE_API_KEY = None
+        assert client.get("/api/websocket/metrics").status_code == 401
+
+        websocket_service.STORAGE_API_KEY = "metrics-key"
+        assert client.get("/api/websocket/metrics").status_code == 401
+        assert client.get("/api/websocket/metrics", params={"x_api_key": "wrong"}).status_code == 401
+        response = client.get("/api/websocket/metrics", params={"x_api_key": "metrics-key"})
+        assert response.status_code == 200
+        assert {"connections", "sessions", "worker", "workers"} <= set(response.json())
+    finally:
+        websocket_service.STORAGE_API_KEY = original_key
+    print("✓ Metrics need the API key")
+
+
+if __name__ == "__main__":
+    test_producer_never_waits_and_deltas_coalesce()
+    test_coalescing_leaves_shared_messages_alone()
+    test_stale_dropped_then_disconnect()
+    test_metrics_endpoint_requires_api_key()
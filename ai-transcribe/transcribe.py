@@ -1,5 +1,6 @@
 import os
 import datetime
+import gzip
 import tempfile
 import boto3
 import subprocess
@@ -10,6 +11,11 @@ import tiktoken
 
 from logger_config import logger
 from config_loader import load_client_configs, get_client_config
+from cue_index import write_cue_index, parse_vtt_cues
+from hls_subtitles import HLS_SUBTITLE_DIR, build_segmented_webvtt, build_media_tag
+from helpers import generate_signed_dir_url, get_supported_languages
+from search_index import index_subtitle_track
+from transcript_index import write_transcript_index
 
 import openai
 from openai import OpenAI
@@ -17,6 +23,12 @@ from openai import OpenAI, AsyncOpenAI
 
 from itsdangerous import URLSafeTimedSerializer, BadSignature
 
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    logger.warning("brotli not available, only gzip variants will be precompressed")
+    BROTLI_AVAILABLE = False
 
 
 # === CONFIGURATION ===
@@ -199,7 +211,8 @@ def translate_with_gpt4(text, lang, max_retries=5):
 def process_s3_target(bucket, key_or_prefix, prompt_lang="en", enable_translation=False,
                       upload=False, upload_bucket=None, upload_prefix=None,
                       cloudfront_base_url=None, advanced_encoding=False,
-                      translate_languages=None, override=False, client_id='default'):
+                      translate_languages=None, override=False, client_id='default',
+                      hls_subtitles=False):
     logger.info(f"Processing S3 target: {key_or_prefix}")
     if any(key_or_prefix.lower().endswith(ext) for ext in VIDEO_EXTENSIONS):
         logger.info("Detected single MP4 file input.")
@@ -209,7 +222,8 @@ def process_s3_target(bucket, key_or_prefix, prompt_lang="en", enable_translatio
             cloudfront_base_url=cloudfront_base_url, advanced_encoding=advanced_encoding,
             translate_languages=translate_languages,
             override=override,
-            client_id=client_id
+            client_id=client_id,
+            hls_subtitles=hls_subtitles
         )]
     else:
         logger.info("Detected directory input.")
@@ -220,7 +234,8 @@ def process_s3_target(bucket, key_or_prefix, prompt_lang="en", enable_translatio
             cloudfront_base_url=cloudfront_base_url, advanced_encoding=advanced_encoding,
             translate_languages=translate_languages,
             override=override,
-            client_id=client_id
+            client_id=client_id,
+            hls_subtitles=hls_subtitles
         ) for key in video_keys]
 
 
@@ -232,16 +247,89 @@ def upload_to_s3(bucket, key, content, suffix):
     return output_key
 
 
+def write_atomic(path, data):
+    """Write bytes to path via a temp file and rename so readers never see partial files"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_precompressed_variants(path, data):
+    """Store .gz and .br variants next to an artifact so it can be served without per-request compression"""
+    write_atomic(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+    if BROTLI_AVAILABLE:
+        write_atomic(path + ".br", brotli.compress(data, mode=brotli.MODE_TEXT, quality=11))
+
+
 def write_to_local(dir_path, base_filename, content, suffix):
     out_path = os.path.join(STORAGE_DIR, dir_path, base_filename + suffix)
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
     logger.debug(f"Writing file to: {out_path}, length: {len(content)} chars")
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(content)
+    data = content.encode("utf-8")
+    # Variants are written after the original so they are never older than it
+    write_atomic(out_path, data)
+    write_precompressed_variants(out_path, data)
     logger.info(f"Stored file locally at {out_path}")
     return out_path
 
 
+def publish_subtitle_artifacts(vtt_path, vtt_text, video_key, lang, client_id='default'):
+    """Build the derived artifacts that accompany a stored subtitle track"""
+    try:
+        write_cue_index(vtt_path, vtt_text)
+    except Exception as e:
+        logger.error(f"Failed to build cue index for {vtt_path}: {e}")
+
+    cues = parse_vtt_cues(vtt_text)
+    try:
+        index_subtitle_track(client_id, lang, video_key, cues)
+    except Exception as e:
+        logger.error(f"Failed to update search index for {vtt_path}: {e}")
+
+    try:
+        write_transcript_index(vtt_path, cues)
+    except Exception as e:
+        # Chat retrieval rebuilds the index lazily on first use
+        logger.error(f"Failed to build transcript embedding index for {vtt_path}: {e}")
+
+
+def write_hls_subtitle_renditions(base_key, filename_base):
+    """Write segmented WebVTT and a media playlist for every stored subtitle track.
+
+    Returns {lang: playlist filename} relative to the video's hls_subs directory.
+    """
+    hls_dir = os.path.join(STORAGE_DIR, base_key, HLS_SUBTITLE_DIR)
+    source_lang = get_source_language_from_filename(base_key)
+    renditions = {}
+
+    for lang in [None] + SUPPORTED_LANGUAGES:
+        suffix = ".vtt" if lang is None else f"_{lang}.vtt"
+        vtt_path = os.path.join(STORAGE_DIR, base_key, filename_base + suffix)
+        code = lang or source_lang
+        if code in renditions or not os.path.exists(vtt_path):
+            continue
+
+        with open(vtt_path, "r", encoding="utf-8") as f:
+            playlist, segments = build_segmented_webvtt(parse_vtt_cues(f.read()), code)
+
+        os.makedirs(os.path.join(hls_dir, code), exist_ok=True)
+        for name, text in segments:
+            write_atomic(os.path.join(hls_dir, name), text.encode("utf-8"))
+        # Drop segments left over from a previous, longer track
+        current = {os.path.basename(name) for name, _ in segments}
+        for old in os.listdir(os.path.join(hls_dir, code)):
+            if old.endswith(".webvtt") and old not in current:
+                os.remove(os.path.join(hls_dir, code, old))
+        # Playlist last, so it never references missing segments
+        write_atomic(os.path.join(hls_dir, f"{code}.m3u8"), playlist.encode("utf-8"))
+
+        renditions[code] = f"{code}.m3u8"
+        logger.info(f"Wrote {len(segments)} HLS subtitle segments for {code} in {hls_dir}")
+
+    return renditions
+
+
 def check_existing_files(bucket, key, translate_languages=None):
     base_key = key.rsplit(".", 1)[0]
     filename_base = os.path.basename(base_key)
@@ -337,7 +425,8 @@ def chunk_subtitles(subtitles, max_per_chunk=30):
 def process_single_video(bucket, key, prompt_lang="en", enable_translation=False,
                          upload=False, upload_bucket=None, upload_prefix=None,
                          cloudfront_base_url=None, advanced_encoding=False,
-                         translate_languages=None, override=False, client_id='default'):
+                         translate_languages=None, override=False, client_id='default',
+                         hls_subtitles=False):
     logger.info(f"Processing single video: {key}")
     logger.debug(f"Prompt lang: {prompt_lang}, Translate: {enable_translation}, Upload: {upload}")
     logger.debug(f"Upload bucket: {upload_bucket}, Upload prefix: {upload_prefix}")
@@ -415,7 +504,11 @@ def process_single_video(bucket, key, prompt_lang="en", enable_translation=False
             upload_to_s3(upload_bucket or bucket, key, fixed_srt_data, ".vtt")
         else:
             write_to_local(base_key, filename_base, full_transcript, ".txt")
-            write_to_local(base_key, filename_base, "WEBVTT\n\n" + fixed_srt_data, ".vtt")
+            vtt_text = "WEBVTT\n\n" + fixed_srt_data
+            vtt_path = write_to_local(base_key, filename_base, vtt_text, ".vtt")
+            # Whisper translation turns non-English sources into English subtitles
+            source_lang = "en" if enable_translation else prompt_lang
+            publish_subtitle_artifacts(vtt_path, vtt_text, key, source_lang, client_id)
 
     # --- TRANSLATION WITH GPT-4 ---
     if translate_languages:
@@ -477,7 +570,8 @@ def process_single_video(bucket, key, prompt_lang="en", enable_translation=False
                 s3_path = f"{upload_prefix or 'vtt'}/{filename_base}_{lang}.vtt"
                 upload_to_s3(upload_bucket or bucket, s3_path, fixed_translated_text, "")
             else:
-                write_to_local(base_key, filename_base, fixed_translated_text, f"_{lang}.vtt")
+                vtt_path = write_to_local(base_key, filename_base, fixed_translated_text, f"_{lang}.vtt")
+                publish_subtitle_artifacts(vtt_path, fixed_translated_text, key, lang, client_id)
 
     # Generate streaming URLs based on encoding type with sanitization
     file_name = os.path.basename(key)
@@ -524,6 +618,19 @@ def process_single_video(bucket, key, prompt_lang="en", enable_translation=False
         "available_languages": available_languages
     }
 
+    # Segmented WebVTT renditions for HLS players
+    if hls_subtitles and not upload:
+        renditions = write_hls_subtitle_renditions(base_key, filename_base)
+        hls_dir_url = generate_signed_dir_url(f"{base_key}/{HLS_SUBTITLE_DIR}", client_id)
+        result["hls_subtitle_playlists"] = {
+            lang: f"{hls_dir_url}/{playlist}" for lang, playlist in renditions.items()
+        }
+        languages = get_supported_languages()
+        result["hls_subtitle_media"] = [
+            build_media_tag(lang, languages.get(lang, lang), url, default=(i == 0))
+            for i, (lang, url) in enumerate(result["hls_subtitle_playlists"].items())
+        ]
+
     # Add signed URLs for all available languages (including translated subtitles)
     for lang in available_languages:
         if lang == "en":
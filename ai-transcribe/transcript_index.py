@@ -0,0 +1,227 @@
+"""
+Embedding index of transcript passages for grounding chat answers.
+
+Each subtitle track gets a <name>.emb.npy matrix (one L2-normalised float32
+row per passage) and a <name>.emb.json sidecar with the passage timings and
+text. Passages are windows of consecutive cues, so a multi-hour lecture is a
+few hundred rows and brute-force cosine search stays well under a millisecond.
+
+Embeddings come from a pluggable backend selected with EMBEDDING_BACKEND:
+"openai" (default) calls the embeddings API, "hashing" is a deterministic
+local stand-in that needs no network and is used by the tests.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from logger_config import logger
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_BATCH_SIZE = 256
+PASSAGE_WINDOW_SECONDS = float(os.getenv("TRANSCRIPT_PASSAGE_SECONDS", "30"))
+PASSAGE_MAX_CHARS = 1200
+TRANSCRIPT_INDEX_SUFFIX = ".emb"
+MAX_OPEN_INDEXES = 128
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbeddingBackend:
+    """Deterministic bag-of-words embeddings via feature hashing"""
+
+    name = "hashing"
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self.model = f"hashing-{dim}"
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _WORD_RE.findall(text.lower()):
+                digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                vectors[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+        return vectors
+
+
+class OpenAIEmbeddingBackend:
+    """Embeddings from the OpenAI embeddings API"""
+
+    name = "openai"
+
+    def __init__(self, model=EMBEDDING_MODEL):
+        from openai import OpenAI
+        self.model = model
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    def embed(self, texts):
+        vectors = []
+        for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            response = self.client.embeddings.create(model=self.model, input=texts[i:i + EMBEDDING_BATCH_SIZE])
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+
+
+EMBEDDING_BACKENDS = {
+    "hashing": HashingEmbeddingBackend,
+    "openai": OpenAIEmbeddingBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_embedding_backend():
+    """Return the process-wide embedding backend selected by EMBEDDING_BACKEND"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if EMBEDDING_BACKEND not in EMBEDDING_BACKENDS:
+                raise ValueError(f"Unknown embedding backend: {EMBEDDING_BACKEND}")
+            _backend = EMBEDDING_BACKENDS[EMBEDDING_BACKEND]()
+        return _backend
+
+
+def set_embedding_backend(backend):
+    """Override the embedding backend (tests, scripts)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+        _open_indexes.clear()
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def build_passages(cues, window_seconds=PASSAGE_WINDOW_SECONDS, max_chars=PASSAGE_MAX_CHARS):
+    """Group consecutive cues into passages of about window_seconds"""
+    passages = []
+    current = None
+    for start, end, text in cues:
+        text = " ".join(text.split())
+        if current and (end - current["start"] > window_seconds
+                        or len(current["text"]) + len(text) + 1 > max_chars):
+            passages.append(current)
+            current = None
+        if current is None:
+            current = {"start": start, "end": end, "text": text}
+        else:
+            current["end"] = max(current["end"], end)
+            current["text"] += " " + text
+    if current:
+        passages.append(current)
+    return passages
+
+
+def transcript_index_paths(vtt_path):
+    """(matrix_path, metadata_path) of the embedding index belonging to a .vtt file"""
+    base = os.path.splitext(vtt_path)[0] + TRANSCRIPT_INDEX_SUFFIX
+    return base + ".npy", base + ".json"
+
+
+def write_transcript_index(vtt_path, cues, backend=None):
+    """Embed the passages of a subtitle track and atomically store the index"""
+    backend = backend or get_embedding_backend()
+    passages = build_passages(cues)
+    if passages:
+        matrix = _normalize(backend.embed([p["text"] for p in passages]))
+    else:
+        matrix = np.zeros((0, 0), dtype=np.float32)
+
+    matrix_path, meta_path = transcript_index_paths(vtt_path)
+    tmp_suffix = f".{os.getpid()}.tmp"
+    with open(matrix_path + tmp_suffix, "wb") as f:
+        np.save(f, matrix)
+    with open(meta_path + tmp_suffix, "w", encoding="utf-8") as f:
+        json.dump({"backend": backend.name, "model": backend.model, "passages": passages}, f, ensure_ascii=False)
+    # Matrix first: readers key their cache on the metadata file
+    os.replace(matrix_path + tmp_suffix, matrix_path)
+    os.replace(meta_path + tmp_suffix, meta_path)
+    logger.debug(f"Wrote transcript index with {len(passages)} passages to {matrix_path}")
+    return matrix_path
+
+
+class TranscriptIndex:
+    """In-memory embedding matrix and passages of one subtitle track"""
+
+    def __init__(self, vtt_path):
+        matrix_path, meta_path = transcript_index_paths(vtt_path)
+        self.stat = os.stat(meta_path)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.backend = meta["backend"]
+        self.model = meta["model"]
+        self.passages = meta["passages"]
+        self.matrix = np.load(matrix_path, mmap_mode="r")
+
+    def search(self, query_vector, top_k=4):
+        """Return the top_k passages by cosine similarity, in transcript order"""
+        if not self.passages or self.matrix.shape[1] != query_vector.shape[0]:
+            return []
+        scores = self.matrix @ query_vector
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        return [dict(self.passages[i], score=round(float(scores[i]), 4)) for i in sorted(best)]
+
+
+_open_indexes = OrderedDict()
+_open_lock = threading.Lock()
+
+
+def _is_current(vtt_path, backend):
+    _, meta_path = transcript_index_paths(vtt_path)
+    try:
+        if os.stat(meta_path).st_mtime_ns < os.stat(vtt_path).st_mtime_ns:
+            return False
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return False
+    return meta.get("backend") == backend.name and meta.get("model") == backend.model
+
+
+def open_transcript_index(vtt_path, backend=None):
+    """Open the embedding index for a .vtt file, (re)building it when missing, stale or from another model"""
+    from cue_index import parse_vtt_cues
+
+    backend = backend or get_embedding_backend()
+    _, meta_path = transcript_index_paths(vtt_path)
+    with _open_lock:
+        cached = _open_indexes.get(vtt_path)
+    try:
+        meta_mtime_ns = os.stat(meta_path).st_mtime_ns
+    except FileNotFoundError:
+        # Index files removed (or being replaced) under the cache: rebuild
+        meta_mtime_ns = None
+    if cached is None or cached.model != backend.model or meta_mtime_ns != cached.stat.st_mtime_ns:
+        if not _is_current(vtt_path, backend):
+            with open(vtt_path, "r", encoding="utf-8") as f:
+                write_transcript_index(vtt_path, parse_vtt_cues(f.read()), backend)
+        cached = TranscriptIndex(vtt_path)
+
+    with _open_lock:
+        _open_indexes[vtt_path] = cached
+        _open_indexes.move_to_end(vtt_path)
+        while len(_open_indexes) > MAX_OPEN_INDEXES:
+            _open_indexes.popitem(last=False)
+    return cached
+
+
+def retrieve_passages(vtt_path, query, top_k=4, backend=None):
+    """Top-k transcript passages of a subtitle track relevant to a query"""
+    backend = backend or get_embedding_backend()
+    index = open_transcript_index(vtt_path, backend)
+    if not index.passages:
+        return []
+    query_vector = _normalize(backend.embed([query]))[0]
+    return index.search(query_vector, top_k)
@@ -0,0 +1,216 @@
+"""
+Cross-process message bus for multi-worker serving.
+
+With WORKERS > 1 every uvicorn worker process holds its own WebSocket
+connections. Messages for a client connected to another worker, broadcasts
+and per-worker metrics travel over this bus. One worker is the hub: it holds
+an flock on WS_BUS_PATH + ".lock" and listens on the Unix socket WS_BUS_PATH.
+Every other worker connects to the hub. The hub relays each message to all
+other workers, and each worker delivers it only if it holds that client's
+connection. When the hub exits, the kernel releases its lock and another
+worker takes over.
+
+Frames are length-prefixed (little endian):
+
+    header_len   u32
+    payload_len  u32
+    header       JSON: op (send | broadcast | stats), worker, client_id, binary
+    payload      a JSON message, or a binary audio frame when binary is set
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import struct
+import tempfile
+import time
+from typing import Any, Callable, Dict, Optional, Set, Tuple, Union
+
+from logger_config import logger
+
+WORKERS = int(os.getenv("WORKERS", "1"))
+WS_BUS_PATH = os.getenv(
+    "WS_BUS_PATH", os.path.join(tempfile.gettempdir(), f"ai-transcribe-{os.getenv('PORT', '80')}.sock")
+)
+WS_BUS_STATS_INTERVAL_S = float(os.getenv("WS_BUS_STATS_INTERVAL_S", "5"))
+# Messages to a worker whose socket buffer is this full are dropped rather than buffered without bound
+WS_BUS_MAX_BUFFER_BYTES = int(os.getenv("WS_BUS_MAX_BUFFER_BYTES", str(8 * 1024 * 1024)))
+
+_FRAME = struct.Struct("<II")
+
+Message = Union[Dict[str, Any], bytes]
+
+
+def encode_bus_frame(header: Dict[str, Any], payload: bytes) -> bytes:
+    header_bytes = json.dumps(header).encode("utf-8")
+    return _FRAME.pack(len(header_bytes), len(payload)) + header_bytes + payload
+
+
+async def read_bus_frame(reader: asyncio.StreamReader) -> Tuple[Dict[str, Any], bytes, bytes]:
+    """Read one frame; returns (header, payload, raw frame) and raises IncompleteReadError at EOF"""
+    prefix = await reader.readexactly(_FRAME.size)
+    header_len, payload_len = _FRAME.unpack(prefix)
+    body = await reader.readexactly(header_len + payload_len)
+    return json.loads(body[:header_len]), body[header_len:], prefix + body
+
+
+class WorkerBus:
+    """Connection of one worker process to the bus"""
+
+    def __init__(self, deliver: Callable[[Optional[str], Message], None], stats: Callable[[], Dict[str, Any]],
+                 path: str = WS_BUS_PATH, stats_interval: float = WS_BUS_STATS_INTERVAL_S):
+        self.deliver = deliver
+        self.stats = stats
+        self.path = path
+        self.stats_interval = stats_interval
+        self.worker_id = os.getpid()
+        self.role: Optional[str] = None
+        self.workers: Dict[int, Dict[str, Any]] = {}
+        self.metrics = {"published": 0, "received": 0, "relayed": 0, "dropped": 0, "reconnects": 0}
+        self._lock_fd: Optional[int] = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self._hub: Optional[asyncio.StreamWriter] = None
+        self._tasks = []
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._run()), asyncio.create_task(self._publish_stats())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._release_lock()
+
+    def _try_lock(self) -> bool:
+        fd = os.open(f"{self.path}.lock", os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _release_lock(self):
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    async def _run(self):
+        while True:
+            try:
+                if self._lock_fd is not None or self._try_lock():
+                    await self._serve()
+                else:
+                    await self._connect()
+            except asyncio.CancelledError:
+                raise
+            except (ConnectionError, FileNotFoundError, asyncio.IncompleteReadError):
+                # The hub is starting up or just went away
+                pass
+            except Exception as e:
+                logger.warning(f"Worker bus error: {e}")
+            self.role = None
+            self.metrics["reconnects"] += 1
+            await asyncio.sleep(0.2)
+
+    async def _serve(self):
+        # A socket file left by a hub that died is stale; only the lock holder gets here
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        server = await asyncio.start_unix_server(self._handle_peer, self.path)
+        os.chmod(self.path, 0o600)
+        self.role = "hub"
+        logger.info(f"Worker {self.worker_id} is the message bus hub on {self.path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for writer in list(self._peers):
+                writer.close()
+            self._peers.clear()
+
+    async def _handle_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._peers.add(writer)
+        try:
+            while True:
+                header, payload, frame = await read_bus_frame(reader)
+                self._receive(header, payload)
+                self._relay(frame, exclude=writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        self._hub = writer
+        self.role = "peer"
+        try:
+            while True:
+                header, payload, _ = await read_bus_frame(reader)
+                self._receive(header, payload)
+        finally:
+            self._hub = None
+            writer.close()
+
+    def _write(self, writer: asyncio.StreamWriter, frame: bytes) -> bool:
+        if writer.is_closing() or writer.transport.get_write_buffer_size() > WS_BUS_MAX_BUFFER_BYTES:
+            self.metrics["dropped"] += 1
+            return False
+        writer.write(frame)
+        return True
+
+    def _relay(self, frame: bytes, exclude: Optional[asyncio.StreamWriter] = None):
+        for writer in list(self._peers):
+            if writer is not exclude and self._write(writer, frame):
+                self.metrics["relayed"] += 1
+
+    def _publish(self, header: Dict[str, Any], payload: bytes):
+        header["worker"] = self.worker_id
+        frame = encode_bus_frame(header, payload)
+        self.metrics["published"] += 1
+        if self.role == "hub":
+            self._relay(frame)
+        elif self._hub is not None:
+            self._write(self._hub, frame)
+        else:
+            # Between hubs; the message has nowhere to go
+            self.metrics["dropped"] += 1
+
+    def _receive(self, header: Dict[str, Any], payload: bytes):
+        self.metrics["received"] += 1
+        if header["op"] == "stats":
+            self.workers[header["worker"]] = dict(json.loads(payload), updated_at=time.time())
+            return
+        message = payload if header.get("binary") else json.loads(payload)
+        try:
+            self.deliver(header.get("client_id"), message)
+        except Exception as e:
+            logger.error(f"Failed to deliver bus message: {e}")
+
+    def send(self, client_id: str, message: Message):
+        """Hand a message to whichever other worker holds the client's connection"""
+        binary = isinstance(message, (bytes, bytearray))
+        payload = bytes(message) if binary else json.dumps(message).encode("utf-8")
+        self._publish({"op": "send", "client_id": client_id, "binary": binary}, payload)
+
+    def broadcast(self, message: Dict[str, Any]):
+        """Deliver a message to the clients of all other workers"""
+        self._publish({"op": "broadcast", "client_id": None}, json.dumps(message).encode("utf-8"))
+
+    async def _publish_stats(self):
+        while True:
+            stats = dict(self.stats(), role=self.role)
+            self.workers[self.worker_id] = dict(stats, updated_at=time.time())
+            self._publish({"op": "stats"}, json.dumps(stats).encode("utf-8"))
+            await asyncio.sleep(self.stats_interval)
+
+    def worker_metrics(self) -> Dict[int, Dict[str, Any]]:
+        """Latest stats of every live worker, this one included"""
+        cutoff = time.time() - 3 * self.stats_interval
+        for worker_id in [w for w, stats in self.workers.items() if stats["updated_at"] < cutoff]:
+            del self.workers[worker_id]
+        return self.workers
@@ -0,0 +1,120 @@
+"""
+Per-connection message dispatch for the WebSocket endpoint.
+
+The endpoint keeps reading frames while earlier messages are still being
+handled. Each message is routed to a lane by its type: a lane handles its
+messages one at a time in arrival order, different lanes run concurrently.
+So `speech_data` keeps flowing while a chat answer streams, and speech
+chunks are still transcribed in order. Control messages (interrupt) skip the
+lanes and run immediately.
+
+The number of queued or running lane messages per connection is bounded; a
+message over the limit is rejected instead of blocking the reader, which
+would otherwise also hold back the next interrupt. Lanes are only created for
+known service types, so the number of lane workers is bounded too.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from logger_config import logger
+from services.base_service import ServiceType
+
+# Handled immediately, outside the lanes
+CONTROL_MESSAGE_TYPES = {"interrupt"}
+
+# Messages in the same lane are handled in order; lanes run concurrently
+MESSAGE_LANES = {
+    "chat_request": "chat",
+    "speech_start": "speech",
+    "speech_data": "speech",
+    "speech_end": "speech",
+}
+DEFAULT_LANE = "default"
+
+SERVICE_TYPES = {service_type.value for service_type in ServiceType}
+
+WS_MAX_INFLIGHT_MESSAGES = int(os.getenv("WS_MAX_INFLIGHT_MESSAGES", "32"))
+
+
+def message_type_of(message_data: Dict[str, Any]) -> str:
+    return message_data.get('type') or message_data.get('message_type', '')
+
+
+def lane_of(message_data: Dict[str, Any]) -> Optional[str]:
+    """The lane a message is handled in, or None if its service_type is unknown"""
+    service_type = message_data.get('service_type', 'ai_chat')
+    if not isinstance(service_type, str) or service_type not in SERVICE_TYPES:
+        return None
+    return f"{service_type}:{MESSAGE_LANES.get(message_type_of(message_data), DEFAULT_LANE)}"
+
+
+class MessageDispatcher:
+    """Routes one connection's messages to ordered lanes and control tasks"""
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], Awaitable[None]],
+                 max_inflight: int = WS_MAX_INFLIGHT_MESSAGES):
+        self.handler = handler
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self._lanes: Dict[str, asyncio.Queue] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._control_tasks: Set[asyncio.Task] = set()
+        self._closed = False
+
+    def submit(self, message_data: Dict[str, Any]) -> bool:
+        """Schedule a message. Returns False if it was rejected by the in-flight limit
+        or for an unknown service_type."""
+        if self._closed:
+            return False
+
+        message_type = message_type_of(message_data)
+        if message_type in CONTROL_MESSAGE_TYPES:
+            task = asyncio.create_task(self._handle(message_data))
+            self._control_tasks.add(task)
+            task.add_done_callback(self._control_tasks.discard)
+            return True
+
+        lane = lane_of(message_data)
+        if lane is None:
+            logger.warning(f"Rejecting {message_type}: unknown service type")
+            return False
+        if self.inflight >= self.max_inflight:
+            logger.warning(f"Rejecting {message_type}: {self.inflight} messages already in flight")
+            return False
+
+        queue = self._lanes.get(lane)
+        if queue is None:
+            queue = self._lanes[lane] = asyncio.Queue()
+            self._workers[lane] = asyncio.create_task(self._work(queue))
+        self.inflight += 1
+        queue.put_nowait(message_data)
+        return True
+
+    async def _handle(self, message_data: Dict[str, Any]):
+        try:
+            await self.handler(message_data)
+        except Exception as e:
+            logger.error(f"Unhandled error dispatching {message_type_of(message_data)}: {e}")
+
+    async def _work(self, queue: asyncio.Queue):
+        while True:
+            message_data = await queue.get()
+            try:
+                await self._handle(message_data)
+            finally:
+                self.inflight -= 1
+
+    async def close(self):
+        """Cancel lane workers and control tasks and wait for them to finish"""
+        self._closed = True
+        # Never cancel the task running this close (e.g. a handler whose send failed)
+        current = asyncio.current_task()
+        tasks = [task for task in [*self._workers.values(), *self._control_tasks] if task is not current]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers.clear()
+        self._lanes.clear()
@@ -0,0 +1,192 @@
+"""
+Per-connection outbound queue for the WebSocket endpoint.
+
+Producers (service generators) enqueue messages without waiting for the
+socket; a writer task per connection serializes and sends them. Messages
+are dicts (sent as JSON text frames) or bytes (sent as binary frames). A slow
+client therefore only grows its own queue instead of stalling the upstream
+stream that feeds it.
+
+The queue is bounded by WS_OUTBOUND_MAX_MESSAGES. When it is full the
+policies in WS_OUTBOUND_OVERFLOW are tried in order until there is room:
+
+    coalesce    append a text delta to the chat chunk at the tail of the queue
+    drop_stale  drop an interim message that a later one supersedes
+    disconnect  give up on the client and close the connection
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Union
+
+from logger_config import logger
+
+WS_OUTBOUND_MAX_MESSAGES = int(os.getenv("WS_OUTBOUND_MAX_MESSAGES", "256"))
+WS_OUTBOUND_OVERFLOW = tuple(
+    policy.strip()
+    for policy in os.getenv("WS_OUTBOUND_OVERFLOW", "coalesce,drop_stale,disconnect").split(",")
+    if policy.strip()
+)
+OVERFLOW_POLICIES = ("coalesce", "drop_stale", "disconnect")
+
+# Interim results that a later message of the same type replaces
+STALE_MESSAGE_TYPES = {"speech_transcription"}
+
+# Close code sent to clients that cannot keep up ("Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+def is_text_delta(message) -> bool:
+    if not isinstance(message, dict):
+        return False
+    data = message.get("data")
+    return message.get("type") == "chat_response_chunk" and isinstance(data, dict) and "content" in data
+
+
+def is_stale(message) -> bool:
+    if not isinstance(message, dict):
+        return False
+    data = message.get("data")
+    return message.get("type") in STALE_MESSAGE_TYPES and isinstance(data, dict) and not data.get("is_final", False)
+
+
+class OutboundQueue:
+    """Bounded send queue and writer task for one WebSocket connection"""
+
+    def __init__(self, websocket, on_abort: Optional[Callable[[], Any]] = None,
+                 max_messages: int = WS_OUTBOUND_MAX_MESSAGES, overflow=WS_OUTBOUND_OVERFLOW):
+        unknown = set(overflow) - set(OVERFLOW_POLICIES)
+        if unknown:
+            raise ValueError(f"Unknown overflow policies: {sorted(unknown)}")
+        self.websocket = websocket
+        self.on_abort = on_abort
+        self.max_messages = max_messages
+        self.overflow = overflow
+        self.closed = False
+        self.aborted = False
+        self._queue = deque()
+        self._wakeup = asyncio.Event()
+        self._writer = asyncio.create_task(self._write())
+        self._metrics = {
+            "sent": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "max_depth": 0,
+            "send_ms_avg": 0.0,
+            "send_ms_max": 0.0,
+        }
+
+    def send(self, message: Union[Dict[str, Any], bytes]) -> bool:
+        """Enqueue a message without waiting. Returns False if it was not queued."""
+        if self.closed:
+            return False
+
+        if len(self._queue) >= self.max_messages:
+            for policy in self.overflow:
+                if policy == "coalesce" and self._coalesce(message):
+                    return True
+                if policy == "drop_stale" and self._drop_stale(message):
+                    if len(self._queue) < self.max_messages:
+                        break
+                    # The new message itself was the stale one
+                    return False
+                if policy == "disconnect":
+                    logger.warning(f"Outbound queue full ({len(self._queue)} messages), disconnecting slow client")
+                    self._abort()
+                    return False
+            else:
+                self._metrics["dropped"] += 1
+                return False
+
+        self._queue.append(message)
+        self._metrics["max_depth"] = max(self._metrics["max_depth"], len(self._queue))
+        self._wakeup.set()
+        return True
+
+    def _coalesce(self, message: Dict[str, Any]) -> bool:
+        # Only the tail may absorb the delta, anything earlier would reorder the stream
+        if not self._queue or not is_text_delta(message) or not is_text_delta(self._queue[-1]):
+            return False
+        # The queued dict may be shared with other clients' queues (a broadcast), so merge into a copy
+        tail = self._queue[-1]
+        self._queue[-1] = dict(tail, data=dict(tail["data"], content=tail["data"]["content"] + message["data"]["content"]))
+        self._metrics["coalesced"] += 1
+        return True
+
+    def _drop_stale(self, message: Dict[str, Any]) -> bool:
+        for i, queued in enumerate(self._queue):
+            if is_stale(queued):
+                del self._queue[i]
+                self._metrics["dropped"] += 1
+                return True
+        if is_stale(message):
+            self._metrics["dropped"] += 1
+            return True
+        return False
+
+    def _abort(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.aborted = True
+        self._queue.clear()
+        self._wakeup.set()
+        if self.on_abort:
+            self.on_abort()
+
+    async def _write(self):
+        try:
+            while True:
+                while not self._queue:
+                    if self.closed:
+                        return
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+
+                message = self._queue.popleft()
+                started = time.perf_counter()
+                if isinstance(message, bytes):
+                    await self.websocket.send_bytes(message)
+                else:
+                    await self.websocket.send_text(json.dumps(message))
+                self._record_send((time.perf_counter() - started) * 1000)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending WebSocket message: {e}")
+            self._abort()
+
+    def _record_send(self, elapsed_ms: float):
+        metrics = self._metrics
+        metrics["sent"] += 1
+        # Exponential moving average keeps the figure current without storing samples
+        metrics["send_ms_avg"] += (elapsed_ms - metrics["send_ms_avg"]) * 0.1
+        metrics["send_ms_max"] = max(metrics["send_ms_max"], elapsed_ms)
+
+    def metrics(self) -> Dict[str, Any]:
+        return dict(
+            self._metrics,
+            depth=len(self._queue),
+            send_ms_avg=round(self._metrics["send_ms_avg"], 3),
+            send_ms_max=round(self._metrics["send_ms_max"], 3),
+            closed=self.closed,
+            aborted=self.aborted,
+        )
+
+    async def close(self, code: int = 1000):
+        """Stop the writer and close the socket"""
+        self.closed = True
+        self._queue.clear()
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+        try:
+            # A slow client may never acknowledge the close frame
+            await asyncio.wait_for(
+                self.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE if self.aborted else code), timeout=1.0
+            )
+        except Exception:
+            pass
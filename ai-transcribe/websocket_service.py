@@ -1,9 +1,16 @@
 import asyncio
+import contextlib
+import copy
+import functools
+import hashlib
 import json
+import mimetypes
 import time
-from typing import Dict, Set
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Set
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse
 from services.service_registry import service_registry, ServiceType
 from services.base_service import ServiceMessage
 from services.enhanced_chat_service import EnhancedChatService
@@ -11,12 +18,22 @@ from logger_config import logger
 
 # Import old Flask functionality
 from transcribe import process_s3_target
+from job_store import transcription_jobs, make_job_id
+from cue_index import open_cue_index
+from search_index import get_search_index
+from websocket_dispatch import MessageDispatcher, message_type_of, lane_of, CONTROL_MESSAGE_TYPES
+from websocket_outbound import OutboundQueue
+from websocket_bus import WorkerBus, WORKERS
+from audio_frames import frame_from_audio_message, speech_message_from_frame
 from helpers import (
     client_configs, STORAGE_DIR, serializer, VALID_USERNAME, VALID_PASSWORD, 
     STORAGE_API_KEY, validate_credentials, generate_signed_cloudfront_url, 
     generate_signed_url, get_client_config, get_supported_languages, 
     build_video_urls, handle_exception, clean_filename, clean_path, 
-    sanitize_filename, sanitize_path
+    sanitize_filename, sanitize_path, find_subtitle_tracks, get_subtitle_cache_window,
+    SUBTITLE_TOKEN_MAX_AGE, resolve_storage_path,
+    subtitle_path_for, generate_signed_dir_url, find_hls_subtitle_playlists,
+    STORAGE_DIR_TOKEN_MAX_AGE, HLS_SUBTITLE_DIR
 )
 from itsdangerous import BadSignature
 import os
@@ -27,38 +44,133 @@ class WebSocketManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
         self.client_services: Dict[str, Set[ServiceType]] = {}
+        self.dispatchers: Dict[str, MessageDispatcher] = {}
+        self.outbound: Dict[str, OutboundQueue] = {}
+        self._teardowns: Set[asyncio.Task] = set()
+        # Reaches clients connected to other worker processes (WORKERS > 1)
+        self.bus: Optional[WorkerBus] = None
+    
+    async def start_bus(self):
+        if WORKERS > 1 and self.bus is None:
+            self.bus = WorkerBus(self._deliver_local, self.worker_metrics)
+            await self.bus.start()
+    
+    async def stop_bus(self):
+        if self.bus is not None:
+            await self.bus.stop()
+            self.bus = None
     
     async def connect(self, websocket: WebSocket, client_id: str):
         """Handle new WebSocket connection"""
         await websocket.accept()
+        previous = self.active_connections.get(client_id)
+        if previous is not None:
+            # Same client id reconnected before its old socket went away: retire the old one
+            await self.disconnect(client_id)
+            try:
+                await previous.close(code=1000)
+            except Exception:
+                pass
         self.active_connections[client_id] = websocket
         self.client_services[client_id] = set()
+        self.dispatchers[client_id] = MessageDispatcher(functools.partial(self.handle_message, client_id))
+        self.outbound[client_id] = OutboundQueue(
+            websocket, on_abort=functools.partial(self._schedule_disconnect, client_id, websocket)
+        )
         logger.info(f"Client connected: {client_id}")
     
-    def disconnect(self, client_id: str):
-        """Handle WebSocket disconnection"""
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
+    def _schedule_disconnect(self, client_id: str, websocket: WebSocket):
+        """Tear a client down from outside the writer that gave up on it"""
+        task = asyncio.create_task(self.disconnect(client_id, websocket))
+        self._teardowns.add(task)
+        task.add_done_callback(self._teardowns.discard)
+    
+    async def disconnect(self, client_id: str, websocket: Optional[WebSocket] = None):
+        """Handle WebSocket disconnection, cancelling the client's in-flight work.
+        
+        With a websocket, nothing happens if the client id has since been
+        taken over by a newer connection.
+        """
+        if websocket is not None and self.active_connections.get(client_id) is not websocket:
+            return
+        self.active_connections.pop(client_id, None)
+        
+        dispatcher = self.dispatchers.pop(client_id, None)
+        if dispatcher:
+            await dispatcher.close()
+        
+        outbound = self.outbound.pop(client_id, None)
+        if outbound:
+            await outbound.close()
         
         if client_id in self.client_services:
-            service_registry.cleanup_client(client_id)
             del self.client_services[client_id]
+            await service_registry.cleanup_client(client_id)
         
         logger.info(f"Client disconnected: {client_id}")
     
+    async def dispatch(self, client_id: str, message_data: dict):
+        """Hand a received message to the client's dispatcher without waiting for it"""
+        dispatcher = self.dispatchers.get(client_id)
+        if dispatcher and dispatcher.submit(message_data):
+            return
+        if message_type_of(message_data) not in CONTROL_MESSAGE_TYPES and lane_of(message_data) is None:
+            error = f"Unknown service type: {message_data.get('service_type')}"
+        else:
+            error = "Too many messages in flight"
+        await self.send_message(client_id, {
+            "type": "error",
+            "service_type": message_data.get('service_type', 'unknown'),
+            "data": {
+                "error": error,
+                "message_type": message_type_of(message_data)
+            },
+            "client_id": client_id,
+            "timestamp": time.time()
+        })
+    
     async def send_message(self, client_id: str, message: dict):
-        """Send message to specific client"""
-        if client_id in self.active_connections:
-            try:
-                await self.active_connections[client_id].send_text(json.dumps(message))
-            except Exception as e:
-                logger.error(f"Error sending message to {client_id}: {e}")
-                self.disconnect(client_id)
+        """Queue a message for a specific client; its writer task does the sending"""
+        self.queue_message(client_id, message)
+    
+    def queue_message(self, client_id: str, message: dict):
+        """send_message for callers outside a coroutine, such as task done callbacks.
+        
+        Clients connected to another worker are reached through the bus.
+        """
+        # Audio goes out as a binary frame instead of base64 inside JSON
+        frame = frame_from_audio_message(message)
+        payload = frame if frame is not None else message
+        outbound = self.outbound.get(client_id)
+        if outbound:
+            outbound.send(payload)
+        elif self.bus is not None:
+            self.bus.send(client_id, payload)
+    
+    def _deliver_local(self, client_id: Optional[str], message):
+        """Deliver a bus message to a client of this worker; a None client id is a broadcast"""
+        if client_id is None:
+            for outbound in list(self.outbound.values()):
+                outbound.send(message)
+            return
+        outbound = self.outbound.get(client_id)
+        if outbound:
+            outbound.send(message)
     
     async def broadcast(self, message: dict):
-        """Broadcast message to all connected clients"""
+        """Broadcast message to all connected clients, on every worker"""
         for client_id in list(self.active_connections.keys()):
             await self.send_message(client_id, message)
+        if self.bus is not None:
+            self.bus.broadcast(message)
+    
+    def worker_metrics(self) -> dict:
+        """Connection gauges of this worker process"""
+        return {
+            "connections": len(self.active_connections),
+            "outbound_depth": sum(outbound.metrics()["depth"] for outbound in self.outbound.values()),
+            "inflight": sum(dispatcher.inflight for dispatcher in self.dispatchers.values())
+        }
     
     async def handle_message(self, client_id: str, message_data: dict):
         """Route message to appropriate service"""
@@ -108,8 +220,53 @@ class WebSocketManager:
 # Global WebSocket manager
 websocket_manager = WebSocketManager()
 
+def set_cloudfront_cookies(response: Response, video_urls: dict, config: dict):
+    """Move CloudFront signed cookies from video_urls onto the response"""
+    cookies = video_urls.pop("signed_cookies", None)
+    path = video_urls.pop("signed_cookie_path", "/")
+    if not cookies:
+        return
+    max_age = max(0, int(video_urls["signed_expires"] - time.time()))
+    for name, value in cookies.items():
+        response.set_cookie(
+            name,
+            value,
+            max_age=max_age,
+            domain=config.get('CLOUDFRONT_COOKIE_DOMAIN'),
+            path=path,
+            secure=True,
+            httponly=True,
+            samesite="none"
+        )
+
+def is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the current validators"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison, as for GET/HEAD
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in candidates or etag.removeprefix("W/") in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
 # FastAPI app
-app = FastAPI(title="Whisper Transcription & AI Chat Server", version="1.0.0")
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Hook the chat service up to the WebSocket manager and join the message bus when running several workers"""
+    service_registry.get_service(ServiceType.AI_CHAT).send = websocket_manager.queue_message
+    await websocket_manager.start_bus()
+    try:
+        yield
+    finally:
+        await websocket_manager.stop_bus()
+
+app = FastAPI(title="Whisper Transcription & AI Chat Server", version="1.0.0", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -123,6 +280,144 @@ app.add_middleware(
 # Register services
 service_registry.register_service(ServiceType.AI_CHAT, EnhancedChatService)
 
+# Upper bound on cues returned by one /api/cues query
+MAX_CUES_PER_QUERY = 500
+
+# Upper bound on hits returned by one /api/search query
+MAX_SEARCH_HITS = 200
+
+# Upper bound on items per batch request
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "100"))
+
+def is_valid_key(key) -> bool:
+    """Batch items come straight from the request body; only non-empty strings are keys"""
+    return isinstance(key, str) and bool(key)
+
+def build_subtitle_track_list(base_key_dir: str, tracks: list, client_id: str) -> list:
+    """Turn located subtitle files into player track entries with signed URLs"""
+    return [
+        {
+            "file": generate_signed_url(f"{base_key_dir}/{filename}", client_id),
+            "label": lang_label,
+            "lang": lang_code
+        }
+        for lang_code, lang_label, filename, _ in tracks
+    ]
+
+def build_hls_subtitle_track_list(base_key_dir: str, playlists: list, client_id: str) -> list:
+    """Turn segmented subtitle playlists into track entries sharing one directory token"""
+    if not playlists:
+        return []
+    languages = get_supported_languages()
+    dir_url = generate_signed_dir_url(f"{base_key_dir}/{HLS_SUBTITLE_DIR}", client_id)
+    return [
+        {
+            "file": f"{dir_url}/{lang_code}.m3u8",
+            "label": languages.get(lang_code, lang_code),
+            "lang": lang_code
+        }
+        for lang_code, _ in playlists
+    ]
+
+# The artifacts the storage endpoints serve, with their content types. Anything
+# else under STORAGE_DIR (embedding sidecars, indexes) is internal.
+STORAGE_MEDIA_TYPES = {
+    ".vtt": "text/vtt; charset=utf-8",
+    ".txt": "text/plain; charset=utf-8",
+    ".webvtt": "text/vtt; charset=utf-8",
+    ".m3u8": "application/vnd.apple.mpegurl",
+}
+
+# Precompressed variants written next to artifacts, in order of preference
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+def is_servable_artifact(full_path: str) -> bool:
+    """Whether a resolved storage path is a published artifact.
+
+    Hidden files and directories (.jobs, .search, .tts_cache, ...) hold internal
+    state and are never served. Of the rest, only STORAGE_MEDIA_TYPES extensions
+    and their precompressed variants are.
+    """
+    relative = os.path.relpath(full_path, os.path.realpath(STORAGE_DIR))
+    if any(part.startswith(".") for part in relative.split(os.sep)):
+        return False
+    root, extension = os.path.splitext(full_path.lower())
+    if extension in (".gz", ".br"):
+        extension = os.path.splitext(root)[1]
+    return extension in STORAGE_MEDIA_TYPES
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into {coding: q}"""
+    codings = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding.strip().lower()] = q
+    return codings
+
+def select_precompressed_variant(request: Request, full_path: str, stat: os.stat_result):
+    """Pick the best fresh precompressed variant the client accepts, if any"""
+    accepted = parse_accept_encoding(request.headers.get("accept-encoding"))
+    for coding, suffix in PRECOMPRESSED_ENCODINGS:
+        if accepted.get(coding, accepted.get("*", 0.0)) <= 0:
+            continue
+        try:
+            variant_stat = os.stat(full_path + suffix)
+        except OSError:
+            continue
+        # Variants are written after the original; an older one is stale
+        if variant_stat.st_mtime_ns >= stat.st_mtime_ns:
+            return coding, full_path + suffix, variant_stat
+    return None, full_path, stat
+
+def has_storage_api_key(x_api_key: Optional[str]) -> bool:
+    """Whether a request carries the storage API key"""
+    return bool(STORAGE_API_KEY) and x_api_key == STORAGE_API_KEY
+
+def serve_storage_path(request: Request, full_path: str) -> Response:
+    """Stream a file from storage with strong validators and Range support.
+
+    FileResponse hands the path to the server via the ASGI pathsend extension when
+    available (sendfile) and otherwise streams it in chunks; Range and If-Range are
+    handled by FileResponse itself. Precompressed .br/.gz variants are chosen from
+    Accept-Encoding so no compression happens per request.
+    """
+    if not is_servable_artifact(full_path):
+        logger.warning(f"Refused to serve internal file: {full_path}")
+        return JSONResponse({"error": "File not found"}, status_code=404)
+
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        stat = None
+    if stat is None or not os.path.isfile(full_path):
+        logger.warning(f"Requested file not found: {full_path}")
+        return JSONResponse({"error": "File not found"}, status_code=404)
+
+    extension = os.path.splitext(full_path)[1].lower()
+    media_type = STORAGE_MEDIA_TYPES.get(extension) or mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+    coding, send_path, send_stat = select_precompressed_variant(request, full_path, stat)
+    etag = f'"{send_stat.st_ino:x}-{send_stat.st_mtime_ns:x}-{send_stat.st_size:x}"'
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if coding:
+        headers["Content-Encoding"] = coding
+
+    if is_not_modified(request, etag, send_stat.st_mtime):
+        headers["Last-Modified"] = formatdate(send_stat.st_mtime, usegmt=True)
+        headers.pop("Content-Encoding", None)
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(send_path, stat_result=send_stat, media_type=media_type, headers=headers)
+
 # HTTP Endpoints (from old Flask app)
 @app.get("/api/ping")
 async def ping():
@@ -155,13 +450,29 @@ async def start_transcription(request_data: dict):
         translate_languages = request_data.get("languages", [])
         override = request_data.get("override", False)
         client_id = request_data.get("client_id", "default")
+        hls_subtitles = request_data.get("hls_subtitles", False)
 
         logger.info(f"Starting transcription for {bucket}/{target} | lang={lang}, translate={translate}, upload={upload}, translate_languages={translate_languages}, override={override}, client_id={client_id}")
 
         # Get client config
         config = get_client_config(client_configs, client_id)
 
-        result = process_s3_target(
+        # Identical requests share one pipeline run, in this process and across workers
+        job_id = make_job_id(bucket, target, translate_languages, {
+            "prompt_lang": lang,
+            "enable_translation": translate,
+            "upload": upload,
+            "upload_bucket": upload_bucket,
+            "upload_prefix": upload_prefix,
+            "advanced_encoding": advanced_encoding,
+            "override": override,
+            "client_id": client_id,
+            "cloudfront_base_url": config['CLOUDFRONT_BASE_URL'],
+            "hls_subtitles": hls_subtitles,
+        })
+
+        result = await transcription_jobs.run(job_id, functools.partial(
+            process_s3_target,
             bucket,
             target,
             prompt_lang=lang,
@@ -172,8 +483,12 @@ async def start_transcription(request_data: dict):
             cloudfront_base_url=config['CLOUDFRONT_BASE_URL'],
             advanced_encoding=advanced_encoding,
             translate_languages=translate_languages,
-            override=override
-        )
+            override=override,
+            client_id=client_id,
+            hls_subtitles=hls_subtitles
+        ))
+        # Coalesced callers share the result object
+        result = copy.deepcopy(result)
 
         # Only sign the video URL with CloudFront
         for item in result:
@@ -186,42 +501,51 @@ async def start_transcription(request_data: dict):
     except Exception as e:
         return handle_exception(e, "transcription")
 
-@app.get('/api/storage/{filename:path}')
-async def serve_storage_file(filename: str, x_api_key: str = None):
+@app.api_route('/api/storage/{filename:path}', methods=["GET", "HEAD"])
+async def serve_storage_file(request: Request, filename: str, x_api_key: str = None):
     """Serve storage files with API key authentication"""
-    if x_api_key != STORAGE_API_KEY:
+    if not has_storage_api_key(x_api_key):
         logger.warning("Unauthorized access to storage file.")
-        return {"error": "Unauthorized"}
-    
-    storage_root = os.path.join(os.path.dirname(__file__), 'storage')
-    full_path = os.path.join(storage_root, filename)
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
     
     # Security check: prevent directory traversal
-    if not os.path.abspath(full_path).startswith(os.path.abspath(storage_root)):
+    full_path = resolve_storage_path(filename)
+    if full_path is None:
         logger.warning("Path traversal detected.")
-        return {"error": "Unauthorized"}
+        return JSONResponse({"error": "Unauthorized"}, status_code=403)
     
-    if not os.path.exists(full_path):
-        logger.warning(f"Requested file not found: {full_path}")
-        return {"error": "File not found"}
-    
-    directory = os.path.dirname(full_path)
-    file_name = os.path.basename(full_path)
-    return {"file_path": full_path, "filename": filename}
+    return serve_storage_path(request, full_path)
 
-@app.get('/api/storage-secure/{token}')
-async def serve_subtitle_secure(token: str):
+@app.api_route('/api/storage-secure/{token}', methods=["GET", "HEAD"])
+async def serve_subtitle_secure(request: Request, token: str):
     """Serve files with secure token authentication"""
     try:
-        filename = serializer.loads(token, max_age=300)  # 5 minutes
+        filename = serializer.loads(token, max_age=SUBTITLE_TOKEN_MAX_AGE)  # 5 minutes
     except BadSignature:
-        return {"error": "Invalid token"}
+        return JSONResponse({"error": "Invalid token"}, status_code=401)
     
-    safe_path = os.path.join(STORAGE_DIR, filename)
-    if not os.path.exists(safe_path):
-        return {"error": "File not found"}
+    safe_path = resolve_storage_path(filename)
+    if safe_path is None:
+        logger.warning("Path traversal detected.")
+        return JSONResponse({"error": "Unauthorized"}, status_code=403)
     
-    return {"file_path": safe_path, "filename": filename}
+    return serve_storage_path(request, safe_path)
+
+@app.api_route('/api/storage-dir/{token}/{filename:path}', methods=["GET", "HEAD"])
+async def serve_storage_dir_file(request: Request, token: str, filename: str):
+    """Serve files from a directory granted by a directory token (HLS subtitle playlists and segments)"""
+    try:
+        dir_path = serializer.loads(token, max_age=STORAGE_DIR_TOKEN_MAX_AGE, salt="storage-dir")
+    except BadSignature:
+        return JSONResponse({"error": "Invalid token"}, status_code=401)
+
+    safe_dir = resolve_storage_path(dir_path)
+    safe_path = resolve_storage_path(os.path.join(dir_path, filename))
+    if safe_dir is None or safe_path is None or os.path.commonpath([safe_dir, safe_path]) != safe_dir:
+        logger.warning("Path traversal detected.")
+        return JSONResponse({"error": "Unauthorized"}, status_code=403)
+
+    return serve_storage_path(request, safe_path)
 
 @app.post("/api/sign-url")
 async def sign_url(request_data: dict):
@@ -241,8 +565,30 @@ async def sign_url(request_data: dict):
     except Exception as e:
         return handle_exception(e, "sign_url")
 
+@app.post("/api/sign-url/batch")
+async def sign_url_batch(request_data: dict):
+    """Generate signed CloudFront URLs for many keys in one request"""
+    try:
+        keys = request_data.get("keys") or []
+        client_id = request_data.get("client_id", "default")
+
+        if not isinstance(keys, list) or not keys:
+            return {"error": "Missing 'keys'"}
+        if len(keys) > MAX_BATCH_SIZE:
+            return {"error": f"Too many keys (max {MAX_BATCH_SIZE})"}
+
+        logger.debug(f"Batch signing {len(keys)} keys for client {client_id}")
+        return {
+            "signed_urls": {
+                key: generate_signed_cloudfront_url(key, client_id) for key in keys if is_valid_key(key)
+            },
+            "invalid_keys": [key for key in keys if not is_valid_key(key)]
+        }
+    except Exception as e:
+        return handle_exception(e, "sign_url_batch")
+
 @app.get("/api/subtitles")
-async def get_subtitle_tracks(video_key: str, advanced: bool = False, client_id: str = "default"):
+async def get_subtitle_tracks(request: Request, response: Response, video_key: str, advanced: bool = False, client_id: str = "default"):
     """Get subtitle tracks for a video"""
     try:
         if not video_key:
@@ -253,43 +599,176 @@ async def get_subtitle_tracks(video_key: str, advanced: bool = False, client_id:
         # Get client config
         config = get_client_config(client_configs, client_id)
 
-        # Parse the video key to derive subtitle directory and filename
-        # Subtitles are stored under STORAGE_DIR/<base_key>/<filename>.vtt
-        # where <base_key> is the full video key without extension (may contain parentheses)
-        base_key_dir = os.path.splitext(video_key)[0]
-        filename_base = clean_filename(os.path.basename(base_key_dir))
+        base_key_dir, tracks = find_subtitle_tracks(video_key)
+        hls_playlists = find_hls_subtitle_playlists(base_key_dir)
+
+        # The response only changes when the track set changes or signatures roll over,
+        # so validate on that before doing any signing work
+        window_start, fresh_until = get_subtitle_cache_window()
+        fingerprint = json.dumps([
+            video_key, advanced, client_id,
+            config['CLOUDFRONT_BASE_URL'], config.get('CLOUDFRONT_SIGNING_MODE', 'canned'),
+            window_start,
+            [(lang_code, stat.st_mtime_ns, stat.st_size) for lang_code, _, _, stat in tracks],
+            [(lang_code, stat.st_mtime_ns) for lang_code, stat in hls_playlists]
+        ])
+        etag = 'W/"' + hashlib.sha1(fingerprint.encode("utf-8")).hexdigest() + '"'
+        last_modified = max(
+            [window_start]
+            + [stat.st_mtime for _, _, _, stat in tracks]
+            + [stat.st_mtime for _, stat in hls_playlists]
+        )
+        cache_scope = "private" if config.get('CLOUDFRONT_SIGNING_MODE') == 'cookie' else "public"
+        cache_headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(last_modified, usegmt=True),
+            "Cache-Control": f"{cache_scope}, max-age={max(0, int(fresh_until - time.time()))}"
+        }
 
-        subtitle_tracks = []
-        languages = get_supported_languages()
+        if is_not_modified(request, etag, last_modified):
+            return Response(status_code=304, headers=cache_headers)
 
-        for lang_code, lang_label in languages.items():
-            if lang_code == 'en':
-                # Default English subtitle without _en
-                filename = f"{filename_base}.vtt"
-            else:
-                filename = f"{filename_base}_{lang_code}.vtt"
-            
-            full_path = os.path.join(STORAGE_DIR, base_key_dir, filename)
-
-            if os.path.exists(full_path):
-                secure_url = generate_signed_url(f"{base_key_dir}/{filename}", client_id)
-                subtitle_tracks.append({
-                    "file": secure_url,
-                    "label": lang_label,
-                    "lang": lang_code
-                })
+        subtitle_tracks = build_subtitle_track_list(base_key_dir, tracks, client_id)
 
         # Build video URLs with proper sanitization and CloudFront signing
         video_urls = build_video_urls(video_key, config, advanced, client_id)
+        set_cloudfront_cookies(response, video_urls, config)
+        response.headers.update(cache_headers)
 
         return {
             "tracks": subtitle_tracks,
+            "hls_subtitle_tracks": build_hls_subtitle_track_list(base_key_dir, hls_playlists, client_id),
             **video_urls
         }
 
     except Exception as e:
         return handle_exception(e, "get_subtitle_tracks")
 
+@app.get("/api/cues")
+async def get_cues(video_key: str, start: float, end: float, lang: str = "en",
+                   token: str = None, x_api_key: str = None):
+    """Get the subtitle cues overlapping [start, end) seconds for one language.
+
+    Cues are the track's content, so like the track file itself this needs the
+    storage API key or the track's signed token from /api/subtitles.
+    """
+    try:
+        if end <= start:
+            return {"error": "'end' must be greater than 'start'"}
+        if lang not in get_supported_languages():
+            return {"error": f"Unsupported language: {lang}"}
+
+        base_key_dir, filename = subtitle_path_for(video_key, lang)
+        track_path = f"{base_key_dir}/{filename}"
+        if not has_storage_api_key(x_api_key):
+            try:
+                authorized = token is not None and serializer.loads(token, max_age=SUBTITLE_TOKEN_MAX_AGE) == track_path
+            except BadSignature:
+                authorized = False
+            if not authorized:
+                logger.warning("Unauthorized access to subtitle cues.")
+                return JSONResponse({"error": "Unauthorized"}, status_code=401)
+
+        vtt_path = resolve_storage_path(track_path)
+        if vtt_path is None or not os.path.exists(vtt_path):
+            return {"error": "Subtitle track not found"}
+
+        # Opening may parse the VTT and write its index, so it runs in a thread like /api/search
+        cue_index = await asyncio.to_thread(open_cue_index, vtt_path)
+        cues = cue_index.query(start, end, limit=MAX_CUES_PER_QUERY)
+        return {
+            "video_key": video_key,
+            "lang": lang,
+            "start": start,
+            "end": end,
+            "cues": cues
+        }
+
+    except Exception as e:
+        return handle_exception(e, "get_cues")
+
+@app.get("/api/search")
+async def search_transcripts(q: str, lang: str = "en", client_id: str = "default", limit: int = 50,
+                             x_api_key: str = None):
+    """Full-text search across a tenant's transcripts, returning (video, timestamp, snippet) hits"""
+    # Hits list the tenant's video keys and quote its transcripts, so it needs the API key like storage access
+    if not has_storage_api_key(x_api_key):
+        logger.warning("Unauthorized transcript search.")
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+
+    try:
+        if client_id not in client_configs:
+            return {"error": f"Unknown client_id: {client_id}"}
+        if lang not in get_supported_languages():
+            return {"error": f"Unsupported language: {lang}"}
+        
+        started = time.perf_counter()
+        # Runs in a thread so a large index never stalls the WebSocket connections on this worker
+        hits = await asyncio.to_thread(
+            get_search_index(client_id, lang).search, q, limit=max(1, min(limit, MAX_SEARCH_HITS))
+        )
+        return {
+            "query": q,
+            "lang": lang,
+            "hits": hits,
+            "took_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+    except Exception as e:
+        return handle_exception(e, "search_transcripts")
+
+@app.post("/api/subtitles/batch")
+async def get_subtitle_tracks_batch(request_data: dict):
+    """Get subtitle tracks and video URLs for many videos in one request.
+
+    Each video's tracks are located as in /api/subtitles; what a batch saves is the
+    config lookup, signer load and round-trips. Clients in cookie signing mode must
+    pass signing_mode "query" to get per-video query signatures instead.
+    """
+    try:
+        video_keys = request_data.get("video_keys") or []
+        advanced = request_data.get("advanced", False)
+        client_id = request_data.get("client_id", "default")
+
+        if not isinstance(video_keys, list) or not video_keys:
+            return {"error": "Missing 'video_keys'"}
+        if len(video_keys) > MAX_BATCH_SIZE:
+            return {"error": f"Too many video keys (max {MAX_BATCH_SIZE})"}
+
+        logger.info(f"Getting subtitle tracks for {len(video_keys)} videos (advanced: {advanced}, client_id: {client_id})")
+
+        config = get_client_config(client_configs, client_id)
+        # One set of signed cookies cannot cover several videos. Cookie tenants have to ask
+        # for query signatures explicitly rather than get URLs in another mode than they expect.
+        signing_mode = None
+        if config.get('CLOUDFRONT_SIGNING_MODE') == 'cookie':
+            if request_data.get("signing_mode") != "query":
+                return {"error": "Signed cookies cannot cover a batch; pass 'signing_mode': 'query' "
+                                 "or request /api/subtitles per video"}
+            signing_mode = 'query'
+
+        items = []
+        for video_key in video_keys:
+            if not is_valid_key(video_key):
+                items.append({"video_key": video_key, "error": "Video key must be a non-empty string"})
+                continue
+            try:
+                base_key_dir, tracks = find_subtitle_tracks(video_key)
+                items.append({
+                    "video_key": video_key,
+                    "tracks": build_subtitle_track_list(base_key_dir, tracks, client_id),
+                    "hls_subtitle_tracks": build_hls_subtitle_track_list(
+                        base_key_dir, find_hls_subtitle_playlists(base_key_dir), client_id
+                    ),
+                    **build_video_urls(video_key, config, advanced, client_id, signing_mode)
+                })
+            except Exception as e:
+                items.append({"video_key": video_key, **handle_exception(e, "get_subtitle_tracks_batch")})
+
+        return {"items": items}
+
+    except Exception as e:
+        return handle_exception(e, "get_subtitle_tracks_batch")
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
@@ -299,6 +778,35 @@ async def health_check():
         "supported_services": len(service_registry.get_supported_services())
     }
 
+@app.get("/api/websocket/metrics")
+async def websocket_metrics(x_api_key: str = None):
+    """Per-connection outbound queue depth, send latency and overflow counters, TTS time-to-first-audio,
+    chat session gauges and the connection gauges of every worker process"""
+    # Lists client ids and worker pids, so it needs the same API key as storage access
+    if not has_storage_api_key(x_api_key):
+        logger.warning("Unauthorized access to WebSocket metrics.")
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+
+    return {
+        "connections": {
+            client_id: {
+                "outbound": outbound.metrics(),
+                "inflight": websocket_manager.dispatchers[client_id].inflight
+                if client_id in websocket_manager.dispatchers else 0
+            }
+            for client_id, outbound in websocket_manager.outbound.items()
+        },
+        "tts": service_registry.get_service(ServiceType.AI_CHAT).tts_service.metrics(),
+        "sessions": service_registry.get_service(ServiceType.AI_CHAT).client_sessions.metrics(),
+        "worker": {
+            "id": os.getpid(),
+            "role": websocket_manager.bus.role if websocket_manager.bus else "single",
+            "bus": websocket_manager.bus.metrics if websocket_manager.bus else None
+        },
+        "workers": websocket_manager.bus.worker_metrics() if websocket_manager.bus
+        else {os.getpid(): websocket_manager.worker_metrics()}
+    }
+
 @app.get("/api/services")
 async def get_supported_services():
     """Get list of supported services"""
@@ -321,13 +829,32 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
     
     try:
         while True:
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            
+            if frame.get("bytes") is not None:
+                # Binary frames carry microphone audio
+                try:
+                    message_data = speech_message_from_frame(frame["bytes"])
+                except ValueError as e:
+                    await websocket_manager.send_message(client_id, {
+                        "type": "error",
+                        "service_type": "ai_chat",
+                        "data": {"error": f"Invalid audio frame: {e}"},
+                        "client_id": client_id,
+                        "timestamp": time.time()
+                    })
+                    continue
+            else:
+                message_data = json.loads(frame["text"])
             
-            await websocket_manager.handle_message(client_id, message_data)
+            await websocket_manager.dispatch(client_id, message_data)
     
     except WebSocketDisconnect:
-        websocket_manager.disconnect(client_id)
+        pass
     except Exception as e:
         logger.error(f"WebSocket error for {client_id}: {e}")
-        websocket_manager.disconnect(client_id) 
\ No newline at end of file
+    finally:
+        # Also on cancellation (server shutdown), so no per-client state is left behind
+        await websocket_manager.disconnect(client_id, websocket)